@@ -12,6 +12,19 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str = "5432"
     POSTGRES_DB: str = "events_db"
 
+    # Schema migrations (shared/migrations) applied at startup; the events
+    # table layout must match the consumer's EVENTS_PARTITIONING
+    MIGRATE_ON_STARTUP: bool = True
+    EVENTS_PARTITIONING: str = "none"
+    # Storage of events.event_id ("text", "bytea" or "uuid"); ids are
+    # accepted and rendered as hex either way. Must match the consumer's
+    EVENT_ID_FORMAT: str = "text"
+    # Answer event counts, top events and active users from the rollup
+    # tables the consumer maintains (ROLLUPS_ENABLED) instead of scanning
+    # events; only the sub-minute edges of a time range read raw rows.
+    # Ignored while rollup_state says they are not maintained or backfilled
+    ANALYTICS_USE_ROLLUPS: bool = True
+
     # Redis configuration
     REDIS_URL: str = "redis://redis:6379/0"
 
@@ -5,10 +5,13 @@ application settings. Kept here so configuration-related helpers live under
 the `config` package.
 """
 
+import psycopg2
 from psycopg2.pool import SimpleConnectionPool
 from contextlib import contextmanager
 from typing import Optional
 from config.config import get_settings
+from shared.event_ids import verify_format
+from shared.migrations import migrate
 
 settings = get_settings()
 
@@ -16,6 +19,13 @@ settings = get_settings()
 _pool: Optional[SimpleConnectionPool] = None
 
 
+def _dsn() -> str:
+    return (
+        f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}"
+        f"@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
+    )
+
+
 def init_pool(minconn: int = 1, maxconn: int = 10):
     """Initialize a SimpleConnectionPool for psycopg2 connections.
 
@@ -23,11 +33,34 @@ def init_pool(minconn: int = 1, maxconn: int = 10):
     """
     global _pool
     if _pool is None:
-        dsn = (
-            f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}"
-            f"@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
+        _pool = SimpleConnectionPool(minconn, maxconn, dsn=_dsn())
+
+
+def migrate_database():
+    """Apply pending schema migrations (``shared.migrations``) on a dedicated connection.
+
+    Returns:
+        list: versions applied
+    """
+    conn = psycopg2.connect(_dsn())
+    try:
+        return migrate(
+            conn, {"partitioning": settings.EVENTS_PARTITIONING, "event_id_format": settings.EVENT_ID_FORMAT}
         )
-        _pool = SimpleConnectionPool(minconn, maxconn, dsn=dsn)
+    finally:
+        conn.close()
+
+
+def verify_event_id_format():
+    """Check that ``EVENT_ID_FORMAT`` matches the type of ``events.event_id``.
+
+    Raises:
+        RuntimeError: the column is stored in another format
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            verify_format(cur, settings.EVENT_ID_FORMAT)
+        conn.rollback()
 
 
 def close_pool():
@@ -59,4 +92,4 @@ def get_connection():
         _pool.putconn(conn)
 
 
-__all__ = ["init_pool", "close_pool", "get_connection"]
\ No newline at end of file
+__all__ = ["init_pool", "close_pool", "get_connection", "migrate_database", "verify_event_id_format"]
\ No newline at end of file
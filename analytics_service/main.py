@@ -13,7 +13,7 @@ from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from prometheus_client import start_http_server
 
 from config.config import get_settings
-from config.database import init_pool, close_pool
+from config.database import init_pool, close_pool, migrate_database, verify_event_id_format
 from routes import analytics_router, metrics_router
 from services import init_redis, close_redis
 
@@ -39,8 +39,11 @@ async def lifespan(app: FastAPI):
     trace.set_tracer_provider(provider)
     FastAPIInstrumentor.instrument_app(app)
 
-    # Init DB pool
+    # Migrate the schema, then init DB pool
+    if settings.MIGRATE_ON_STARTUP:
+        migrate_database()
     init_pool()
+    verify_event_id_format()
 
     # Initialize Redis connection
     await init_redis(settings.REDIS_URL)
@@ -6,8 +6,48 @@ and will obtain a pooled connection internally.
 """
 
 import psycopg2.extras
-from typing import List, Dict, Any
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional
 from common.decorators import with_cursor
+from shared.event_ids import to_db, to_hex
+from shared.rollups import rollups_ready
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MINUTE = timedelta(minutes=1)
+_HOUR = timedelta(hours=1)
+
+
+def _floor(ts: datetime, step: timedelta) -> datetime:
+    """Start of the UTC minute or hour containing ``ts`` (a rollup bucket)."""
+    return ts - (ts - _EPOCH) % step
+
+
+def _ceil(ts: datetime, step: timedelta) -> datetime:
+    floor = _floor(ts, step)
+    return floor if floor == ts else floor + step
+
+
+def _split_range(lo: datetime, hi: datetime) -> Dict[str, datetime]:
+    """Split ``[lo, hi]`` into rollup buckets and raw edges.
+
+    Whole hours ``[hours_lo, hours_hi)`` come from the hour rollups, the
+    whole minutes around them (``[minutes_lo, hours_lo)`` and
+    ``[hours_hi, minutes_hi)``) from the minute rollups, and the rest
+    (``[lo, minutes_lo)`` and ``[minutes_hi, hi]``) from events. Empty
+    parts are given as equal bounds.
+    """
+    minutes_lo, minutes_hi = _ceil(lo, _MINUTE), _floor(hi, _MINUTE)
+    if minutes_lo >= minutes_hi:
+        minutes_lo = minutes_hi = hours_lo = hours_hi = lo
+    else:
+        hours_lo, hours_hi = _ceil(lo, _HOUR), _floor(hi, _HOUR)
+        if hours_lo >= hours_hi:
+            hours_lo = hours_hi = minutes_hi
+    return {
+        "lo": lo, "hi": hi,
+        "minutes_lo": minutes_lo, "minutes_hi": minutes_hi,
+        "hours_lo": hours_lo, "hours_hi": hours_hi,
+    }
 
 
 class EventsRepo:
@@ -15,17 +55,35 @@ class EventsRepo:
 
     Use this when you already have a connection (for example via a
     dependency or a transaction). The instance methods do not require a
-    `conn` parameter.
+    `conn` parameter. `event_id_format` is the storage format of
+    `events.event_id` (see `shared.event_ids`); ids are taken and returned
+    as hex regardless. With `use_rollups`, counts and active users are read
+    from the rollup tables (migration `0004_event_rollups`), at a cost
+    proportional to the buckets in range rather than the events, provided
+    `rollup_state` says they count every event (`shared.rollups`);
+    otherwise the events table is queried as without it.
     """
 
-    def __init__(self, conn):
+    def __init__(self, conn, event_id_format: str = "text", use_rollups: bool = False):
         self._conn = conn
+        self._event_id_format = event_id_format
+        self._use_rollups = use_rollups
+        self._rollups_ready: Optional[bool] = None
         from typing import Any
 
         self._cur: Any = None
 
+    def _rollups(self) -> bool:
+        """Whether to read the rollups: requested, maintained and backfilled (checked once per repo)."""
+        if self._use_rollups and self._rollups_ready is None:
+            with self._conn.cursor() as cur:
+                self._rollups_ready = rollups_ready(cur)
+        return self._use_rollups and bool(self._rollups_ready)
+
     @with_cursor()
     def get_event_count(self, from_ts: str, to_ts: str) -> int:
+        if self._rollups():
+            return self._rollup_event_count(from_ts, to_ts)
         self._cur.execute(
             "SELECT COUNT(*) FROM events WHERE timestamp >= %s AND timestamp <= %s",
             (from_ts, to_ts),
@@ -33,17 +91,44 @@ class EventsRepo:
         row = self._cur.fetchone()
         return row[0]
 
-    @with_cursor(cursor_factory=psycopg2.extras.DictCursor)
-    def get_top_events(self, limit: int = 5) -> List[Dict[str, Any]]:
+    def _rollup_event_count(self, from_ts: str, to_ts: str) -> int:
+        self._cur.execute("SELECT %s::timestamptz, %s::timestamptz", (from_ts, to_ts))
+        lo, hi = self._cur.fetchone()
+        if lo > hi:
+            return 0
         self._cur.execute(
-            "SELECT event_name, COUNT(*) AS cnt FROM events GROUP BY event_name ORDER BY cnt DESC LIMIT %s",
-            (limit,),
+            """
+            SELECT (
+                (SELECT COALESCE(SUM(count), 0) FROM event_counts_hour
+                 WHERE bucket >= %(hours_lo)s AND bucket < %(hours_hi)s)
+              + (SELECT COALESCE(SUM(count), 0) FROM event_counts_minute
+                 WHERE (bucket >= %(minutes_lo)s AND bucket < %(hours_lo)s)
+                    OR (bucket >= %(hours_hi)s AND bucket < %(minutes_hi)s))
+              + (SELECT COUNT(*) FROM events
+                 WHERE (timestamp >= %(lo)s AND timestamp < %(minutes_lo)s)
+                    OR (timestamp >= %(minutes_hi)s AND timestamp <= %(hi)s))
+            )::bigint
+            """,
+            _split_range(lo, hi),
         )
+        return self._cur.fetchone()[0]
+
+    @with_cursor(cursor_factory=psycopg2.extras.DictCursor)
+    def get_top_events(self, limit: int = 5) -> List[Dict[str, Any]]:
+        if self._rollups():
+            sql = (
+                "SELECT event_name, SUM(count)::bigint AS cnt FROM event_counts_hour"
+                " GROUP BY event_name ORDER BY cnt DESC LIMIT %s"
+            )
+        else:
+            sql = "SELECT event_name, COUNT(*) AS cnt FROM events GROUP BY event_name ORDER BY cnt DESC LIMIT %s"
+        self._cur.execute(sql, (limit,))
         rows = self._cur.fetchall()
         return [{"event_name": r[0], "count": r[1]} for r in rows]
 
     def get_active_users(self, window_hours: int = 24) -> int:
-        from datetime import datetime, timedelta
+        if self._rollups():
+            return self._rollup_active_users(datetime.now(timezone.utc) - timedelta(hours=window_hours))
 
         since = datetime.utcnow() - timedelta(hours=window_hours)
 
@@ -58,6 +143,23 @@ class EventsRepo:
 
         return _inner(self)
 
+    @with_cursor()
+    def _rollup_active_users(self, since: datetime) -> int:
+        # Hour buckets from the first whole hour, minute buckets up to it, raw rows before the first whole minute
+        self._cur.execute(
+            """
+            SELECT COUNT(DISTINCT user_id) FROM (
+                SELECT user_id FROM user_counts_hour WHERE bucket >= %(hours_lo)s
+                UNION ALL
+                SELECT user_id FROM user_counts_minute WHERE bucket >= %(minutes_lo)s AND bucket < %(hours_lo)s
+                UNION ALL
+                SELECT user_id FROM events WHERE timestamp >= %(since)s AND timestamp < %(minutes_lo)s
+            ) active
+            """,
+            {"since": since, "minutes_lo": _ceil(since, _MINUTE), "hours_lo": _ceil(since, _HOUR)},
+        )
+        return self._cur.fetchone()[0]
+
     @with_cursor(cursor_factory=psycopg2.extras.DictCursor)
     def get_user_events(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         self._cur.execute(
@@ -70,6 +172,29 @@ class EventsRepo:
             for r in rows
         ]
 
+    @with_cursor(cursor_factory=psycopg2.extras.DictCursor)
+    def get_event(self, event_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            key = to_db(event_id, self._event_id_format)
+        except ValueError:
+            # Not hex: cannot match a binary id
+            return None
+        self._cur.execute(
+            "SELECT event_id, user_id, event_name, metadata, timestamp, processed_at FROM events WHERE event_id = %s",
+            (key,),
+        )
+        r = self._cur.fetchone()
+        if r is None:
+            return None
+        return {
+            "event_id": to_hex(r[0], self._event_id_format),
+            "user_id": r[1],
+            "event_name": r[2],
+            "metadata": r[3],
+            "timestamp": r[4].isoformat() if r[4] else None,
+            "processed_at": r[5].isoformat() if r[5] else None,
+        }
+
 
 __all__ = [
     "EventsRepo",
@@ -92,4 +92,17 @@ async def user_events(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/events/{event_id}")
+def get_event(event_id: str, repo: EventsRepo = Depends(get_events_repo)):
+    """Get a single event by the event_id returned at ingestion."""
+    queries_count.inc()
+    try:
+        event = repo.get_event(event_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if event is None:
+        raise HTTPException(status_code=404, detail="event not found")
+    return event
+
+
 __all__ = ["router"]
@@ -8,6 +8,7 @@ This module exposes a `get_events_repo` FastAPI dependency that yields an
 from contextlib import contextmanager
 from typing import Generator
 
+from config.config import get_settings
 from config.database import get_connection
 from repo.events import EventsRepo
 
@@ -15,7 +16,8 @@ from repo.events import EventsRepo
 @contextmanager
 def _repo_scope() -> Generator[EventsRepo, None, None]:
     with get_connection() as conn:
-        yield EventsRepo(conn)
+        settings = get_settings()
+        yield EventsRepo(conn, settings.EVENT_ID_FORMAT, use_rollups=settings.ANALYTICS_USE_ROLLUPS)
 
 
 def get_events_repo() -> Generator[EventsRepo, None, None]:
@@ -0,0 +1,10 @@
+"""Run with ``python -m pytest tests`` from ``analytics_service/``.
+
+The service imports its modules top-level (``config``, ``repo``, ``common``, ...) and
+the shared package from the repository root, as in the container.
+"""
+import os
+import sys
+
+SERVICE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [SERVICE, os.path.join(SERVICE, "..")]
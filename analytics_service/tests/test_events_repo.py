@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from repo.events import EventsRepo, _split_range
+
+T0 = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+S, M, H = timedelta(seconds=1), timedelta(minutes=1), timedelta(hours=1)
+
+
+def _floor(ts, step):
+    return T0 + (ts - T0) // step * step
+
+
+def times_counted(parts, ts):
+    """How many parts of the split count an event at ``ts``, as the rollup query does."""
+    hour, minute = _floor(ts, H), _floor(ts, M)
+    return (
+        (parts["hours_lo"] <= hour < parts["hours_hi"])
+        + (parts["minutes_lo"] <= minute < parts["hours_lo"])
+        + (parts["hours_hi"] <= minute < parts["minutes_hi"])
+        + (parts["lo"] <= ts < parts["minutes_lo"])
+        + (parts["minutes_hi"] <= ts <= parts["hi"])
+    )
+
+
+def assert_exact(lo, hi):
+    parts = _split_range(lo, hi)
+    step = timedelta(seconds=7)
+    ts = lo - 2 * H
+    while ts <= hi + 2 * H:
+        assert times_counted(parts, ts) == (1 if lo <= ts <= hi else 0), ts
+        ts += step
+    for edge in (lo, hi):
+        assert times_counted(parts, edge) == 1
+    return parts
+
+
+@pytest.mark.parametrize(
+    "lo, hi",
+    [
+        (T0, T0 + 3 * H),
+        (T0 + 5 * M, T0 + 2 * H + 10 * M),
+        (T0 + 5 * M + 30 * S, T0 + 2 * H + 10 * M + 15 * S),
+        (T0 + 10 * S, T0 + 50 * S),
+        (T0 + 50 * S, T0 + M + 10 * S),
+        (T0 + 5 * M + 30 * S, T0 + 40 * M + 15 * S),
+        (T0 + 50 * M, T0 + H + 10 * M),
+        (T0, T0),
+    ],
+)
+def test_split_counts_every_event_in_range_once(lo, hi):
+    assert_exact(lo, hi)
+
+
+def test_bucket_boundaries_are_read_from_rollups():
+    parts = assert_exact(T0, T0 + 3 * H)
+    assert (parts["hours_lo"], parts["hours_hi"]) == (T0, T0 + 3 * H)
+    # Only the event at exactly ``hi`` is left to the events table
+    assert (parts["minutes_lo"], parts["minutes_hi"]) == (T0, T0 + 3 * H)
+
+
+def test_range_under_a_minute_is_read_from_events():
+    parts = assert_exact(T0 + 10 * S, T0 + 50 * S)
+    assert parts["minutes_lo"] == parts["minutes_hi"] == parts["hours_lo"] == parts["hours_hi"]
+
+
+def test_range_under_an_hour_is_read_from_minutes():
+    parts = assert_exact(T0 + 5 * M + 30 * S, T0 + 40 * M + 15 * S)
+    assert (parts["minutes_lo"], parts["minutes_hi"]) == (T0 + 6 * M, T0 + 40 * M)
+    assert parts["hours_lo"] == parts["hours_hi"]
+
+
+class StubCursor:
+    def __init__(self, row):
+        self.row = row
+        self.queries = []
+
+    def execute(self, sql, params=None):
+        self.queries.append(sql)
+
+    def fetchone(self):
+        return self.row
+
+
+def test_reversed_range_counts_nothing():
+    lo, hi = T0 + H, T0
+    parts = _split_range(lo, hi)
+    assert all(times_counted(parts, T0 + i * M) == 0 for i in range(-120, 180))
+
+    repo = EventsRepo(None, use_rollups=True)
+    repo._cur = StubCursor((lo, hi))
+    assert repo._rollup_event_count(lo.isoformat(), hi.isoformat()) == 0
+    # Only the timestamps were parsed; the rollups were not queried
+    assert len(repo._cur.queries) == 1
@@ -1,5 +1,6 @@
 from functools import lru_cache
 from pydantic_settings import BaseSettings
+from typing import Dict
 
 class Settings(BaseSettings):
     KAFKA_TOPIC: str = "events"
@@ -8,13 +9,94 @@ class Settings(BaseSettings):
 
     METRICS_PORT: int = 8003
 
+    # Consumer processes in the consumer group; with more than one, a
+    # supervisor runs them and serves their aggregated metrics
+    WORKERS: int = 1
+    # Directory for per-worker metric files, used when WORKERS > 1
+    PROMETHEUS_MULTIPROC_DIR: str = "/tmp/consumer-metrics"
+
     OTEL_EXPORTER_OTLP_ENDPOINT: str = "http://otel-collector:4318"
 
     BATCH_SIZE: int = 500  
     BATCH_TIMEOUT: float = 0.5  
 
+    # Adaptive batching: batch size and flush interval follow insert latency
+    # and lag; BATCH_SIZE is the starting size, BATCH_TIMEOUT the longest interval
+    ADAPTIVE_BATCHING: bool = False
+    TARGET_LATENCY: float = 1.0
+    BATCH_SIZE_MIN: int = 100
+    BATCH_SIZE_MAX: int = 20000
+
+    # How batches are written: "values" (INSERT ... VALUES) or "copy"
+    # (COPY into a staging table, then INSERT ... SELECT)
+    WRITE_STRATEGY: str = "values"
+
+    # Transient write / DLQ failures are retried after a random delay of up
+    # to min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt) seconds
+    RETRY_BACKOFF_BASE: float = 0.5
+    RETRY_BACKOFF_MAX: float = 30.0
+
+    # Where consumed offsets are kept: "kafka" (committed to the group after
+    # each batch) or "postgres" (the consumer_offsets table, in the same
+    # transaction as the batch's rows; partitions resume from it on assignment)
+    OFFSET_STORAGE: str = "kafka"
+    # False drops ON CONFLICT DO NOTHING from the insert (copy then loads
+    # straight into events unless ROLLUPS_ENABLED); a batch with an existing
+    # event_id fails and is written again with the check
+    CONFLICT_CHECK: bool = True
+    # Longest wait on a rebalance for fetched batches to be written and committed
+    REBALANCE_DRAIN_TIMEOUT: float = 30.0
+
+    # Apply pending schema migrations (shared/migrations) at startup; turn off
+    # to run "python -m shared.migrations" separately, e.g. for index builds
+    # on a large table
+    MIGRATE_ON_STARTUP: bool = True
+
+    # How events.event_id stores the 64-hex-character SHA-256 id: "text",
+    # "bytea" (the 32 raw bytes) or "uuid" (its first 128 bits); must match
+    # the column, see shared/event_ids.py and tools/migrate_event_ids.py
+    EVENT_ID_FORMAT: str = "text"
+
+    # Add each write's rows to the per-minute and per-hour rollup tables
+    # (event_counts_*, user_counts_*) in the same statement as the insert.
+    # Recorded in rollup_state at startup; the analytics service only reads
+    # the rollups while they are maintained and backfilled
+    ROLLUPS_ENABLED: bool = True
+
+    # Range partitioning of events on timestamp: "none", "daily" or "hourly".
+    # PARTITION_PRECREATE future periods are created ahead; partitions that
+    # ended more than EVENTS_RETENTION_DAYS ago (0 keeps all) are dropped or
+    # detached (RETENTION_ACTION); checked every PARTITION_MAINTENANCE_INTERVAL seconds
+    EVENTS_PARTITIONING: str = "none"
+    PARTITION_PRECREATE: int = 3
+    EVENTS_RETENTION_DAYS: float = 0
+    RETENTION_ACTION: str = "drop"
+    PARTITION_MAINTENANCE_INTERVAL: float = 600.0
+
+    # Pipeline: fetch -> parse -> write stages joined by bounded queues
+    FETCH_TIMEOUT_MS: int = 100
+    PIPELINE_QUEUE_SIZE: int = 4
+    KAFKA_MAX_PARTITION_FETCH_BYTES: int = 1024 * 1024
+    # Fetched chunks of at least this many records are decoded in a process
+    # pool of DECODE_POOL_WORKERS processes; 0 decodes everything inline
+    DECODE_POOL_THRESHOLD: int = 0
+    DECODE_POOL_WORKERS: int = 2
+
+    # Postgres connection pool: MAX_CONNECTIONS bounds open connections
+    # (POOL_MIN_CONNECTIONS are opened at startup, the rest on demand),
+    # CONNECTION_TIMEOUT bounds the wait for a free one
     MAX_CONNECTIONS: int = 20
     CONNECTION_TIMEOUT: float = 30.0
+    POOL_MIN_CONNECTIONS: int = 1
+    POOL_MAX_LIFETIME: float = 1800.0
+    POOL_HEALTHCHECK_IDLE: float = 30.0
+
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = True
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLE_RATES: Dict[str, float] = {}
+    LOG_EXCEPTION_BURST: int = 10
+    LOG_EXCEPTION_INTERVAL: float = 60.0
 
     class Config:
         env_file = ".env"
@@ -26,7 +108,10 @@ def get_settings() -> Settings:
     return Settings()
 
 from .queue.config import create_consumer, create_dlq_producer
-from .database.config import get_database_settings, init_db, ensure_table, get_conn
+from .database.config import (
+    get_database_settings, init_db, init_pool, close_pool, migrate_database, verify_event_id_format, get_conn,
+    sync_rollup_state,
+)
 from .tracing.config import init_tracer
 
 
@@ -38,6 +123,10 @@ __all__ = [
     "init_tracer",
     "get_database_settings",
     "init_db",
+    "init_pool",
+    "close_pool",
     "get_conn",
-    "ensure_table",
+    "migrate_database",
+    "verify_event_id_format",
+    "sync_rollup_state",
 ]
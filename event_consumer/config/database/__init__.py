@@ -1,3 +1,18 @@
-from .config import get_database_settings, init_database_connection, ensure_table
+from .config import (
+    get_database_settings, init_db, init_pool, close_pool, get_conn, migrate_database, verify_event_id_format,
+    sync_rollup_state,
+)
+from .pool import ConnectionPool, PoolTimeoutError
 
-__all__ = ["get_database_settings", "init_database_connection", "ensure_table"]
\ No newline at end of file
+__all__ = [
+    "get_database_settings",
+    "init_db",
+    "init_pool",
+    "close_pool",
+    "get_conn",
+    "migrate_database",
+    "verify_event_id_format",
+    "sync_rollup_state",
+    "ConnectionPool",
+    "PoolTimeoutError",
+]
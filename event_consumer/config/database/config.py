@@ -4,6 +4,12 @@ from functools import lru_cache
 from pydantic_settings import BaseSettings
 from urllib.parse import quote_plus
 from contextlib import contextmanager
+from typing import Optional
+
+from shared.event_ids import verify_format
+from shared.migrations import migrate
+from shared.rollups import start_maintaining, stop_maintaining
+from .pool import ConnectionPool, PoolTimeoutError
 
 logger = logging.getLogger("consumer")
 
@@ -34,57 +40,119 @@ def get_database_settings():
     return get_postgres_settings()
 
 
+def _dsn() -> str:
+    pg = get_postgres_settings()
+    return f"postgresql://{pg.POSTGRES_USER}:{quote_plus(pg.POSTGRES_PASSWORD)}@{pg.POSTGRES_HOST}:{pg.POSTGRES_PORT}/{pg.POSTGRES_DB}"
+
+
 def init_db():
     """Initialize and return a PostgreSQL connection using shared settings.
 
     Returns:
         psycopg2.connection: Database connection
     """
-    pg = get_postgres_settings()
-    dsn = f"postgresql://{pg.POSTGRES_USER}:{quote_plus(pg.POSTGRES_PASSWORD)}@{pg.POSTGRES_HOST}:{pg.POSTGRES_PORT}/{pg.POSTGRES_DB}"
-
-    conn = psycopg2.connect(dsn)
+    conn = psycopg2.connect(_dsn())
     logger.info("database connection established")
     return conn
 
+
+# Connection pool instance (module scoped)
+_pool: Optional[ConnectionPool] = None
+
+
+def init_pool(settings=None) -> ConnectionPool:
+    """Create the module connection pool if it does not exist yet.
+
+    Args:
+        settings: Consumer settings (``MAX_CONNECTIONS``, ``CONNECTION_TIMEOUT``,
+            ``POOL_*``); defaults to ``get_settings()``
+    """
+    global _pool
+    if _pool is None:
+        if settings is None:
+            from config.config import get_settings
+            settings = get_settings()
+        _pool = ConnectionPool(
+            _dsn(),
+            minconn=settings.POOL_MIN_CONNECTIONS,
+            maxconn=settings.MAX_CONNECTIONS,
+            timeout=settings.CONNECTION_TIMEOUT,
+            max_lifetime=settings.POOL_MAX_LIFETIME,
+            healthcheck_idle=settings.POOL_HEALTHCHECK_IDLE,
+        )
+        logger.info("database pool ready (max %s connections)", settings.MAX_CONNECTIONS)
+    return _pool
+
+
+def close_pool():
+    """Close all pooled connections. Call at shutdown."""
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
+
 @contextmanager
 def get_conn():
-    """Context manager that yields a fresh DB connection and ensures it is closed.
+    """Context manager that yields a pooled DB connection.
 
-    This keeps the lifecycle local to callers and supports dependency injection
-    by passing this factory around. Creating/closing a connection per use is
-    intentional here to simplify resource ownership and make behavior explicit.
+    The connection goes back to the pool when the block exits; an open
+    transaction is rolled back and a broken connection is replaced. Callers
+    pass this factory around, so the pool is created on first use.
+
+    Raises:
+        PoolTimeoutError: no connection became free within ``CONNECTION_TIMEOUT``
     """
-    conn = None
-    try:
-        conn = init_db()
+    with init_pool().connection() as conn:
         yield conn
-    finally:
-        if conn:
-            try:
-                conn.close()
-            except Exception:
-                pass
 
 
-def ensure_table(conn):
-    """Ensure the events table exists in the database.
+def migrate_database(partitioning="none", event_id_format="text"):
+    """Apply pending schema migrations (``shared.migrations``) on a dedicated connection.
 
     Args:
-        conn: psycopg2 database connection
+        partitioning: ``EVENTS_PARTITIONING``, the layout used if the events
+            table does not exist yet
+        event_id_format: ``EVENT_ID_FORMAT``, the ``event_id`` type used if
+            the events table does not exist yet
+
+    Returns:
+        list: versions applied
     """
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS events (
-                event_id TEXT PRIMARY KEY,
-                user_id TEXT NOT NULL,
-                event_name TEXT NOT NULL,
-                metadata JSONB,
-                timestamp TIMESTAMP WITH TIME ZONE,
-                processed_at TIMESTAMP WITH TIME ZONE DEFAULT now()
-            )
-            """
-        )
+    conn = init_db()
+    try:
+        return migrate(conn, {"partitioning": partitioning, "event_id_format": event_id_format})
+    finally:
+        conn.close()
+
+
+def verify_event_id_format(event_id_format="text"):
+    """Check that ``EVENT_ID_FORMAT`` matches the type of ``events.event_id``.
+
+    Raises:
+        RuntimeError: the column is stored in another format; writing ids in
+            the wrong one would fail every batch (or, for bytea, store the
+            hex text as bytes)
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            verify_format(cur, event_id_format)
+        conn.rollback()
+
+
+def sync_rollup_state(enabled=True):
+    """Record in ``rollup_state`` whether this consumer maintains the rollups (``ROLLUPS_ENABLED``).
+
+    Enabling them empties and restarts the rollups if they were not
+    maintained; disabling them tells the analytics service to stop reading
+    them, because this consumer's rows will be missing (see ``shared.rollups``).
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            if enabled:
+                since = start_maintaining(cur)
+                if since is not None:
+                    logger.info("rollups restarted, maintained from %s", since)
+            elif stop_maintaining(cur):
+                logger.warning("ROLLUPS_ENABLED is off: rollups are no longer maintained")
         conn.commit()
-    logger.info("events table verified")
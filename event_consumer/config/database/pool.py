@@ -0,0 +1,190 @@
+"""Thread-safe psycopg2 connection pool with bounded waits, health checks and recycling.
+
+``psycopg2.pool.ThreadedConnectionPool`` raises as soon as it is exhausted
+and closes returned connections once ``minconn`` are idle, so a busy
+process reconnects on nearly every checkout. This pool keeps every
+connection it opened (up to ``maxconn``) until it breaks or expires, makes
+callers wait up to ``timeout`` seconds for a connection, checks connections
+that sat idle before handing them out, replaces connections older than
+``max_lifetime`` and drops connections that broke while in use.
+"""
+
+import collections
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+import psycopg2
+from psycopg2 import extensions
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger("consumer")
+
+pool_wait = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a pooled Postgres connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30),
+)
+pool_in_use = Gauge("db_pool_connections_in_use", "Pooled Postgres connections checked out", multiprocess_mode="livesum")
+pool_open = Gauge("db_pool_connections_open", "Postgres connections currently open in the pool", multiprocess_mode="livesum")
+pool_max = Gauge("db_pool_connections_max", "Maximum Postgres connections in the pool", multiprocess_mode="livesum")
+pool_timeouts = Counter("db_pool_timeouts_total", "Requests that gave up waiting for a pooled connection")
+pool_recycled = Counter(
+    "db_pool_recycled_total", "Connections closed and replaced by the pool, by reason (lifetime, unhealthy, broken)", ["reason"]
+)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection became free within the pool timeout."""
+
+
+class ConnectionPool:
+    """Bounded pool of Postgres connections shared by threads.
+
+    Connections are opened on demand and returned to an idle stack; the
+    most recently used one is handed out first.
+
+    Args:
+        dsn: Connection string
+        minconn: Connections opened up front
+        maxconn: Upper bound on open connections
+        timeout: Seconds to wait for a free connection before ``PoolTimeoutError``
+        max_lifetime: Seconds after which a connection is closed and replaced
+        healthcheck_idle: Connections idle for longer are checked with ``SELECT 1``
+    """
+
+    def __init__(self, dsn: str, minconn: int, maxconn: int, timeout: float, max_lifetime: float, healthcheck_idle: float):
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.healthcheck_idle = healthcheck_idle
+        self._dsn = dsn
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._idle = collections.deque()
+        # Keyed by connection object: every open connection, idle or in use
+        self._opened_at: Dict[extensions.connection, float] = {}
+        self._last_used: Dict[extensions.connection, float] = {}
+        self._in_use = 0
+        pool_max.set(maxconn)
+        pool_open.set(0)
+        for _ in range(minconn):
+            self._idle.append(self._connect())
+
+    @contextmanager
+    def connection(self):
+        """Check out a healthy connection for the duration of the block.
+
+        Raises:
+            PoolTimeoutError: no connection became free within ``timeout``
+        """
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            pool_timeouts.inc()
+            raise PoolTimeoutError(f"no Postgres connection free after {self.timeout}s")
+        pool_wait.observe(time.monotonic() - start)
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        self._track_in_use(1)
+        try:
+            yield conn
+        finally:
+            self._checkin(conn)
+            self._track_in_use(-1)
+            self._slots.release()
+
+    def close(self):
+        """Close every connection of the pool."""
+        with self._lock:
+            conns = list(self._opened_at)
+            self._idle.clear()
+            self._opened_at.clear()
+            self._last_used.clear()
+            pool_open.set(0)
+        for conn in conns:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+
+    def _track_in_use(self, delta: int):
+        with self._lock:
+            self._in_use += delta
+            pool_in_use.set(self._in_use)
+
+    def _connect(self):
+        conn = psycopg2.connect(self._dsn)
+        now = time.monotonic()
+        with self._lock:
+            self._opened_at[conn] = now
+            self._last_used[conn] = now
+            pool_open.set(len(self._opened_at))
+        return conn
+
+    def _checkout(self):
+        # The caller holds a slot, so when no connection is idle fewer than
+        # maxconn are open and a new one may be opened
+        while True:
+            with self._lock:
+                if not self._idle:
+                    conn = None
+                else:
+                    conn = self._idle.pop()
+                    opened_at = self._opened_at[conn]
+                    last_used = self._last_used[conn]
+            if conn is None:
+                return self._connect()
+            now = time.monotonic()
+            if conn.closed:
+                self._discard(conn, "broken")
+            elif now - opened_at > self.max_lifetime:
+                self._discard(conn, "lifetime")
+            elif now - last_used > self.healthcheck_idle and not self._healthy(conn):
+                self._discard(conn, "unhealthy")
+            else:
+                return conn
+
+    def _healthy(self, conn) -> bool:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            logger.warning("discarding unhealthy pooled connection")
+            return False
+
+    def _checkin(self, conn):
+        if not conn.closed and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+        if conn.closed:
+            self._discard(conn, "broken")
+            return
+        with self._lock:
+            if conn not in self._opened_at:
+                # Opened before a close() of the pool
+                conn.close()
+                return
+            self._last_used[conn] = time.monotonic()
+            self._idle.append(conn)
+
+    def _discard(self, conn, reason: str):
+        with self._lock:
+            self._opened_at.pop(conn, None)
+            self._last_used.pop(conn, None)
+            pool_open.set(len(self._opened_at))
+        pool_recycled.labels(reason=reason).inc()
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+
+__all__ = ["ConnectionPool", "PoolTimeoutError"]
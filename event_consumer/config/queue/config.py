@@ -1,20 +1,26 @@
-import json
-from kafka import KafkaConsumer, KafkaProducer
+from aiokafka import AIOKafkaConsumer, AIOKafkaProducer
 
 
-def create_consumer(settings) -> KafkaConsumer:
-    """Create and return a configured KafkaConsumer using provided settings."""
-    return KafkaConsumer(
+def create_consumer(settings) -> AIOKafkaConsumer:
+    """Create (but do not start) the AIOKafkaConsumer for the events topic.
+
+    Auto-commit is disabled: the pipeline commits offsets only after the
+    rows of a batch were written to Postgres (or sent to the DLQ).
+    """
+    return AIOKafkaConsumer(
         settings.KAFKA_TOPIC,
-        bootstrap_servers=[settings.KAFKA_SERVER],
+        bootstrap_servers=settings.KAFKA_SERVER,
         group_id=settings.KAFKA_GROUP,
         auto_offset_reset="earliest",
-        enable_auto_commit=True,
-        consumer_timeout_ms=1000,
-        value_deserializer=lambda v: v.decode() if isinstance(v, (bytes, bytearray)) else v,
+        enable_auto_commit=False,
+        max_partition_fetch_bytes=settings.KAFKA_MAX_PARTITION_FETCH_BYTES,
     )
 
 
-def create_dlq_producer(settings) -> KafkaProducer:
-    """Create a KafkaProducer for DLQ messages."""
-    return KafkaProducer(bootstrap_servers=[settings.KAFKA_SERVER], value_serializer=lambda v: json.dumps(v).encode("utf-8"))
+def create_dlq_producer(settings) -> AIOKafkaProducer:
+    """Create (but do not start) the producer for DLQ messages.
+
+    Values are forwarded as the original bytes together with the original
+    headers, so JSON and msgpack messages stay readable in the DLQ.
+    """
+    return AIOKafkaProducer(bootstrap_servers=settings.KAFKA_SERVER)
@@ -1,7 +1,9 @@
-import time
+import os
+import shutil
+import signal
 import asyncio
 import logging
-from prometheus_client import Counter, start_http_server
+from prometheus_client import CollectorRegistry, multiprocess, start_http_server
 
 from config.config import (
     get_settings, 
@@ -9,80 +11,108 @@ from config.config import (
     create_dlq_producer, 
     init_tracer,
     get_conn,
-    ensure_table
+    init_pool,
+    close_pool,
+    migrate_database,
+    verify_event_id_format,
+    sync_rollup_state,
 )
-from utils import process_batch
+from repo.events import write_strategy
+from utils import PartitionManager, Pipeline, Supervisor
+from shared.logs import setup_logging
 
 settings = get_settings()
 
 logger = logging.getLogger("consumer")
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
-
-consumer_lag = Counter("consumer_lag_total", "Consumer lag samples (approx)")
+log_listener = setup_logging(
+    "event-consumer",
+    level=settings.LOG_LEVEL,
+    json_output=settings.LOG_JSON,
+    queue_size=settings.LOG_QUEUE_SIZE,
+    sample_rates=settings.LOG_SAMPLE_RATES,
+    exception_burst=settings.LOG_EXCEPTION_BURST,
+    exception_interval=settings.LOG_EXCEPTION_INTERVAL,
+)
 
 tracer = init_tracer(settings, service_name="event-consumer")
 
 
-async def main():
-    start_http_server(settings.METRICS_PORT)
-    logger.info("metrics available on %s", settings.METRICS_PORT)
+def prepare_database():
+    """Migrate the schema, record ``ROLLUPS_ENABLED`` and create current partitions once, before any worker writes."""
+    if settings.MIGRATE_ON_STARTUP:
+        migrate_database(settings.EVENTS_PARTITIONING, settings.EVENT_ID_FORMAT)
+    init_pool(settings)
+    verify_event_id_format(settings.EVENT_ID_FORMAT)
+    sync_rollup_state(settings.ROLLUPS_ENABLED)
+    PartitionManager(get_conn, settings).maintain()
 
-    consumer = create_consumer(settings)
-    
-    with get_conn() as conn:
-        ensure_table(conn)
-
-    batch = []
-    batch_size = settings.BATCH_SIZE
-    batch_timeout = settings.BATCH_TIMEOUT
-    last_flush = time.time()
 
+async def consume():
+    """Run one consumer pipeline until SIGINT/SIGTERM."""
+    init_pool(settings)
+    consumer = create_consumer(settings)
     dlq_producer = create_dlq_producer(settings)
+    insert_fn = write_strategy(settings.WRITE_STRATEGY, settings.EVENT_ID_FORMAT, settings.ROLLUPS_ENABLED)
+    pipeline = Pipeline(consumer, dlq_producer, get_conn, settings, insert_fn=insert_fn)
+    # Replaces the subscription made by create_consumer, adding the pipeline's rebalance listener
+    consumer.subscribe([settings.KAFKA_TOPIC], listener=pipeline.rebalance_listener)
+    await consumer.start()
+    await dlq_producer.start()
 
-    async def _process_batch_with_retry(batch_to_proc):
-        """Process batch with async retry logic."""
-        for attempt in range(3):
-            try:
-                await process_batch(batch_to_proc, get_conn)
-                return
-            except Exception as e:
-                if attempt == 2:  
-                    logger.exception("batch processing failed after retries, sending to DLQ: %s", e)
-                    for failed_msg in batch_to_proc:
-                        try:
-                            payload = failed_msg.value.decode() if isinstance(failed_msg.value, (bytes, bytearray)) else failed_msg.value
-                            dlq_producer.send(settings.KAFKA_TOPIC + "-dlq", payload)
-                        except Exception:
-                            logger.exception("failed to send to dlq")
-                else:
-                    wait_time = 2 ** attempt  
-                    logger.warning(f"batch processing failed (attempt {attempt + 1}), retrying in {wait_time}s")
-                    await asyncio.sleep(wait_time)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, pipeline.stop)
+    partitions = asyncio.create_task(PartitionManager(get_conn, settings).run())
 
     try:
-        while True:
-            for msg in consumer:
-                batch.append(msg)
-                consumer_lag.inc()
-                now = time.time()
-                if len(batch) >= batch_size or (now - last_flush) >= batch_timeout:
-                    await _process_batch_with_retry(batch)
-                    batch = []
-                    last_flush = now
-            
-            if batch:
-                await _process_batch_with_retry(batch)
-                batch = []
-            
-            await asyncio.sleep(0.1) 
-            
-    except KeyboardInterrupt:
+        await pipeline.run()
         logger.info("shutting down consumer")
     finally:
-        consumer.close()
-        dlq_producer.flush()
-        dlq_producer.close()
+        partitions.cancel()
+        await consumer.stop()
+        await dlq_producer.stop()
+        close_pool()
+
+
+def run_worker(index: int):
+    """Entry point of a worker process started by the supervisor."""
+    logger.info("consumer worker %s running (pid %s)", index, os.getpid())
+    try:
+        asyncio.run(consume())
+    finally:
+        log_listener.stop()
+
+
+def supervise():
+    """Run ``WORKERS`` consumer processes and serve their aggregated metrics."""
+    # Must be set before the workers import prometheus_client
+    metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.PROMETHEUS_MULTIPROC_DIR)
+    # Files left by a previous run would be added to this run's counters
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    start_http_server(settings.METRICS_PORT, registry=registry)
+    logger.info("metrics for %s workers available on %s", settings.WORKERS, settings.METRICS_PORT)
+
+    Supervisor(run_worker, settings.WORKERS).run()
+
+
+def main():
+    prepare_database()
+    try:
+        if settings.WORKERS > 1:
+            # Workers open their own pools
+            close_pool()
+            supervise()
+        else:
+            start_http_server(settings.METRICS_PORT)
+            logger.info("metrics available on %s", settings.METRICS_PORT)
+            asyncio.run(consume())
+    finally:
+        log_listener.stop()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
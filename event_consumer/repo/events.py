@@ -1,35 +1,36 @@
+import functools
+import io
 import logging
 from opentelemetry import trace
 from psycopg2.extras import execute_values
 
+from shared.event_ids import to_db
+
+from .rollups import with_rollups
+
 logger = logging.getLogger("consumer")
 
+COLUMNS = ("event_id", "user_id", "event_name", "metadata", "timestamp")
 
-def insert_events(rows, get_conn):
-    """Insert rows into the events table using the provided connection factory.
+_COLUMN_LIST = ", ".join(COLUMNS)
 
-    Args:
-        rows: list of row tuples to insert
-        get_conn: a contextmanager that yields a DB connection (e.g., from config.get_conn)
+# Characters that must be escaped in COPY text format
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
 
-    Returns:
-        int: number of rows attempted to insert (len(rows))
-    """
-    if not rows:
-        return 0
 
-    tracer = trace.get_tracer("event-consumer.repo")
-    sql = (
-        "INSERT INTO events (event_id, user_id, event_name, metadata, timestamp)"
-        " VALUES %s ON CONFLICT (event_id) DO NOTHING"
-    )
+def _run_in_transaction(get_conn, span_name, write):
+    """Run ``write(cursor)`` in one transaction and return its result.
 
+    The transaction is rolled back and the error re-raised on failure.
+    """
+    tracer = trace.get_tracer("event-consumer.repo")
     with get_conn() as conn:
         try:
             with conn.cursor() as cur:
-                with tracer.start_as_current_span("db.insert_events"):
-                    execute_values(cur, sql, rows)
+                with tracer.start_as_current_span(span_name):
+                    result = write(cur)
             conn.commit()
+            return result
         except Exception:
             logger.exception("failed to insert rows in repo")
             try:
@@ -38,4 +39,145 @@ def insert_events(rows, get_conn):
                 pass
             raise
 
-    return len(rows)
+
+def _convert_ids(rows, event_id_format):
+    """Rows with ``event_id`` converted from hex to its storage format (see ``shared.event_ids``).
+
+    Raises:
+        ValueError: an ``event_id`` is not hex, so the batch fails as a
+            permanent error and bisection isolates the record
+    """
+    if event_id_format == "text":
+        return rows
+    return [(to_db(row[0], event_id_format),) + tuple(row[1:]) for row in rows]
+
+
+def _on_conflict(on_conflict):
+    # No conflict target: a time-partitioned events table is keyed on
+    # (event_id, timestamp), and event_id already hashes the timestamp
+    return " ON CONFLICT DO NOTHING" if on_conflict else ""
+
+
+def insert_events(rows, get_conn, on_conflict=True, in_transaction=None, event_id_format="text", rollups=False):
+    """Insert rows into the events table using the provided connection factory.
+
+    All rows go into a single ``INSERT ... VALUES`` statement, so the
+    cursor's rowcount is the number of rows actually inserted. With
+    ``rollups`` the statement also adds the inserted rows to the rollup
+    tables (``repo.rollups``).
+
+    Args:
+        rows: list of row tuples to insert
+        get_conn: a contextmanager that yields a DB connection (e.g., from config.get_conn)
+        on_conflict: skip rows whose event_id already exists; when False a
+            duplicate fails the whole insert with a unique violation
+        in_transaction: optional ``fn(cursor)`` run after the insert in the
+            same transaction (e.g. ``repo.offsets.store_offsets``)
+        event_id_format: storage format of ``event_id`` (``EVENT_ID_FORMAT``);
+            row ids are hex strings either way
+        rollups: maintain the rollup tables (``ROLLUPS_ENABLED``)
+
+    Returns:
+        int: number of rows inserted; rows whose event_id already exists are skipped
+    """
+    if not rows:
+        return 0
+
+    rows = _convert_ids(rows, event_id_format)
+    sql = f"INSERT INTO events ({_COLUMN_LIST}) VALUES %s" + _on_conflict(on_conflict)
+    if rollups:
+        sql = with_rollups(sql)
+
+    def write(cur):
+        if rollups:
+            inserted = execute_values(cur, sql, rows, page_size=len(rows), fetch=True)[0][0]
+        else:
+            execute_values(cur, sql, rows, page_size=len(rows))
+            inserted = cur.rowcount
+        if in_transaction is not None:
+            in_transaction(cur)
+        return inserted
+
+    return _run_in_transaction(get_conn, "db.insert_events", write)
+
+
+def _copy_field(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bytes):
+        # bytea hex input, "\x..." with the backslash escaped for COPY
+        return "\\\\x" + value.hex()
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def copy_events(rows, get_conn, on_conflict=True, in_transaction=None, event_id_format="text", rollups=False):
+    """Bulk load rows with COPY into a staging table, then merge them into events.
+
+    The staging table is a session-local temporary table emptied on commit,
+    so it costs no WAL and is private to the pooled connection that uses it.
+    The merge is a single ``INSERT ... SELECT ... ON CONFLICT DO NOTHING``.
+    Without ``on_conflict`` there is nothing to merge: the rows are copied
+    straight into events, unless ``rollups`` needs the merge to count them.
+
+    Args:
+        rows: list of row tuples to insert
+        get_conn: a contextmanager that yields a DB connection
+        on_conflict: skip rows whose event_id already exists; when False a
+            duplicate fails the whole load with a unique violation
+        in_transaction: optional ``fn(cursor)`` run after the load in the
+            same transaction
+        event_id_format: storage format of ``event_id`` (``EVENT_ID_FORMAT``)
+        rollups: maintain the rollup tables (``ROLLUPS_ENABLED``)
+
+    Returns:
+        int: number of rows inserted; rows whose event_id already exists are skipped
+    """
+    if not rows:
+        return 0
+
+    buf = io.StringIO()
+    for row in _convert_ids(rows, event_id_format):
+        buf.write("\t".join(_copy_field(v) for v in row))
+        buf.write("\n")
+    buf.seek(0)
+
+    def write(cur):
+        if on_conflict or rollups:
+            cur.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS events_staging"
+                " (LIKE events INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+            )
+            cur.copy_expert(f"COPY events_staging ({_COLUMN_LIST}) FROM STDIN", buf)
+            merge = (
+                f"INSERT INTO events ({_COLUMN_LIST}) SELECT {_COLUMN_LIST} FROM events_staging"
+                + _on_conflict(on_conflict)
+            )
+            if rollups:
+                cur.execute(with_rollups(merge))
+                inserted = cur.fetchone()[0]
+            else:
+                cur.execute(merge)
+                inserted = cur.rowcount
+        else:
+            cur.copy_expert(f"COPY events ({_COLUMN_LIST}) FROM STDIN", buf)
+            inserted = cur.rowcount
+        if in_transaction is not None:
+            in_transaction(cur)
+        return inserted
+
+    return _run_in_transaction(get_conn, "db.copy_events", write)
+
+
+WRITE_STRATEGIES = {
+    "values": insert_events,
+    "copy": copy_events,
+}
+
+
+def write_strategy(name, event_id_format="text", rollups=False):
+    """The ``WRITE_STRATEGIES`` insert function ``name``, writing ids in
+    ``event_id_format`` and maintaining the rollup tables if ``rollups``."""
+    insert_fn = WRITE_STRATEGIES[name]
+    if event_id_format == "text" and not rollups:
+        return insert_fn
+    return functools.partial(insert_fn, event_id_format=event_id_format, rollups=rollups)
@@ -0,0 +1,59 @@
+import logging
+from psycopg2.extras import execute_values
+
+from .events import _run_in_transaction
+
+logger = logging.getLogger("consumer")
+
+
+def store_offsets(cur, group_id, offsets):
+    """Upsert the next offsets to read of a consumer group, on the caller's cursor.
+
+    Called inside the transaction that inserts the rows they cover, so the
+    rows and the offsets are committed together or not at all. Stored
+    offsets never move backwards: a consumer that lost its partitions in a
+    rebalance cannot rewind the new owner.
+
+    Args:
+        cur: psycopg2 cursor of the write transaction
+        group_id: Kafka consumer group
+        offsets: ``{(topic, partition): next offset to read}``
+    """
+    if not offsets:
+        return
+    execute_values(
+        cur,
+        "INSERT INTO consumer_offsets (group_id, topic, partition, next_offset) VALUES %s"
+        " ON CONFLICT (group_id, topic, partition) DO UPDATE"
+        " SET next_offset = GREATEST(consumer_offsets.next_offset, EXCLUDED.next_offset), updated_at = now()",
+        [(group_id, topic, partition, offset) for (topic, partition), offset in offsets.items()],
+    )
+
+
+def commit_offsets(get_conn, group_id, offsets):
+    """Store offsets in a transaction of their own, for batches without rows to insert."""
+    _run_in_transaction(get_conn, "db.commit_offsets", lambda cur: store_offsets(cur, group_id, offsets))
+
+
+def load_offsets(get_conn, group_id, topic, partitions):
+    """Return the stored next offset of each partition that has one.
+
+    Args:
+        get_conn: a contextmanager that yields a DB connection
+        group_id: Kafka consumer group
+        topic: topic name
+        partitions: partition numbers to look up
+
+    Returns:
+        dict: ``{partition: next offset to read}``
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT partition, next_offset FROM consumer_offsets"
+                " WHERE group_id = %s AND topic = %s AND partition = ANY(%s)",
+                (group_id, topic, list(partitions)),
+            )
+            rows = cur.fetchall()
+        conn.commit()
+    return dict(rows)
@@ -0,0 +1,103 @@
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger("consumer")
+
+# Period length and partition name suffix format per EVENTS_PARTITIONING value
+PARTITION_PERIODS = {
+    "daily": (timedelta(days=1), "%Y%m%d"),
+    "hourly": (timedelta(hours=1), "%Y%m%d%H"),
+}
+
+DEFAULT_PARTITION = "events_default"
+
+_PARTITION_NAME = re.compile(r"^events_p(\d{8}|\d{10})$")
+
+
+def period_start(ts, interval):
+    """Start (UTC) of the daily or hourly period that contains ``ts``."""
+    ts = ts.astimezone(timezone.utc)
+    if interval == "hourly":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def partition_name(start, interval):
+    return "events_p" + start.strftime(PARTITION_PERIODS[interval][1])
+
+
+def partition_bounds(name):
+    """``(start, end)`` of a partition from its name, or None for other tables."""
+    match = _PARTITION_NAME.match(name)
+    if match is None:
+        return None
+    suffix = match.group(1)
+    if len(suffix) == 10:
+        start = datetime.strptime(suffix, "%Y%m%d%H").replace(tzinfo=timezone.utc)
+        return start, start + timedelta(hours=1)
+    start = datetime.strptime(suffix, "%Y%m%d").replace(tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def is_partitioned(cur):
+    """True if events is a partitioned table, False if a plain one, None if it does not exist."""
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('events')")
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return row[0] == "p"
+
+
+def list_partitions(cur):
+    """Names of the range partitions attached to events (the default one excluded)."""
+    cur.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid"
+        " WHERE i.inhparent = 'events'::regclass"
+    )
+    return sorted(name for (name,) in cur.fetchall() if partition_bounds(name) is not None)
+
+
+def create_partition(cur, name, start, end):
+    """Create and attach the range partition ``[start, end)``.
+
+    Rows of that range already in the default partition (events that
+    arrived before the partition existed) are moved into it first; Postgres
+    refuses to attach a range the default partition still holds rows of.
+
+    Returns:
+        int: rows moved from the default partition
+    """
+    cur.execute(
+        f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= %s AND timestamp < %s LIMIT 1", (start, end)
+    )
+    if cur.fetchone() is None:
+        cur.execute(f"CREATE TABLE {name} PARTITION OF events FOR VALUES FROM (%s) TO (%s)", (start, end))
+        return 0
+    # Hold inserts at the parent until the range is attached: an insert
+    # already routed to the default partition would fail its new constraint
+    cur.execute("LOCK TABLE events IN SHARE ROW EXCLUSIVE MODE")
+    cur.execute(f"LOCK TABLE {DEFAULT_PARTITION} IN ACCESS EXCLUSIVE MODE")
+    cur.execute(f"CREATE TABLE {name} (LIKE events INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cur.execute(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= %s AND timestamp < %s RETURNING *)"
+        f" INSERT INTO {name} SELECT * FROM moved",
+        (start, end),
+    )
+    moved = cur.rowcount
+    cur.execute(f"ALTER TABLE events ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (start, end))
+    return moved
+
+
+def expire_partition(cur, name, action):
+    """Drop a partition, or detach it (``action="detach"``) to archive it as a plain table."""
+    if action == "detach":
+        cur.execute(f"ALTER TABLE events DETACH PARTITION {name}")
+    else:
+        cur.execute(f"DROP TABLE {name}")
+
+
+def delete_expired_default_rows(cur, cutoff):
+    """Delete rows older than ``cutoff`` that ended up in the default partition."""
+    cur.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < %s", (cutoff,))
+    return cur.rowcount
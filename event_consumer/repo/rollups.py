@@ -0,0 +1,35 @@
+"""Incremental maintenance of the rollup tables (migration ``0004_event_rollups``).
+
+Each write adds its rows to per-minute and per-hour counts by event name
+and by user. The aggregation runs in the insert statement itself, over the
+rows the insert returns: rows skipped by ``ON CONFLICT DO NOTHING``
+(redelivered or replayed events) are not counted twice, and the counts
+commit or roll back with the rows. Only rows inserted since
+``rollup_state.maintained_since`` are counted; older events are counted by
+``tools/backfill_rollups.py`` (see ``shared.rollups``).
+"""
+
+from shared.rollups import ROLLUPS
+
+
+def with_rollups(insert_sql):
+    """Wrap an ``INSERT INTO events ...`` so the rows it inserts are also added to the rollups.
+
+    The returned statement yields one row, the number of events inserted.
+    Buckets are upserted in key order, so concurrent writers lock shared
+    rows in the same order and do not deadlock.
+    """
+    ctes = [
+        f"inserted AS ({insert_sql} RETURNING user_id, event_name, timestamp, processed_at)",
+        # Nothing while rollups are not maintained (maintained_since is NULL)
+        "counted AS (SELECT user_id, event_name, timestamp FROM inserted WHERE timestamp IS NOT NULL"
+        " AND processed_at >= (SELECT maintained_since FROM rollup_state))",
+    ]
+    for i, (table, unit, key) in enumerate(ROLLUPS):
+        ctes.append(
+            f"rollup_{i} AS (INSERT INTO {table} (bucket, {key}, count)"
+            f" SELECT date_trunc('{unit}', timestamp, 'UTC'), {key}, count(*) FROM counted"
+            " GROUP BY 1, 2 ORDER BY 1, 2"
+            f" ON CONFLICT (bucket, {key}) DO UPDATE SET count = {table}.count + EXCLUDED.count)"
+        )
+    return "WITH " + ", ".join(ctes) + " SELECT count(*) FROM inserted"
@@ -0,0 +1,30 @@
+import json
+
+import msgspec
+import pytest
+
+from models import Event
+from utils.decoder import MSGPACK_CONTENT_TYPE, _fast_event, decode_columns
+
+EVENT = {"user_id": "u1", "event_name": "click", "metadata": {"page": "/"}}
+# Ingestion's id for the event truncated to microseconds
+TRUNCATED_ID = Event(**EVENT, timestamp="2024-01-01T00:00:00.123456Z").event_id()
+
+
+@pytest.mark.parametrize("timestamp", ["2024-01-01T00:00:00.123456789Z", "2024-01-01T00:00:00.9999999Z"])
+@pytest.mark.parametrize("content_type", [None, MSGPACK_CONTENT_TYPE])
+def test_sub_microsecond_timestamp_matches_model(timestamp, content_type):
+    event = {**EVENT, "timestamp": timestamp}
+    value = msgspec.msgpack.encode(event) if content_type else json.dumps(event).encode()
+    assert _fast_event(value, content_type) is None
+    columns = decode_columns([value], [content_type], [None])
+    model = Event(**event)
+    assert columns.event_ids == [model.event_id()]
+    assert columns.timestamps[0].startswith(model.timestamp.strftime("%Y-%m-%dT%H:%M:%S.%f"))
+
+
+def test_fast_and_model_paths_pin_the_same_id():
+    value = json.dumps({**EVENT, "timestamp": "2024-01-01T00:00:00.123456789Z"}).encode()
+    exact = json.dumps({**EVENT, "timestamp": "2024-01-01T00:00:00.123456Z"}).encode()
+    assert _fast_event(exact, None) is not None
+    assert decode_columns([value, exact], [None, None], [None, None]).event_ids == [TRUNCATED_ID, TRUNCATED_ID]
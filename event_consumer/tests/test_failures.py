@@ -0,0 +1,30 @@
+import psycopg2
+import pytest
+
+from config.database.pool import PoolTimeoutError
+from utils.failures import is_schema_error, is_transient
+
+
+class PgError(Exception):
+    def __init__(self, pgcode):
+        super().__init__(pgcode)
+        self.pgcode = pgcode
+
+
+@pytest.mark.parametrize("pgcode", ["42P01", "42501", "42703"])
+def test_schema_and_privilege_errors_are_schema_errors(pgcode):
+    # Undefined table, insufficient privilege, undefined column: they fail every row until fixed
+    assert not is_transient(PgError(pgcode))
+    assert is_schema_error(PgError(pgcode))
+
+
+@pytest.mark.parametrize("pgcode", ["08006", "40001", "40P01", "53300", "57P01", "58030"])
+def test_row_independent_errors_are_transient(pgcode):
+    assert is_transient(PgError(pgcode))
+
+
+def test_connection_errors_are_transient():
+    assert is_transient(PoolTimeoutError("no connection"))
+    assert is_transient(psycopg2.OperationalError("server closed the connection"))
+    assert not is_transient(PgError("22P02"))
+    assert not is_schema_error(PgError("22P02"))
@@ -0,0 +1,49 @@
+import json
+import logging
+import queue
+
+from shared.logs import DroppingQueueHandler, JsonFormatter
+
+
+def make_logger(name, maxsize=10):
+    handler = DroppingQueueHandler(queue.Queue(maxsize=maxsize))
+    logger = logging.getLogger(name)
+    logger.handlers[:] = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger, handler.queue
+
+
+def test_message_is_rendered_when_logged():
+    logger, records = make_logger("test_logs.render")
+    batch = ["a"]
+    logger.info("writing %s rows: %s", 1, batch, extra={"log_type": "write"})
+    batch.append("b")
+
+    record = records.get_nowait()
+    assert record.msg == record.message == "writing 1 rows: ['a']"
+    assert record.args is None
+    assert json.loads(JsonFormatter("svc").format(record))["log_type"] == "write"
+
+
+def test_traceback_and_stack_outlive_the_frames():
+    logger, records = make_logger("test_logs.exc")
+    try:
+        raise ValueError("bad row")
+    except ValueError:
+        logger.exception("insert failed", stack_info=True)
+
+    record = records.get_nowait()
+    assert record.exc_info is None and record.stack_info is None
+    assert "ValueError: bad row" in record.exc_text and "Stack (most recent call last)" in record.exc_text
+    line = json.loads(JsonFormatter("svc").format(record))
+    assert line["message"] == "insert failed"
+    assert "ValueError: bad row" in line["exception"]
+    assert "ValueError: bad row" in logging.Formatter("%(message)s").format(record)
+
+
+def test_full_queue_drops_instead_of_blocking():
+    logger, records = make_logger("test_logs.full", maxsize=1)
+    logger.info("first")
+    logger.info("second")
+    assert records.qsize() == 1 and records.get_nowait().msg == "first"
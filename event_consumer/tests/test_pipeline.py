@@ -0,0 +1,99 @@
+import asyncio
+from types import SimpleNamespace
+
+from prometheus_client import REGISTRY
+
+from config.config import get_settings
+from utils.pipeline import Pipeline
+
+
+class PgError(Exception):
+    def __init__(self, pgcode):
+        super().__init__(pgcode)
+        self.pgcode = pgcode
+
+
+class StubInsert:
+    """``insert_fn`` over an in-memory table that rejects the ids in ``bad``."""
+
+    def __init__(self, bad=(), existing=(), schema_failures=0):
+        self.bad = set(bad)
+        self.table = set(existing)
+        self.schema_failures = schema_failures
+        self.calls = []
+
+    def __call__(self, rows, get_conn, on_conflict=True, in_transaction=None):
+        ids = [row[0] for row in rows]
+        self.calls.append((ids, on_conflict))
+        if self.schema_failures:
+            self.schema_failures -= 1
+            raise PgError("42P01")  # undefined table
+        if self.bad.intersection(ids):
+            raise PgError("22P02")  # invalid text representation
+        if not on_conflict and self.table.intersection(ids):
+            raise PgError("23505")  # unique violation
+        new = [i for i in ids if i not in self.table]
+        self.table.update(new)
+        return len(new)
+
+
+def make_pipeline(insert_fn):
+    settings = get_settings().model_copy(update={"RETRY_BACKOFF_BASE": 0.001, "RETRY_BACKOFF_MAX": 0.001})
+    pipeline = Pipeline(None, None, None, settings, insert_fn=insert_fn)
+    dead_lettered = []
+
+    async def send_to_dlq(rejections):
+        dead_lettered.extend(rejections)
+
+    pipeline._send_to_dlq = send_to_dlq
+    return pipeline, dead_lettered
+
+
+def batch(count):
+    rows = [(f"id{i}", "u1", "click", "{}", "2026-10-17T01:00:00+00:00") for i in range(count)]
+    records = [SimpleNamespace(topic="events", partition=0, offset=i) for i in range(count)]
+    return rows, records
+
+
+def failures(kind):
+    return REGISTRY.get_sample_value("consumer_write_failures_total", {"kind": kind}) or 0.0
+
+
+def test_bisection_dead_letters_only_the_bad_rows():
+    insert = StubInsert(bad={"id3", "id12"})
+    pipeline, dead_lettered = make_pipeline(insert)
+    rows, records = batch(16)
+
+    asyncio.run(pipeline._write_isolating(rows, records))
+
+    assert insert.table == {f"id{i}" for i in range(16)} - {"id3", "id12"}
+    assert [r.offset for r, stage, _ in dead_lettered] == [3, 12]
+    assert {stage for _, stage, _ in dead_lettered} == {"insert"}
+    assert all("PgError" in error for _, _, error in dead_lettered)
+
+
+def test_duplicate_without_conflict_check_is_written_with_it():
+    insert = StubInsert(existing={"id1"})
+    pipeline, dead_lettered = make_pipeline(insert)
+    rows, records = batch(4)
+
+    asyncio.run(pipeline._write_isolating(rows, records, on_conflict=False))
+
+    assert [on_conflict for _, on_conflict in insert.calls] == [False, True]
+    assert insert.table == {"id0", "id1", "id2", "id3"}
+    assert dead_lettered == []
+
+
+def test_schema_error_is_retried_without_bisecting_or_dead_lettering():
+    insert = StubInsert(schema_failures=3)
+    pipeline, dead_lettered = make_pipeline(insert)
+    rows, records = batch(8)
+    before = failures("schema")
+
+    asyncio.run(pipeline._write_isolating(rows, records))
+
+    assert dead_lettered == []
+    # Every attempt wrote the whole batch
+    assert [len(ids) for ids, _ in insert.calls] == [8, 8, 8, 8]
+    assert insert.table == {f"id{i}" for i in range(8)}
+    assert failures("schema") - before == 3
@@ -0,0 +1,102 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+from prometheus_client import REGISTRY
+from psycopg2 import extensions
+
+from config.database import pool as pool_module
+from config.database.pool import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.info = SimpleNamespace(transaction_status=extensions.TRANSACTION_STATUS_IDLE)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    conns = []
+
+    def connect(dsn):
+        conns.append(FakeConnection())
+        return conns[-1]
+
+    monkeypatch.setattr(pool_module.psycopg2, "connect", connect)
+    return conns
+
+
+def open_gauge():
+    return REGISTRY.get_sample_value("db_pool_connections_open")
+
+
+def make_pool(**kwargs):
+    options = dict(minconn=1, maxconn=4, timeout=1.0, max_lifetime=3600.0, healthcheck_idle=3600.0)
+    options.update(kwargs)
+    return ConnectionPool("dbname=test", **options)
+
+
+def check_out_concurrently(pool, count):
+    """Hold ``count`` connections at once and return them."""
+    held, ready, release = [], threading.Barrier(count + 1), threading.Event()
+
+    def worker():
+        with pool.connection() as conn:
+            held.append(conn)
+            ready.wait()
+            release.wait()
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for t in threads:
+        t.start()
+    ready.wait()
+    release.set()
+    for t in threads:
+        t.join()
+    return held
+
+
+def test_concurrent_checkouts_reuse_connections(opened):
+    pool = make_pool()
+    assert len(opened) == 1 and open_gauge() == 1
+
+    first = check_out_concurrently(pool, 3)
+    assert len(opened) == 3 and open_gauge() == 3
+    assert not any(conn.closed for conn in first)
+
+    for _ in range(5):
+        again = check_out_concurrently(pool, 3)
+        assert set(map(id, again)) == set(map(id, first))
+    with pool.connection():
+        pass
+    assert len(opened) == 3 and open_gauge() == 3
+    pool.close()
+    assert open_gauge() == 0 and all(conn.closed for conn in opened)
+
+
+def test_closed_connections_leave_the_gauge(opened):
+    pool = make_pool(minconn=0)
+    with pool.connection() as conn:
+        conn.closed = 2  # broken while in use
+    assert open_gauge() == 0
+
+    with pool.connection() as conn:
+        replacement = conn
+    assert replacement is not opened[0] and open_gauge() == 1
+
+
+def test_expired_connection_is_replaced(opened, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pool_module.time, "monotonic", lambda: now[0])
+    pool = make_pool(max_lifetime=60.0)
+    now[0] += 61
+    with pool.connection() as conn:
+        assert conn is opened[1]
+    assert opened[0].closed and open_gauge() == 1
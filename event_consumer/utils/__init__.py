@@ -1,3 +1,17 @@
-from .batch_processor import process_batch
+from .batch_processor import process_batch, parse_records, write_rows
+from .decoder import Columns, decode_columns, decode_records
+from .pipeline import Pipeline
+from .supervisor import Supervisor
+from .partitions import PartitionManager
 
-__all__ = ["process_batch"]
+__all__ = [
+    "process_batch",
+    "parse_records",
+    "write_rows",
+    "Columns",
+    "decode_columns",
+    "decode_records",
+    "Pipeline",
+    "Supervisor",
+    "PartitionManager",
+]
@@ -0,0 +1,128 @@
+"""Adaptive batch size and flush interval for the consumer pipeline.
+
+``BatchController`` picks the batch size and flush interval from two
+measurements the pipeline feeds it:
+
+- how long each successful insert took (``observe_write``);
+- how far each partition is behind its high watermark (``observe_lag``).
+
+The goal is a target end-to-end latency, roughly "time waiting in the
+batch + insert duration", at the best rows/s:
+
+- flush interval: the part of ``TARGET_LATENCY`` not used by the insert
+  (``TARGET_LATENCY`` minus a moving average of insert durations), kept
+  between ``MIN_FLUSH_INTERVAL`` and ``BATCH_TIMEOUT``. Under light load,
+  batches are flushed as soon as the latency budget allows.
+- batch size: while there is a backlog (lag larger than one batch) and
+  inserts take less than half of the target, the size grows by ``GROWTH``
+  per full batch, because larger inserts are cheaper per row. It is cut by
+  ``BACKOFF`` as soon as an insert takes longer than the target. The size stays between ``BATCH_SIZE_MIN``
+  and ``BATCH_SIZE_MAX``.
+
+With ``ADAPTIVE_BATCHING`` off the controller keeps ``BATCH_SIZE`` and
+``BATCH_TIMEOUT`` and only reports them.
+"""
+
+from typing import Dict, Hashable, List, Optional
+
+from prometheus_client import Gauge
+
+batch_size_target = Gauge(
+    "consumer_batch_size_target", "Batch size currently chosen by the batch controller", multiprocess_mode="liveall"
+)
+flush_interval_target = Gauge(
+    "consumer_flush_interval_seconds",
+    "Flush interval currently chosen by the batch controller",
+    multiprocess_mode="liveall",
+)
+write_duration_avg = Gauge(
+    "consumer_write_duration_avg_seconds",
+    "Moving average of insert durations seen by the batch controller",
+    multiprocess_mode="liveall",
+)
+lag_seen = Gauge(
+    "consumer_batch_controller_lag",
+    "Records behind the high watermark over assigned partitions, as seen by the batch controller",
+    multiprocess_mode="liveall",
+)
+
+GROWTH = 1.25
+BACKOFF = 0.5
+# Weight of the newest insert duration in the moving average
+SMOOTHING = 0.3
+MIN_FLUSH_INTERVAL = 0.01
+
+
+class BatchController:
+    """Batch size and flush interval, adapted to insert latency and lag.
+
+    Args:
+        settings: Consumer settings (``BATCH_SIZE``, ``BATCH_TIMEOUT``,
+            ``ADAPTIVE_BATCHING``, ``TARGET_LATENCY``, ``BATCH_SIZE_MIN``,
+            ``BATCH_SIZE_MAX``)
+    """
+
+    def __init__(self, settings):
+        self.adaptive = settings.ADAPTIVE_BATCHING
+        self.target_latency = settings.TARGET_LATENCY
+        self.max_interval = settings.BATCH_TIMEOUT
+        self.min_size = settings.BATCH_SIZE_MIN
+        self.max_size = settings.BATCH_SIZE_MAX
+        self._size = float(settings.BATCH_SIZE)
+        self._interval = settings.BATCH_TIMEOUT
+        self._write_avg: Optional[float] = None
+        self._lag: Dict[Hashable, int] = {}
+        self._publish()
+
+    @property
+    def batch_size(self) -> int:
+        """Records per write batch."""
+        return int(self._size)
+
+    @property
+    def flush_interval(self) -> float:
+        """Seconds after its first record at which a partial batch is flushed."""
+        return self._interval
+
+    @property
+    def lag(self) -> int:
+        """Latest known lag summed over partitions."""
+        return sum(self._lag.values())
+
+    def partitions(self) -> List[Hashable]:
+        """Partitions with a known lag."""
+        return list(self._lag)
+
+    def observe_lag(self, partition: Hashable, lag: int):
+        """Record how many records ``partition`` is behind its high watermark."""
+        self._lag[partition] = max(0, lag)
+        lag_seen.set(self.lag)
+
+    def forget(self, partition: Hashable):
+        """Drop the lag of a partition that was revoked from this consumer."""
+        self._lag.pop(partition, None)
+        lag_seen.set(self.lag)
+
+    def observe_write(self, rows: int, seconds: float):
+        """Adapt to one successful insert of ``rows`` rows that took ``seconds``."""
+        if self._write_avg is None:
+            self._write_avg = seconds
+        else:
+            self._write_avg += SMOOTHING * (seconds - self._write_avg)
+        if self.adaptive:
+            if seconds > self.target_latency:
+                self._size = max(self.min_size, self._size * BACKOFF)
+            elif self.lag > self._size and rows >= self.batch_size and self._write_avg < self.target_latency / 2:
+                self._size = min(self.max_size, self._size * GROWTH)
+            self._interval = min(self.max_interval, max(MIN_FLUSH_INTERVAL, self.target_latency - self._write_avg))
+        self._publish()
+
+    def _publish(self):
+        batch_size_target.set(self.batch_size)
+        flush_interval_target.set(self._interval)
+        lag_seen.set(self.lag)
+        if self._write_avg is not None:
+            write_duration_avg.set(self._write_avg)
+
+
+__all__ = ["BatchController"]
@@ -1,29 +1,56 @@
-import json
 import logging
 import asyncio
-from typing import Callable, Iterable, List, Optional, Tuple, ContextManager, cast
-from models import Event
+from typing import Callable, Iterable, List, ContextManager
 from repo.events import insert_events
 from prometheus_client import Counter
+from .decoder import Columns, Row, decode_records
 
 logger = logging.getLogger("consumer")
 
 events_processed = Counter("events_processed_total", "Total events processed and stored")
 
 
-Row = Tuple[str, str, str, str, str]
+def log_decode_errors(records: List, columns: Columns):
+    """Log the records ``decode_columns`` could not decode; they are skipped."""
+    for index, error in columns.errors:
+        r = records[index]
+        logger.error("skip bad record %s[%s]@%s: %s", r.topic, r.partition, r.offset, error)
 
 
-async def _parse_record(r) -> Optional[Row]:
-    """Parse a single Kafka record into a DB row tuple or return None on failure."""
-    try:
-        value = r.value.decode() if isinstance(r.value, (bytes, bytearray)) else r.value
-        payload = json.loads(value) if isinstance(value, str) else value
-        ev = Event(**payload)
-        return (ev.event_id(), ev.user_id, ev.event_name, json.dumps(ev.metadata), ev.timestamp.isoformat())
-    except Exception:
-        logger.exception("skip bad record")
-        return None
+def parse_records(records: Iterable) -> List[Row]:
+    """Decode Kafka records into DB rows, skipping (and logging) bad ones."""
+    records = list(records)
+    columns = decode_records(records)
+    log_decode_errors(records, columns)
+    return columns.rows()
+
+
+async def write_rows(
+    rows: List[Row],
+    get_conn: Callable[[], ContextManager],
+    insert_fn: Callable[..., int] = insert_events,
+    **kwargs,
+) -> int:
+    """Insert rows with ``insert_fn`` in a worker thread.
+
+    Args:
+        rows: Parsed rows
+        get_conn: contextmanager factory that yields DB connections
+        insert_fn: repository insert function (injected for testability)
+        **kwargs: passed on to ``insert_fn`` (``on_conflict``, ``in_transaction``)
+
+    Returns:
+        int: what ``insert_fn`` reports as inserted
+
+    Raises:
+        Exception: whatever ``insert_fn`` raised, so callers can retry
+    """
+    if not rows:
+        return 0
+    inserted = await asyncio.to_thread(insert_fn, rows, get_conn, **kwargs)
+    events_processed.inc(inserted)
+    logger.info("inserted %s rows", inserted)
+    return inserted
 
 
 async def process_batch(
@@ -31,32 +58,18 @@ async def process_batch(
     get_conn: Callable[[], ContextManager],
     insert_fn: Callable[[List[Row], Callable[[], ContextManager]], int] = insert_events,
 ) -> None:
-    """Process a batch of Kafka records asynchronously.
+    """Parse and write a batch of Kafka records in one call.
 
-    - Parses records concurrently.
-    - Delegates DB writes to `insert_fn` executed in a thread (via asyncio.to_thread).
-    - Keeps metrics and logging in the orchestration layer.
+    Insert failures are logged, not raised; the consumer pipeline uses
+    ``parse_records`` and ``write_rows`` directly so it can retry them.
 
     Args:
         records: Iterable of Kafka consumer records
         get_conn: contextmanager factory that yields DB connections
         insert_fn: repository insert function (injected for testability)
     """
-    records = list(records)
-    if not records:
-        return
-
-    tasks = [_parse_record(r) for r in records]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    rows = [r for r in results if r is not None and not isinstance(r, Exception)]
-    rows_cast = cast(List[Row], rows)
-
-    if not rows:
-        return
-
+    rows = parse_records(records)
     try:
-        inserted = await asyncio.to_thread(insert_fn, rows_cast, get_conn)
-        events_processed.inc(inserted)
-        logger.info("inserted %s rows", inserted)
+        await write_rows(rows, get_conn, insert_fn)
     except Exception:
         logger.exception("failed to insert rows (repo)")
@@ -0,0 +1,65 @@
+"""Classification of write failures and retry backoff.
+
+A transient failure says nothing about the rows being written: the
+database is unreachable, restarting or out of resources, or the
+transaction lost a deadlock or serialization conflict. Retrying the same
+rows later can succeed. Any other failure is permanent for the rows that
+caused it (invalid data, constraint violations): retrying cannot help, so
+the pipeline isolates those rows instead.
+
+Schema and privilege errors (SQLSTATE class 42: a missing table or column,
+a revoked grant, a syntax error in a deployed statement) are neither: they
+fail every row alike, so bisecting would dead-letter the whole batch, and
+only an operator can fix them. ``is_schema_error`` lets the pipeline keep
+retrying them loudly instead of isolating rows.
+"""
+
+import random
+
+import psycopg2
+
+from config.database.pool import PoolTimeoutError
+
+# SQLSTATE classes that do not depend on the rows: connection exception,
+# transaction rollback, insufficient resources, operator intervention and
+# system error
+_TRANSIENT_SQLSTATE_CLASSES = ("08", "40", "53", "57", "58")
+# Syntax error or access rule violation
+_SCHEMA_SQLSTATE_CLASSES = ("42",)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether retrying the same write later can succeed."""
+    if isinstance(exc, (PoolTimeoutError, psycopg2.OperationalError, psycopg2.InterfaceError)):
+        return True
+    pgcode = getattr(exc, "pgcode", None)
+    return bool(pgcode) and pgcode[:2] in _TRANSIENT_SQLSTATE_CLASSES
+
+
+def is_schema_error(exc: BaseException) -> bool:
+    """Whether the statement fails regardless of the rows (SQLSTATE class 42) until an operator fixes the schema."""
+    pgcode = getattr(exc, "pgcode", None)
+    return bool(pgcode) and pgcode[:2] in _SCHEMA_SQLSTATE_CLASSES
+
+
+def is_duplicate(exc: BaseException) -> bool:
+    """Whether an insert failed because an ``event_id`` already exists (unique violation)."""
+    return getattr(exc, "pgcode", None) == "23505"
+
+
+def backoff(attempt: int, base: float, cap: float) -> float:
+    """Seconds to wait before retry ``attempt`` (0-based): "full jitter" exponential backoff.
+
+    A random delay between 0 and ``min(cap, base * 2 ** attempt)``, so
+    consumers that failed together do not retry in lockstep.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def describe(exc: BaseException, limit: int = 1000) -> str:
+    """``Type: message`` of an exception, cut to ``limit`` characters for a message header."""
+    text = f"{type(exc).__name__}: {exc}".strip()
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+__all__ = ["is_transient", "is_schema_error", "is_duplicate", "backoff", "describe"]
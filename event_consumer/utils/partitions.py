@@ -0,0 +1,150 @@
+"""Partition management for a time-partitioned events table.
+
+With ``EVENTS_PARTITIONING`` set to ``daily`` or ``hourly``, ``events`` is
+range-partitioned on ``timestamp`` (see ``repo.partitions``) and
+``PartitionManager.maintain`` keeps it in shape:
+
+- the partitions of the current period and the next
+  ``PARTITION_PRECREATE`` periods exist before events for them arrive;
+- events outside every partition (late, far future) wait in the default
+  partition and are moved once their partition is created;
+- with ``EVENTS_RETENTION_DAYS``, partitions that ended before the
+  retention window are dropped (or detached, ``RETENTION_ACTION=detach``).
+  Dropping a partition is a catalog change, unlike a ``DELETE`` that
+  rewrites and vacuums every expired row.
+
+Every consumer process runs the maintenance loop; a transaction-level
+advisory lock makes all but one of them skip a round.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, ContextManager, Optional
+
+from prometheus_client import Counter, Gauge
+
+from repo.partitions import (
+    PARTITION_PERIODS,
+    create_partition,
+    delete_expired_default_rows,
+    expire_partition,
+    is_partitioned,
+    list_partitions,
+    partition_bounds,
+    partition_name,
+    period_start,
+)
+
+logger = logging.getLogger("consumer")
+
+partitions_attached = Gauge(
+    "events_partitions", "Range partitions attached to the events table", multiprocess_mode="livemax"
+)
+partition_changes = Counter(
+    "events_partition_changes_total", "Partitions changed by the partition manager, by action (create, drop, detach)", ["action"]
+)
+default_rows_moved = Counter(
+    "events_default_partition_rows_moved_total", "Rows moved from the default partition into a new range partition"
+)
+
+PARTITION_INTERVALS = ("none", "daily", "hourly")
+RETENTION_ACTIONS = ("drop", "detach")
+# pg_try_advisory_xact_lock key of the maintenance transaction
+_ADVISORY_LOCK_KEY = 0x6576_7470  # "evtp"
+
+
+class PartitionManager:
+    """Creates upcoming partitions of events and expires old ones.
+
+    Args:
+        get_conn: contextmanager factory that yields DB connections
+        settings: Consumer settings (``EVENTS_PARTITIONING``,
+            ``PARTITION_PRECREATE``, ``EVENTS_RETENTION_DAYS``,
+            ``RETENTION_ACTION``, ``PARTITION_MAINTENANCE_INTERVAL``)
+    """
+
+    def __init__(self, get_conn: Callable[[], ContextManager], settings):
+        if settings.EVENTS_PARTITIONING not in PARTITION_INTERVALS:
+            raise ValueError(f"EVENTS_PARTITIONING must be one of {PARTITION_INTERVALS}")
+        if settings.RETENTION_ACTION not in RETENTION_ACTIONS:
+            raise ValueError(f"RETENTION_ACTION must be one of {RETENTION_ACTIONS}")
+        self.get_conn = get_conn
+        self.interval = settings.EVENTS_PARTITIONING
+        self.precreate = settings.PARTITION_PRECREATE
+        self.retention = timedelta(days=settings.EVENTS_RETENTION_DAYS) if settings.EVENTS_RETENTION_DAYS > 0 else None
+        self.retention_action = settings.RETENTION_ACTION
+        self.maintenance_interval = settings.PARTITION_MAINTENANCE_INTERVAL
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval != "none"
+
+    def maintain(self, now: Optional[datetime] = None) -> bool:
+        """Run one maintenance round in one transaction.
+
+        Returns:
+            bool: False if another process holds the maintenance lock
+
+        Raises:
+            RuntimeError: events is a plain table (see "Partitioning" in the
+                README to migrate it)
+        """
+        if not self.enabled:
+            return True
+        now = now or datetime.now(timezone.utc)
+        step = PARTITION_PERIODS[self.interval][0]
+        with self.get_conn() as conn:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_try_advisory_xact_lock(%s)", (_ADVISORY_LOCK_KEY,))
+                    if not cur.fetchone()[0]:
+                        conn.rollback()
+                        return False
+                    if not is_partitioned(cur):
+                        raise RuntimeError("EVENTS_PARTITIONING is set but events is not a partitioned table")
+                    existing = set(list_partitions(cur))
+                    start = period_start(now, self.interval)
+                    for i in range(self.precreate + 1):
+                        begin = start + i * step
+                        name = partition_name(begin, self.interval)
+                        if name in existing:
+                            continue
+                        moved = create_partition(cur, name, begin, begin + step)
+                        existing.add(name)
+                        partition_changes.labels(action="create").inc()
+                        default_rows_moved.inc(moved)
+                        logger.info("created partition %s (%s rows moved from the default partition)", name, moved)
+                    if self.retention is not None:
+                        cutoff = now - self.retention
+                        for name in sorted(existing):
+                            if partition_bounds(name)[1] <= cutoff:
+                                expire_partition(cur, name, self.retention_action)
+                                existing.discard(name)
+                                partition_changes.labels(action=self.retention_action).inc()
+                                logger.info("expired partition %s (%s)", name, self.retention_action)
+                        deleted = delete_expired_default_rows(cur, cutoff)
+                        if deleted:
+                            logger.info("deleted %s expired rows from the default partition", deleted)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        partitions_attached.set(len(existing))
+        return True
+
+    async def run(self):
+        """Run ``maintain`` every ``PARTITION_MAINTENANCE_INTERVAL`` seconds until cancelled.
+
+        Failures are logged and retried at the next round: the default
+        partition takes events until their partition exists.
+        """
+        while self.enabled:
+            await asyncio.sleep(self.maintenance_interval)
+            try:
+                await asyncio.to_thread(self.maintain)
+            except Exception:
+                logger.exception("partition maintenance failed")
+
+
+__all__ = ["PartitionManager"]
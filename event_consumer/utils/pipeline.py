@@ -0,0 +1,590 @@
+"""Pipelined Kafka -> Postgres engine for the consumer.
+
+Three asyncio stages joined by bounded queues::
+
+    fetch (getmany) -> [fetched] -> parse + batch -> [writes] -> write + commit
+
+The fetch stage keeps pulling records while the write stage waits on
+Postgres, so throughput is bounded by the slowest stage rather than by the
+sum of all of them. The bounded queues apply backpressure: when Postgres
+falls behind, the queues fill up and fetching pauses. A batch is flushed
+when it reaches the batch size or the flush interval after its first
+record arrived, whether or not more records come in. Both come from a
+``BatchController``: ``BATCH_SIZE`` / ``BATCH_TIMEOUT``, or values adapted
+to insert latency and lag with ``ADAPTIVE_BATCHING``.
+
+Records are decoded in the parse stage by ``utils.decoder``; chunks of at
+least ``DECODE_POOL_THRESHOLD`` records are decoded in a process pool of
+``DECODE_POOL_WORKERS`` processes instead, so decoding large batches does
+not stall the event loop and uses more than one core.
+
+Write failures are classified by ``utils.failures``. Transient ones
+(database unreachable, pool timeout, deadlock) are retried with jittered
+exponential backoff for as long as they last; fetching pauses meanwhile
+because the queues fill up. Schema errors (SQLSTATE class 42) do not
+depend on the rows either: they are retried the same way, logged as errors
+and counted as ``kind="schema"`` for alerting, and nothing is committed
+or dead-lettered until the schema is fixed. A permanent failure bisects the batch until
+the rows that cause it are isolated; only those records go to
+``<KAFKA_TOPIC>-dlq``, together with records that could not be decoded,
+with the failure in ``dlq_*`` headers.
+
+Offsets are committed manually after a batch was written (or its bad
+records sent to the DLQ), so a crash replays uncommitted batches; inserts
+are idempotent on ``event_id``. With ``OFFSET_STORAGE=postgres`` the next
+offsets of a batch are also stored in ``consumer_offsets`` in the same
+transaction as its rows, and partitions resume from there when they are
+assigned, so a batch is either written with its offsets or re-read as a
+whole. The Kafka commit still follows, for lag monitoring.
+
+On a rebalance the revoked partitions' batches are written and committed
+before the partitions are handed over (for at most
+``REBALANCE_DRAIN_TIMEOUT`` seconds).
+"""
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, ContextManager, Dict, List, Optional, Sequence, Tuple
+
+from aiokafka import AIOKafkaConsumer, AIOKafkaProducer, ConsumerRebalanceListener, TopicPartition
+from aiokafka.errors import KafkaError
+from prometheus_client import Counter, Gauge, Histogram
+
+from repo.events import insert_events
+from repo.offsets import commit_offsets, load_offsets, store_offsets
+from .adaptive import BatchController
+from .batch_processor import Row, write_rows
+from .decoder import Columns, decode_columns, decode_records, header, record_fields
+from .failures import backoff, describe, is_duplicate, is_schema_error, is_transient
+
+logger = logging.getLogger("consumer")
+
+partition_lag = Gauge(
+    "consumer_partition_lag",
+    "Records between a partition's high watermark and the group's committed offset",
+    ["topic", "partition"],
+    multiprocess_mode="livemax",
+)
+stage_duration = Histogram(
+    "consumer_stage_seconds",
+    "Time per chunk or batch in each pipeline stage (fetch, parse, insert, commit)",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+batch_records = Histogram(
+    "consumer_batch_records",
+    "Records per fetched chunk (kind=fetch) and per write batch (kind=write)",
+    ["kind"],
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000, 50000),
+)
+_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+event_latency = Histogram(
+    "consumer_event_latency_seconds",
+    "Event timestamp to insert into Postgres (processed_at), sampled per batch",
+    buckets=_LATENCY_BUCKETS,
+)
+ingest_to_commit = Histogram(
+    "consumer_ingest_to_commit_seconds",
+    "Ingestion accept (ingest_ts header) to offset commit, sampled per batch",
+    buckets=_LATENCY_BUCKETS,
+)
+pipeline_queue_depth = Gauge(
+    "consumer_pipeline_queue_depth", "Batches waiting between pipeline stages", ["queue"], multiprocess_mode="livesum"
+)
+dlq_messages = Counter(
+    "consumer_dlq_messages_total", "Records sent to the DLQ, by the stage that rejected them (decode, insert)", ["stage"]
+)
+write_failures = Counter(
+    "consumer_write_failures_total", "Failed insert attempts, by kind (transient, schema, permanent)", ["kind"]
+)
+
+OFFSET_STORAGES = ("kafka", "postgres")
+
+# A record and why it goes to the DLQ: (record, stage, error)
+Rejection = Tuple[object, str, str]
+# Events per batch whose latency is observed; observing every event would
+# cost more than decoding it
+LATENCY_SAMPLES = 64
+
+
+def _sample(items: Sequence) -> Sequence:
+    """Up to ``LATENCY_SAMPLES`` items spread evenly over ``items``."""
+    return items[::-(-len(items) // LATENCY_SAMPLES) or 1]
+
+
+def _observe_event_latency(rows: List[Row], now: float):
+    for row in _sample(rows):
+        try:
+            ts = datetime.fromisoformat(row[4])
+        except ValueError:
+            continue
+        if ts.tzinfo is None:
+            # Postgres stores naive timestamps as UTC
+            ts = ts.replace(tzinfo=timezone.utc)
+        event_latency.observe(max(0.0, now - ts.timestamp()))
+
+
+def _observe_ingest_latency(records: list, now: float):
+    for r in _sample(records):
+        try:
+            ingest_ms = int(header(r, "ingest_ts") or 0)
+        except ValueError:
+            continue
+        if ingest_ms:
+            ingest_to_commit.observe(max(0.0, now - ingest_ms / 1000))
+
+
+class WriteBatch:
+    """Records collected for one write, their decoded rows and the offsets they cover.
+
+    ``row_records[i]`` is the record ``rows[i]`` was decoded from;
+    ``rejected`` holds the records that could not be decoded.
+    """
+
+    __slots__ = ("records", "rows", "row_records", "rejected", "offsets")
+
+    def __init__(self):
+        self.records: list = []
+        self.rows: List[Row] = []
+        self.row_records: list = []
+        self.rejected: List[Rejection] = []
+        self.offsets: Dict[TopicPartition, int] = {}
+
+    def add(self, records: list, columns: Columns):
+        self.records.extend(records)
+        self.rows.extend(columns.rows())
+        if columns.errors:
+            failed = dict(columns.errors)
+            self.row_records.extend(r for i, r in enumerate(records) if i not in failed)
+            self.rejected.extend((records[i], "decode", error) for i, error in columns.errors)
+        else:
+            self.row_records.extend(records)
+        for r in records:
+            tp = TopicPartition(r.topic, r.partition)
+            if r.offset >= self.offsets.get(tp, -1):
+                self.offsets[tp] = r.offset
+
+    def next_offsets(self) -> Dict[TopicPartition, int]:
+        """Next offset to read per partition once this batch is written."""
+        return {tp: offset + 1 for tp, offset in self.offsets.items()}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+class _RebalanceListener(ConsumerRebalanceListener):
+    """Hands partition revocations and assignments to the pipeline."""
+
+    def __init__(self, pipeline: "Pipeline"):
+        self.pipeline = pipeline
+
+    async def on_partitions_revoked(self, revoked):
+        await self.pipeline._on_partitions_revoked(revoked)
+
+    async def on_partitions_assigned(self, assigned):
+        await self.pipeline._on_partitions_assigned(assigned)
+
+
+class Pipeline:
+    """Fetch, parse and write stages of the consumer.
+
+    Subscribe the consumer with ``rebalance_listener`` before starting it,
+    so that fetched batches are drained on a rebalance and, with
+    ``OFFSET_STORAGE=postgres``, partitions resume from the stored offsets.
+
+    Args:
+        consumer: Consumer subscribed to the events topic, started before ``run``
+        dlq_producer: Started producer for ``<KAFKA_TOPIC>-dlq``
+        get_conn: contextmanager factory that yields DB connections
+        settings: Consumer settings
+        insert_fn: repository insert function (injected for testability)
+    """
+
+    def __init__(
+        self,
+        consumer: AIOKafkaConsumer,
+        dlq_producer: AIOKafkaProducer,
+        get_conn: Callable[[], ContextManager],
+        settings,
+        insert_fn: Callable = insert_events,
+    ):
+        self.consumer = consumer
+        self.dlq_producer = dlq_producer
+        self.get_conn = get_conn
+        self.settings = settings
+        self.insert_fn = insert_fn
+        if settings.OFFSET_STORAGE not in OFFSET_STORAGES:
+            raise ValueError(f"OFFSET_STORAGE must be one of {OFFSET_STORAGES}, not {settings.OFFSET_STORAGE!r}")
+        self.offsets_in_db = settings.OFFSET_STORAGE == "postgres"
+        self.rebalance_listener = _RebalanceListener(self)
+        self._fetched: asyncio.Queue = asyncio.Queue(maxsize=settings.PIPELINE_QUEUE_SIZE)
+        self._writes: asyncio.Queue = asyncio.Queue(maxsize=settings.PIPELINE_QUEUE_SIZE)
+        self._stopping = asyncio.Event()
+        self._decode_pool: Optional[ProcessPoolExecutor] = None
+        self.batching = BatchController(settings)
+        # Next offset to read per partition as committed by the group, for lag
+        self._committed: Dict[TopicPartition, Optional[int]] = {}
+        # Records fetched but not yet written and committed; a rebalance waits for them
+        self._in_flight = 0
+        self._drained = asyncio.Event()
+        self._drained.set()
+
+    def stop(self):
+        """Stop fetching; batches already fetched are still written and committed."""
+        self._stopping.set()
+
+    async def run(self):
+        """Run the stages until ``stop`` is called and the queues are drained.
+
+        Raises:
+            Exception: an unexpected error in any stage; the others are cancelled
+        """
+        if self.settings.DECODE_POOL_THRESHOLD > 0:
+            # spawn: forking would copy the event loop's threads and sockets
+            self._decode_pool = ProcessPoolExecutor(
+                self.settings.DECODE_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        tasks = [
+            asyncio.create_task(self._fetch_stage(), name="fetch"),
+            asyncio.create_task(self._parse_stage(), name="parse"),
+            asyncio.create_task(self._write_stage(), name="write"),
+        ]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if self._decode_pool is not None:
+            self._decode_pool.shutdown(cancel_futures=True)
+        for task in done:
+            task.result()
+
+    async def _put(self, queue: asyncio.Queue, name: str, item):
+        await queue.put(item)
+        pipeline_queue_depth.labels(queue=name).set(queue.qsize())
+
+    async def _get(self, queue: asyncio.Queue, name: str):
+        item = await queue.get()
+        pipeline_queue_depth.labels(queue=name).set(queue.qsize())
+        return item
+
+    async def _fetch_stage(self):
+        while not self._stopping.is_set():
+            start = time.perf_counter()
+            data = await self.consumer.getmany(
+                timeout_ms=self.settings.FETCH_TIMEOUT_MS, max_records=self.batching.batch_size
+            )
+            elapsed = time.perf_counter() - start
+            await self._observe_lag(data)
+            records = [r for partition_records in data.values() for r in partition_records]
+            if records:
+                # Empty fetches only measure the FETCH_TIMEOUT_MS wait
+                stage_duration.labels(stage="fetch").observe(elapsed)
+                batch_records.labels(kind="fetch").observe(len(records))
+                self._in_flight += len(records)
+                self._drained.clear()
+                await self._put(self._fetched, "fetched", records)
+        await self._put(self._fetched, "fetched", None)
+
+    async def _observe_lag(self, data: Dict[TopicPartition, list]):
+        """Update the committed lag of every assigned partition and the batch controller's fetch lag.
+
+        The batch controller gets the records left behind the last fetched
+        one; ``consumer_partition_lag`` is measured from the committed
+        offset, so it also covers batches fetched but not yet written.
+        """
+        assigned = self.consumer.assignment()
+        for tp in self.batching.partitions():
+            if tp not in assigned:
+                self.batching.forget(tp)
+        for tp in list(self._committed):
+            if tp not in assigned:
+                # Revoked: the new owner reports it
+                del self._committed[tp]
+                partition_lag.labels(topic=tp.topic, partition=str(tp.partition)).set(0)
+        for tp, partition_records in data.items():
+            highwater = self.consumer.highwater(tp)
+            if highwater is not None and partition_records:
+                self.batching.observe_lag(tp, highwater - partition_records[-1].offset - 1)
+        for tp in assigned:
+            if tp not in self._committed:
+                # Once per newly assigned partition; later commits update it
+                self._committed[tp] = await self.consumer.committed(tp)
+            self._set_partition_lag(tp)
+
+    def _set_partition_lag(self, tp: TopicPartition):
+        highwater = self.consumer.highwater(tp)
+        committed = self._committed.get(tp)
+        if highwater is not None and committed is not None:
+            partition_lag.labels(topic=tp.topic, partition=str(tp.partition)).set(max(0, highwater - committed))
+
+    async def _parse_stage(self):
+        loop = asyncio.get_running_loop()
+        batch = WriteBatch()
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                records = await asyncio.wait_for(self._get(self._fetched, "fetched"), timeout)
+            except asyncio.TimeoutError:
+                records = []
+            if records is None:
+                break
+            if records:
+                if not batch:
+                    deadline = loop.time() + self.batching.flush_interval
+                batch.add(records, await self._decode(records))
+            if batch and (len(batch) >= self.batching.batch_size or loop.time() >= deadline):
+                await self._put(self._writes, "writes", batch)
+                batch = WriteBatch()
+                deadline = None
+        if batch:
+            await self._put(self._writes, "writes", batch)
+        await self._put(self._writes, "writes", None)
+
+    async def _decode(self, records: list) -> Columns:
+        """Decode records into columns, in the process pool for large chunks."""
+        start = time.perf_counter()
+        if self._decode_pool is not None and len(records) >= self.settings.DECODE_POOL_THRESHOLD:
+            loop = asyncio.get_running_loop()
+            columns = await loop.run_in_executor(self._decode_pool, decode_columns, *record_fields(records))
+        else:
+            columns = decode_records(records)
+        stage_duration.labels(stage="parse").observe(time.perf_counter() - start)
+        return columns
+
+    async def _write_stage(self):
+        while True:
+            batch = await self._get(self._writes, "writes")
+            if batch is None:
+                return
+            batch_records.labels(kind="write").observe(len(batch))
+            if batch.rejected:
+                await self._send_to_dlq(batch.rejected)
+            offsets = batch.next_offsets() if self.offsets_in_db else None
+            if batch.rows:
+                await self._write_isolating(
+                    batch.rows, batch.row_records, on_conflict=self.settings.CONFLICT_CHECK, offsets=offsets
+                )
+            elif offsets:
+                await self._store_offsets(offsets)
+            if await self._commit(batch.next_offsets()):
+                _observe_ingest_latency(batch.records, time.time())
+            self._in_flight -= len(batch)
+            if self._in_flight == 0:
+                self._drained.set()
+
+    async def _write_isolating(
+        self,
+        rows: List[Row],
+        records: list,
+        on_conflict: bool = True,
+        offsets: Optional[Dict[TopicPartition, int]] = None,
+    ):
+        """Write rows; on a permanent failure bisect them until the bad rows are isolated.
+
+        Each half is written on its own, so good rows are inserted and a
+        single failing row is sent to the DLQ. With ``k`` bad rows among
+        ``n`` this takes about ``2k * log2(n / k)`` extra inserts.
+
+        Without ``on_conflict`` a unique violation (an already written
+        event, e.g. from a batch replayed after a crash) writes the rows
+        again with the conflict check instead. ``offsets`` are stored with
+        the rows in one transaction, or after the last of the smaller writes.
+        """
+        try:
+            await self._write_with_retry(rows, on_conflict, offsets)
+            return
+        except Exception as e:
+            if not on_conflict and is_duplicate(e):
+                logger.info("batch of %s rows has already written events, writing it with the conflict check", len(rows))
+                await self._write_isolating(rows, records)
+            elif len(rows) == 1:
+                await self._send_to_dlq([(records[0], "insert", describe(e))])
+            else:
+                logger.warning("write of %s rows failed permanently, bisecting: %s", len(rows), describe(e, 200))
+                mid = len(rows) // 2
+                await self._write_isolating(rows[:mid], records[:mid])
+                await self._write_isolating(rows[mid:], records[mid:])
+        if offsets:
+            await self._store_offsets(offsets)
+
+    async def _write_with_retry(
+        self, rows: List[Row], on_conflict: bool = True, offsets: Optional[Dict[TopicPartition, int]] = None
+    ):
+        """Write rows, retrying transient failures and schema errors with jittered backoff until they succeed.
+
+        Raises:
+            Exception: a permanent failure, or a transient one once the
+                pipeline is stopping (the batch is not committed and will be re-read)
+        """
+        # Only non-default arguments are passed, so any insert_fn(rows, get_conn) works with the defaults
+        kwargs = {}
+        if not on_conflict:
+            kwargs["on_conflict"] = False
+        if offsets:
+            kwargs["in_transaction"] = functools.partial(
+                store_offsets, group_id=self.settings.KAFKA_GROUP, offsets=_offset_keys(offsets)
+            )
+        attempt = 0
+        while True:
+            try:
+                start = time.perf_counter()
+                await write_rows(rows, self.get_conn, self.insert_fn, **kwargs)
+                if rows:
+                    elapsed = time.perf_counter() - start
+                    stage_duration.labels(stage="insert").observe(elapsed)
+                    self.batching.observe_write(len(rows), elapsed)
+                    _observe_event_latency(rows, time.time())
+                return
+            except Exception as e:
+                schema_error = is_schema_error(e)
+                if not schema_error and not is_transient(e):
+                    write_failures.labels(kind="permanent").inc()
+                    raise
+                write_failures.labels(kind="schema" if schema_error else "transient").inc()
+                if self._stopping.is_set():
+                    logger.error("giving up on a batch of %s rows at shutdown; it will be re-read", len(rows))
+                    raise
+                delay = backoff(attempt, self.settings.RETRY_BACKOFF_BASE, self.settings.RETRY_BACKOFF_MAX)
+                attempt += 1
+                if schema_error:
+                    # Every row fails alike: bisecting would dead-letter the whole batch
+                    logger.error(
+                        "write failed on the schema (attempt %s), retrying in %.1fs until it is fixed: %s",
+                        attempt, delay, describe(e, 200),
+                    )
+                else:
+                    logger.warning("write failed (attempt %s), retrying in %.1fs: %s", attempt, delay, describe(e, 200))
+                await asyncio.sleep(delay)
+
+    async def _store_offsets(self, offsets: Dict[TopicPartition, int]):
+        """Store offsets in ``consumer_offsets`` on their own, retrying transient failures.
+
+        Raises:
+            Exception: a permanent failure, or a transient one once the pipeline is stopping
+        """
+        attempt = 0
+        while True:
+            try:
+                await asyncio.to_thread(commit_offsets, self.get_conn, self.settings.KAFKA_GROUP, _offset_keys(offsets))
+                return
+            except Exception as e:
+                if not is_transient(e) or self._stopping.is_set():
+                    raise
+                delay = backoff(attempt, self.settings.RETRY_BACKOFF_BASE, self.settings.RETRY_BACKOFF_MAX)
+                attempt += 1
+                logger.warning("storing offsets failed (attempt %s), retrying in %.1fs: %s", attempt, delay, describe(e, 200))
+                await asyncio.sleep(delay)
+
+    async def _on_partitions_revoked(self, revoked):
+        """Let the write stage finish the batches already fetched before the partitions move."""
+        if self._drained.is_set():
+            return
+        timeout = self.settings.REBALANCE_DRAIN_TIMEOUT
+        try:
+            await asyncio.wait_for(self._drained.wait(), timeout)
+        except asyncio.TimeoutError:
+            # The new owner may re-read them; inserts are idempotent and stored offsets never move back
+            logger.warning("%s fetched records not written within %.0fs of a rebalance", self._in_flight, timeout)
+
+    async def _on_partitions_assigned(self, assigned):
+        """Seek newly assigned partitions to their stored offsets (``OFFSET_STORAGE=postgres``).
+
+        Partitions without a stored offset start from the group's Kafka
+        commit, so switching from ``kafka`` storage does not re-read the topic.
+        """
+        if not self.offsets_in_db or not assigned:
+            return
+        by_topic: Dict[str, List[int]] = {}
+        for tp in assigned:
+            by_topic.setdefault(tp.topic, []).append(tp.partition)
+        attempt = 0
+        for topic, partitions in by_topic.items():
+            while True:
+                try:
+                    stored = await asyncio.to_thread(
+                        load_offsets, self.get_conn, self.settings.KAFKA_GROUP, topic, partitions
+                    )
+                    break
+                except Exception as e:
+                    if not is_transient(e) or self._stopping.is_set():
+                        raise
+                    delay = backoff(attempt, self.settings.RETRY_BACKOFF_BASE, self.settings.RETRY_BACKOFF_MAX)
+                    attempt += 1
+                    logger.warning("loading offsets failed (attempt %s), retrying in %.1fs: %s", attempt, delay, describe(e, 200))
+                    await asyncio.sleep(delay)
+            for partition, offset in stored.items():
+                tp = TopicPartition(topic, partition)
+                self.consumer.seek(tp, offset)
+                self._committed[tp] = offset
+            logger.info("resuming %s of %s partitions of %s from stored offsets", len(stored), len(partitions), topic)
+
+    async def _send_to_dlq(self, rejections: List[Rejection]):
+        """Publish records to ``<KAFKA_TOPIC>-dlq`` with their original value, key and headers.
+
+        ``dlq_stage``, ``dlq_error`` and the source ``dlq_topic``,
+        ``dlq_partition`` and ``dlq_offset`` are added to the headers.
+        Publishing is retried like a transient write failure, because the
+        batch's offsets are only committed once the DLQ has the records.
+        """
+        topic = self.settings.KAFKA_TOPIC + "-dlq"
+        for r, stage, error in rejections:
+            logger.error("dead-letter record %s[%s]@%s (%s): %s", r.topic, r.partition, r.offset, stage, error)
+        attempt = 0
+        while True:
+            try:
+                futures = []
+                for r, stage, error in rejections:
+                    headers = list(r.headers or []) + [
+                        ("dlq_stage", stage.encode()),
+                        ("dlq_error", error.encode()),
+                        ("dlq_topic", r.topic.encode()),
+                        ("dlq_partition", str(r.partition).encode()),
+                        ("dlq_offset", str(r.offset).encode()),
+                    ]
+                    futures.append(await self.dlq_producer.send(topic, r.value, key=r.key, headers=headers))
+                await asyncio.gather(*futures)
+                break
+            except Exception as e:
+                if self._stopping.is_set():
+                    logger.error("giving up on sending %s records to the DLQ at shutdown", len(rejections))
+                    raise
+                delay = backoff(attempt, self.settings.RETRY_BACKOFF_BASE, self.settings.RETRY_BACKOFF_MAX)
+                attempt += 1
+                logger.warning("DLQ publish failed (attempt %s), retrying in %.1fs: %s", attempt, delay, describe(e, 200))
+                await asyncio.sleep(delay)
+        for _, stage, _ in rejections:
+            dlq_messages.labels(stage=stage).inc()
+
+    async def _commit(self, commit: Dict[TopicPartition, int]) -> bool:
+        """Commit the next offset to read for every partition of a written batch.
+
+        Returns:
+            bool: whether the offsets were committed
+        """
+        if not commit:
+            return False
+        start = time.perf_counter()
+        try:
+            await self.consumer.commit(commit)
+        except KafkaError as e:
+            # e.g. the partitions were reassigned; the new owner re-reads them
+            logger.warning("offset commit failed: %s", e)
+            return False
+        stage_duration.labels(stage="commit").observe(time.perf_counter() - start)
+        for tp, offset in commit.items():
+            self._committed[tp] = offset
+            self._set_partition_lag(tp)
+        return True
+
+
+def _offset_keys(offsets: Dict[TopicPartition, int]) -> Dict[Tuple[str, int], int]:
+    return {(tp.topic, tp.partition): offset for tp, offset in offsets.items()}
+
+
+__all__ = ["Pipeline", "WriteBatch"]
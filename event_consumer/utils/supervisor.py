@@ -0,0 +1,130 @@
+"""Process supervisor for running several consumers side by side.
+
+Each worker is a separate process running a full consumer (fetch, parse
+and write pipeline, own Postgres pool) in the same Kafka consumer group, so
+the group coordinator spreads the topic's partitions across the workers.
+When a worker dies, the group rebalances its partitions onto the others
+until the supervisor has started a replacement, which then takes its share
+back. Workers beyond the partition count stay idle.
+
+Workers that crash right after starting are restarted with exponential
+backoff so a persistent failure (e.g. Postgres down) does not turn into a
+fork loop.
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from typing import Callable, Dict
+
+from prometheus_client import Counter, Gauge, multiprocess
+
+logger = logging.getLogger("consumer")
+
+worker_starts = Counter(
+    "consumer_worker_starts_total", "Consumer worker processes started; rises after startup when workers crash"
+)
+workers_alive = Gauge("consumer_workers_alive", "Consumer worker processes running", multiprocess_mode="livesum")
+
+# A worker that lived shorter than this counts as a crash loop
+MIN_UPTIME = 10.0
+POLL_INTERVAL = 0.5
+
+
+def _worker_main(target: Callable[[int], None], index: int):
+    worker_starts.inc()
+    workers_alive.set(1)
+    target(index)
+
+
+class Supervisor:
+    """Start ``count`` worker processes and keep them running until stopped.
+
+    Args:
+        target: Module-level function run in every worker with the worker index
+        count: Number of worker processes
+        max_backoff: Upper bound in seconds on the delay before restarting a crash-looping worker
+        shutdown_timeout: Seconds workers get to finish after SIGTERM before they are killed
+    """
+
+    def __init__(self, target: Callable[[int], None], count: int, max_backoff: float = 30.0, shutdown_timeout: float = 30.0):
+        self.target = target
+        self.count = count
+        self.max_backoff = max_backoff
+        self.shutdown_timeout = shutdown_timeout
+        # spawn, not fork: workers must not inherit the parent's threads,
+        # sockets or prometheus values
+        self._ctx = multiprocessing.get_context("spawn")
+        self._procs: Dict[int, multiprocessing.process.BaseProcess] = {}
+        self._started_at: Dict[int, float] = {}
+        self._failures: Dict[int, int] = {}
+        self._restart_at: Dict[int, float] = {}
+        self._stopping = False
+
+    def stop(self, *_):
+        """Ask the supervisor to shut the workers down; safe to call from a signal handler."""
+        self._stopping = True
+
+    def run(self):
+        """Supervise the workers until ``stop`` is called, then stop them."""
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self.stop)
+        for index in range(self.count):
+            self._start(index)
+        try:
+            while not self._stopping:
+                self._check_workers()
+                time.sleep(POLL_INTERVAL)
+        finally:
+            self._shutdown()
+
+    def _start(self, index: int):
+        proc = self._ctx.Process(target=_worker_main, args=(self.target, index), name=f"consumer-worker-{index}")
+        proc.start()
+        self._procs[index] = proc
+        self._started_at[index] = time.monotonic()
+        self._restart_at.pop(index, None)
+        logger.info("started consumer worker %s (pid %s)", index, proc.pid)
+
+    def _check_workers(self):
+        now = time.monotonic()
+        for index, proc in list(self._procs.items()):
+            if proc.is_alive():
+                continue
+            if index not in self._restart_at:
+                self._reap(proc)
+                uptime = now - self._started_at[index]
+                self._failures[index] = self._failures.get(index, 0) + 1 if uptime < MIN_UPTIME else 0
+                delay = min(2 ** self._failures[index] - 1, self.max_backoff)
+                self._restart_at[index] = now + delay
+                logger.warning(
+                    "consumer worker %s (pid %s) exited with code %s after %.1fs, restarting in %.0fs",
+                    index, proc.pid, proc.exitcode, uptime, delay,
+                )
+            if now >= self._restart_at[index]:
+                self._start(index)
+
+    def _reap(self, proc):
+        proc.join()
+        # Drop the dead worker's live gauge files; its counters are kept
+        if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+            multiprocess.mark_process_dead(proc.pid)
+
+    def _shutdown(self):
+        logger.info("stopping %s consumer workers", len(self._procs))
+        for proc in self._procs.values():
+            if proc.is_alive():
+                proc.terminate()
+        deadline = time.monotonic() + self.shutdown_timeout
+        for proc in self._procs.values():
+            proc.join(max(0.0, deadline - time.monotonic()))
+            if proc.is_alive():
+                logger.warning("consumer worker %s did not stop in time, killing it", proc.pid)
+                proc.kill()
+                proc.join()
+            self._reap(proc)
+
+
+__all__ = ["Supervisor"]
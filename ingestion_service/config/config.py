@@ -1,12 +1,22 @@
 from functools import lru_cache
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     # Kafka configuration
     KAFKA_TOPIC: str = "events"
     KAFKA_SERVER: str = "kafka:9092"
 
+    # Kafka producer tuning
+    KAFKA_LINGER_MS: int = 5
+    KAFKA_MAX_BATCH_SIZE: int = 65536
+    KAFKA_COMPRESSION_TYPE: Optional[str] = "lz4"
+    KAFKA_ACKS: str = "1"
+    KAFKA_ENABLE_IDEMPOTENCE: bool = False
+    KAFKA_PARTITION_STRATEGY: str = "user_id"
+    # Kafka value encoding: json or msgpack (named in the content-type header)
+    KAFKA_VALUE_FORMAT: str = "json"
+
     # OpenTelemetry configuration
     OTEL_EXPORTER_OTLP_ENDPOINT: str = "http://otel-collector:4318"
 
@@ -15,6 +25,53 @@ class Settings(BaseSettings):
 
     # Service configuration
     SERVICE_NAME: str = "ingestion-service"
+    HOST: str = "0.0.0.0"
+    PORT: int = 8001
+    # uvicorn worker processes started by serve.py; each has its own producer
+    WORKERS: int = 1
+    # Directory for per-worker metric files, used when WORKERS > 1
+    PROMETHEUS_MULTIPROC_DIR: str = "/tmp/ingestion-metrics"
+
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = True
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLE_RATES: Dict[str, float] = {"event_received": 0.01, "batch_received": 0.1}
+    LOG_EXCEPTION_BURST: int = 10
+    LOG_EXCEPTION_INTERVAL: float = 60.0
+
+    # Batch ingestion
+    BATCH_MAX_EVENTS: int = 1000
+
+    # Largest request body accepted after undoing gzip/zstd Content-Encoding
+    MAX_DECOMPRESSED_BYTES: int = 16 * 1024 * 1024
+
+    # Streaming ingestion (WebSocket /events/stream)
+    STREAM_BATCH_MAX_EVENTS: int = 500
+    STREAM_FLUSH_INTERVAL_MS: int = 50
+    STREAM_DELIVERY_MODE: str = "leader-ack"
+    STREAM_MAX_PENDING_FRAMES: int = 64
+
+    # Use the msgspec decode/encode fast path when msgspec is installed
+    FAST_PATH_ENABLED: bool = True
+
+    # Publish pipeline
+    PUBLISH_MAX_INFLIGHT_MESSAGES: int = 10000
+    PUBLISH_MAX_INFLIGHT_BYTES: int = 32 * 1024 * 1024
+    PUBLISH_RETRY_AFTER_SECONDS: int = 1
+    DEFAULT_DELIVERY_MODE: str = "fire-and-forget"
+    KAFKA_RECONNECT_MAX_BACKOFF: float = 30.0
+
+    # Disk spool for fire-and-forget events Kafka cannot take right now
+    SPOOL_ENABLED: bool = True
+    SPOOL_DIR: str = "spool"
+    SPOOL_SEGMENT_BYTES: int = 64 * 1024 * 1024
+    SPOOL_MAX_BYTES: int = 1024 * 1024 * 1024
+    SPOOL_FSYNC: str = "interval"
+    SPOOL_FSYNC_INTERVAL: float = 1.0
+    SPOOL_DRAIN_BATCH: int = 5000
+    SPOOL_DRAIN_RATE: int = 50000
+    SPOOL_DRAIN_IDLE_SECONDS: float = 0.5
 
     class Config:
         env_file = ".env"
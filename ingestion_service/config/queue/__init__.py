@@ -1,3 +1,4 @@
-from .config import init_kafka_producer
+from .config import init_kafka_producer, producer_options
+from .partitioning import PartitionStrategy, RoundRobinPartitioner, message_key
 
-__all__ = ["init_kafka_producer"]
+__all__ = ["init_kafka_producer", "producer_options", "PartitionStrategy", "RoundRobinPartitioner", "message_key"]
@@ -1,21 +1,92 @@
 from aiokafka import AIOKafkaProducer
 import logging
 
+from .partitioning import PartitionStrategy, RoundRobinPartitioner
+
 logger = logging.getLogger("ingestion")
 
 
+def _acks(value: str):
+    """Convert the ``KAFKA_ACKS`` setting into the value aiokafka expects."""
+    return "all" if value in ("all", "-1") else int(value)
+
+
+def producer_options(settings, acks=None) -> dict:
+    """Build AIOKafkaProducer keyword arguments from settings.
+
+    Idempotence requires ``acks="all"``, so it is only enabled on producers
+    that wait for every in-sync replica. The round-robin partition strategy
+    installs a partitioner that cycles partitions for unkeyed messages.
+
+    Args:
+        settings: Settings object with Kafka configuration
+        acks: Override for ``KAFKA_ACKS``
+
+    Returns:
+        dict: keyword arguments for ``AIOKafkaProducer``
+    """
+    acks = _acks(settings.KAFKA_ACKS) if acks is None else acks
+    compression = settings.KAFKA_COMPRESSION_TYPE
+    options = {
+        "bootstrap_servers": settings.KAFKA_SERVER,
+        "acks": acks,
+        "linger_ms": settings.KAFKA_LINGER_MS,
+        "max_batch_size": settings.KAFKA_MAX_BATCH_SIZE,
+        "compression_type": None if compression in (None, "", "none") else compression,
+        "enable_idempotence": settings.KAFKA_ENABLE_IDEMPOTENCE and acks == "all",
+    }
+    if PartitionStrategy(settings.KAFKA_PARTITION_STRATEGY) is PartitionStrategy.ROUND_ROBIN:
+        options["partitioner"] = RoundRobinPartitioner()
+    return options
+
+
 async def init_kafka_producer(settings, kafka_service):
-    """Initialize Kafka producer and inject into kafka_service.
-    
+    """Initialize Kafka producers and inject them into kafka_service.
+
+    ``acks`` is a producer-level setting in Kafka, so per-request delivery
+    modes need a producer for each level they wait for: the ``KAFKA_ACKS``
+    producer serves fire-and-forget deliveries, an ``acks=1`` producer
+    leader-ack deliveries (and the spool drain) when ``KAFKA_ACKS=0``, and an
+    ``acks="all"`` producer full-ack deliveries. Levels already covered by
+    the ``KAFKA_ACKS`` producer share it.
+
     Args:
         settings: Settings object with Kafka configuration
         kafka_service: KafkaService singleton instance
-        
+
     Returns:
-        AIOKafkaProducer: Started producer instance
+        AIOKafkaProducer: Started default producer instance
     """
-    producer = AIOKafkaProducer(bootstrap_servers=settings.KAFKA_SERVER)
-    await producer.start()
-    kafka_service.set_producer(producer)
-    logger.info("aiokafka producer started")
+    options = producer_options(settings)
+    if settings.KAFKA_ENABLE_IDEMPOTENCE and options["acks"] != "all":
+        logger.warning(
+            "KAFKA_ENABLE_IDEMPOTENCE requires acks=all; with KAFKA_ACKS=%s only full-ack deliveries are idempotent",
+            settings.KAFKA_ACKS,
+        )
+    producers = {options["acks"]: AIOKafkaProducer(**options)}
+    if options["acks"] == 0:
+        producers[1] = AIOKafkaProducer(**producer_options(settings, acks=1))
+    if "all" not in producers:
+        producers["all"] = AIOKafkaProducer(**producer_options(settings, acks="all"))
+    started = []
+    try:
+        for producer in producers.values():
+            await producer.start()
+            started.append(producer)
+    except Exception:
+        for producer in started:
+            await producer.stop()
+        raise
+
+    producer = producers[options["acks"]]
+    kafka_service.set_producer(
+        producer,
+        full_ack_producer=producers["all"],
+        leader_ack_producer=producers.get(1, producer),
+    )
+    logger.info(
+        "aiokafka producers started acks=%s linger_ms=%s max_batch_size=%s compression=%s",
+        "/".join(str(acks) for acks in producers), options["linger_ms"], options["max_batch_size"],
+        options["compression_type"],
+    )
     return producer
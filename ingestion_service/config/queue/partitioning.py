@@ -0,0 +1,49 @@
+import itertools
+from enum import Enum
+from aiokafka.partitioner import DefaultPartitioner
+
+
+class PartitionStrategy(str, Enum):
+    """Which event field decides the Kafka partition."""
+
+    USER_ID = "user_id"
+    EVENT_NAME = "event_name"
+    ROUND_ROBIN = "round_robin"
+
+
+def message_key(event, strategy: PartitionStrategy) -> bytes | None:
+    """Return the Kafka message key for an event.
+
+    Keyed messages are placed with the murmur2 hash used by the Java client,
+    so every producer (and every ingestion worker) maps a given user or event
+    name to the same partition and per-key ordering is preserved.
+
+    Args:
+        event: Object with ``user_id`` and ``event_name`` attributes
+        strategy: Partitioning strategy from settings
+
+    Returns:
+        bytes | None: the key, or None for round-robin placement
+    """
+    if strategy is PartitionStrategy.USER_ID:
+        return event.user_id.encode("utf-8")
+    if strategy is PartitionStrategy.EVENT_NAME:
+        return event.event_name.encode("utf-8")
+    return None
+
+
+class RoundRobinPartitioner:
+    """Partitioner that cycles through available partitions for unkeyed messages.
+
+    aiokafka's default picks a random partition for messages without a key;
+    keyed messages are still delegated to the default murmur2 placement.
+    """
+
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def __call__(self, key, all_partitions, available):
+        if key is not None:
+            return DefaultPartitioner()(key, all_partitions, available)
+        partitions = available or all_partitions
+        return partitions[next(self._counter) % len(partitions)]
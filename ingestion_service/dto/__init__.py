@@ -1,6 +1,27 @@
 """DTOs for the ingestion service."""
 
-from .event import Event
-from .response import EventResponse
+from .event import Event, compute_event_id
+from .content_encoding import ContentEncodingError, UnsupportedEncodingError, DecompressedTooLargeError, decode_content
+from .response import EventResponse, BatchItemResult, BatchEventResponse, StreamAck, StreamError, StreamRejection
+from .codec import SCHEMA_VERSION, CONTENT_TYPE, DecodedEvent, EventDecodeError, decode_event, split_json_array
 
-__all__ = ["Event", "EventResponse"]
\ No newline at end of file
+__all__ = [
+    "Event",
+    "compute_event_id",
+    "EventResponse",
+    "BatchItemResult",
+    "BatchEventResponse",
+    "StreamAck",
+    "StreamError",
+    "StreamRejection",
+    "SCHEMA_VERSION",
+    "CONTENT_TYPE",
+    "DecodedEvent",
+    "EventDecodeError",
+    "decode_event",
+    "split_json_array",
+    "ContentEncodingError",
+    "UnsupportedEncodingError",
+    "DecompressedTooLargeError",
+    "decode_content",
+]
@@ -0,0 +1,194 @@
+"""Event decoding and Kafka value encoding for the ingestion hot path.
+
+When msgspec is installed (the ``fast`` extra) request bodies are decoded
+straight into a compact struct. A body that contains only the known event
+fields is forwarded to Kafka byte-for-byte; otherwise the struct is encoded
+with a single encoder call. Anything the fast path rejects is re-validated
+with the pydantic ``Event`` model, so acceptance rules and error messages are
+the same on both paths. Bodies with sub-microsecond timestamps also take the
+pydantic path, which truncates them (msgspec would round), so the event id
+does not depend on the decoder (``shared.timestamps``).
+
+``KAFKA_VALUE_FORMAT=msgpack`` encodes Kafka values as a msgpack map with the
+same fields as the JSON value (timestamp as an ISO 8601 string). Every
+message names its encoding in the ``content-type`` header, so consumers can
+read both formats while producers are switched over.
+"""
+
+import json
+from datetime import datetime
+from typing import Any, List, NamedTuple
+
+from pydantic import ValidationError
+
+from config.config import get_settings
+from shared.timestamps import has_sub_microsecond
+from .event import Event, compute_event_id
+
+try:
+    import msgspec
+except ImportError:  # optional dependency
+    msgspec = None
+
+settings = get_settings()
+
+# Version of the Kafka value layout, sent in the ``schema_version`` header
+SCHEMA_VERSION = "1"
+
+# Kafka value encodings, sent in the ``content-type`` header
+CONTENT_TYPES = {"json": "application/json", "msgpack": "application/msgpack"}
+
+if settings.KAFKA_VALUE_FORMAT not in CONTENT_TYPES:
+    raise ValueError(f"KAFKA_VALUE_FORMAT must be one of {sorted(CONTENT_TYPES)}")
+if settings.KAFKA_VALUE_FORMAT == "msgpack" and msgspec is None:
+    raise RuntimeError("KAFKA_VALUE_FORMAT=msgpack requires msgspec (install the \"fast\" extra)")
+
+VALUE_FORMAT = settings.KAFKA_VALUE_FORMAT
+CONTENT_TYPE = CONTENT_TYPES[VALUE_FORMAT]
+
+
+class DecodedEvent(NamedTuple):
+    """A validated event, its canonical id and the Kafka value that carries it."""
+    event_id: str
+    user_id: str
+    event_name: str
+    metadata: dict
+    timestamp: str
+    value: bytes
+
+
+class EventDecodeError(ValueError):
+    """Raised when a body is not a valid event."""
+
+
+if msgspec is not None:
+
+    class FastEvent(msgspec.Struct, forbid_unknown_fields=True):
+        """Struct mirror of ``Event`` that rejects unknown fields."""
+        user_id: str
+        event_name: str
+        timestamp: datetime
+        metadata: dict = {}
+
+    class _OpenEvent(FastEvent, forbid_unknown_fields=False):
+        """``FastEvent`` that ignores unknown fields, like the pydantic model."""
+
+    _strict_decoder = msgspec.json.Decoder(FastEvent)
+    _open_decoder = msgspec.json.Decoder(_OpenEvent)
+    _encoder = msgspec.json.Encoder()
+    _msgpack_encoder = msgspec.msgpack.Encoder()
+    _BUFFERS = (bytes, bytearray, memoryview, msgspec.Raw)
+    _JSON_ERRORS = (ValueError, msgspec.DecodeError)
+else:
+    _BUFFERS = (bytes, bytearray, memoryview)
+    _JSON_ERRORS = (ValueError,)
+
+FAST_PATH = msgspec is not None and settings.FAST_PATH_ENABLED
+
+
+def to_payload(event: Event) -> dict:
+    """Build the Kafka payload for a validated event."""
+    return {
+        "user_id": str(event.user_id),
+        "event_name": event.event_name,
+        "metadata": event.metadata,
+        "timestamp": event.timestamp.isoformat()
+    }
+
+
+def _encode_msgpack(user_id: str, event_name: str, metadata: dict, timestamp: str) -> bytes:
+    return _msgpack_encoder.encode(
+        {"user_id": user_id, "event_name": event_name, "metadata": metadata, "timestamp": timestamp}
+    )
+
+
+def _decode_fast(data) -> DecodedEvent | None:
+    """Decode with msgspec, or return None to defer to the pydantic path."""
+    if has_sub_microsecond(data):
+        return None
+    try:
+        event = _strict_decoder.decode(data)
+        value = bytes(data) if VALUE_FORMAT == "json" else None
+    except msgspec.ValidationError:
+        try:
+            event = _open_decoder.decode(data)
+        except msgspec.DecodeError:
+            return None
+        value = _encoder.encode(event) if VALUE_FORMAT == "json" else None
+    except msgspec.DecodeError:
+        return None
+    timestamp = event.timestamp.isoformat()
+    if value is None:
+        value = _encode_msgpack(event.user_id, event.event_name, event.metadata, timestamp)
+    return DecodedEvent(
+        compute_event_id(event.user_id, event.event_name, timestamp, event.metadata),
+        event.user_id, event.event_name, event.metadata, timestamp, value,
+    )
+
+
+def _decode_model(data: Any) -> DecodedEvent:
+    try:
+        if isinstance(data, _BUFFERS):
+            event = Event.model_validate_json(bytes(data))
+        else:
+            event = Event.model_validate(data)
+    except ValidationError as e:
+        raise EventDecodeError(str(e)) from e
+    payload = to_payload(event)
+    if VALUE_FORMAT == "msgpack":
+        value = _msgpack_encoder.encode(payload)
+    else:
+        value = json.dumps(payload).encode("utf-8")
+    return DecodedEvent(
+        event.event_id(), payload["user_id"], payload["event_name"], payload["metadata"], payload["timestamp"], value,
+    )
+
+
+def decode_event(data: Any) -> DecodedEvent:
+    """Validate one event and produce its Kafka value.
+
+    Args:
+        data: Raw JSON bytes of a single event, or an already parsed object
+
+    Raises:
+        EventDecodeError: the data is not a valid event
+    """
+    if FAST_PATH and isinstance(data, _BUFFERS):
+        decoded = _decode_fast(data)
+        if decoded is not None:
+            return decoded
+    return _decode_model(data)
+
+
+def split_json_array(body: bytes) -> List[Any]:
+    """Split a JSON array body into items for ``decode_event``.
+
+    On the fast path the items are raw byte slices of the body so each one
+    can be forwarded without re-encoding.
+
+    Raises:
+        EventDecodeError: the body is not a JSON array
+    """
+    try:
+        if FAST_PATH:
+            return msgspec.json.decode(body, type=List[msgspec.Raw])
+        items = json.loads(body)
+    except _JSON_ERRORS as e:
+        raise EventDecodeError(f"batch body must be a JSON array: {e}") from e
+    if not isinstance(items, list):
+        raise EventDecodeError("batch body must be a JSON array")
+    return items
+
+
+__all__ = [
+    "CONTENT_TYPE",
+    "CONTENT_TYPES",
+    "VALUE_FORMAT",
+    "DecodedEvent",
+    "EventDecodeError",
+    "FAST_PATH",
+    "SCHEMA_VERSION",
+    "decode_event",
+    "split_json_array",
+    "to_payload",
+]
@@ -0,0 +1,98 @@
+"""Decompression of ``Content-Encoding`` request bodies.
+
+Decompression stops as soon as the output would exceed the configured
+limit, so a small compressed body cannot expand into unbounded memory.
+"""
+
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+_CHUNK = 64 * 1024
+
+
+class ContentEncodingError(ValueError):
+    """Raised when a body cannot be decoded with its declared encoding."""
+
+
+class UnsupportedEncodingError(ContentEncodingError):
+    """Raised for an encoding the service does not accept."""
+
+
+class DecompressedTooLargeError(ContentEncodingError):
+    """Raised when the decompressed body exceeds the size limit."""
+
+
+def supported_encodings() -> list[str]:
+    encodings = ["identity", "gzip"]
+    if zstandard is not None:
+        encodings.append("zstd")
+    return encodings
+
+
+def _gunzip(body: bytes, max_bytes: int) -> bytes:
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = decompressor.decompress(body, max_bytes + 1)
+    except zlib.error as e:
+        raise ContentEncodingError(f"invalid gzip body: {e}") from e
+    if len(data) > max_bytes:
+        raise DecompressedTooLargeError(f"decompressed body exceeds {max_bytes} bytes")
+    if not decompressor.eof:
+        raise ContentEncodingError("truncated gzip body")
+    return data
+
+
+def _unzstd(body: bytes, max_bytes: int) -> bytes:
+    chunks = []
+    total = 0
+    try:
+        with zstandard.ZstdDecompressor().stream_reader(body) as reader:
+            while True:
+                chunk = reader.read(_CHUNK)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > max_bytes:
+                    raise DecompressedTooLargeError(f"decompressed body exceeds {max_bytes} bytes")
+                chunks.append(chunk)
+    except zstandard.ZstdError as e:
+        raise ContentEncodingError(f"invalid zstd body: {e}") from e
+    return b"".join(chunks)
+
+
+def decode_content(body: bytes, encoding: str | None, max_bytes: int) -> bytes:
+    """Undo the ``Content-Encoding`` of a request body.
+
+    Args:
+        body: Raw request body
+        encoding: Value of the ``Content-Encoding`` header, if any
+        max_bytes: Largest decompressed body accepted
+
+    Raises:
+        UnsupportedEncodingError: the encoding is not accepted
+        DecompressedTooLargeError: the body expands beyond ``max_bytes``
+        ContentEncodingError: the body is not valid for its encoding
+    """
+    encoding = (encoding or "identity").strip().lower()
+    if encoding == "identity":
+        return body
+    if encoding in ("gzip", "x-gzip"):
+        return _gunzip(body, max_bytes)
+    if encoding == "zstd" and zstandard is not None:
+        return _unzstd(body, max_bytes)
+    raise UnsupportedEncodingError(
+        f"unsupported Content-Encoding {encoding!r}, expected one of: {', '.join(supported_encodings())}"
+    )
+
+
+__all__ = [
+    "ContentEncodingError",
+    "UnsupportedEncodingError",
+    "DecompressedTooLargeError",
+    "decode_content",
+    "supported_encodings",
+]
@@ -1,7 +1,26 @@
+import hashlib
+import json
 from datetime import datetime
 from pydantic import BaseModel, Field
 
 
+def compute_event_id(user_id: str, event_name: str, timestamp: str, metadata: dict) -> str:
+    """Return the canonical event id.
+
+    This is the ``events`` primary key. The consumer used to derive it from
+    the same fields, so ids of rows written before ingestion started sending
+    them in message headers are unchanged.
+
+    Args:
+        user_id: User identifier
+        event_name: Event name
+        timestamp: ISO-8601 timestamp as produced by ``datetime.isoformat()``
+        metadata: Event metadata
+    """
+    key = f"{user_id}|{event_name}|{timestamp}|{json.dumps(metadata, sort_keys=True)}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
 class Event(BaseModel):
     """Data Transfer Object for incoming events.
     
@@ -14,4 +33,7 @@ class Event(BaseModel):
     user_id: str = Field(..., alias="user_id")
     event_name: str = Field(..., alias="event_name")
     metadata: dict = Field(default_factory=dict)
-    timestamp: datetime
\ No newline at end of file
+    timestamp: datetime
+
+    def event_id(self) -> str:
+        return compute_event_id(self.user_id, self.event_name, self.timestamp.isoformat(), self.metadata)
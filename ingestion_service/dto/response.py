@@ -1,7 +1,67 @@
+from typing import List, Optional
 from pydantic import BaseModel
 
 
 class EventResponse(BaseModel):
     """Response model for event ingestion."""
     status: str
-    event_id: str
\ No newline at end of file
+    event_id: str
+
+
+class BatchItemResult(BaseModel):
+    """Per-item outcome of a batch ingestion request.
+
+    Attributes:
+        index (int): Position of the item in the submitted batch
+        status (str): "accepted" or "rejected"
+        event_id (str): Event id for accepted items
+        error (str): Validation error for rejected items
+    """
+    index: int
+    status: str
+    event_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchEventResponse(BaseModel):
+    """Response model for batch event ingestion."""
+    accepted: int
+    rejected: int
+    results: List[BatchItemResult]
+
+
+class StreamRejection(BaseModel):
+    """A streamed event that failed validation."""
+    seq: int
+    error: str
+
+
+class StreamAck(BaseModel):
+    """Acknowledgement of one window of a streaming ingestion connection.
+
+    Attributes:
+        type (str): "ack"
+        offset (int): Number of events resolved so far on this connection;
+            every event with ``seq < offset`` is either published or listed
+            as rejected
+        accepted (int): Events published on this connection so far
+        rejected (int): Events rejected on this connection so far
+        errors (list): Events of this window that failed validation
+    """
+    type: str = "ack"
+    offset: int
+    accepted: int
+    rejected: int
+    errors: List[StreamRejection] = []
+
+
+class StreamError(BaseModel):
+    """Sent before the server closes a stream it cannot publish right now.
+
+    Events from ``offset`` on were not accepted; the client should reconnect
+    after ``retry_after`` seconds and resend them.
+    """
+    type: str = "error"
+    offset: int
+    retry_after: int
+    detail: str
@@ -1,6 +1,8 @@
-from fastapi import FastAPI
+import os
+import asyncio
 import logging
-from prometheus_client import start_http_server
+from fastapi import FastAPI
+from prometheus_client import multiprocess, start_http_server
 
 # OpenTelemetry
 from opentelemetry import trace
@@ -13,12 +15,39 @@ from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from config.config import get_settings, init_kafka_producer
 from contextlib import asynccontextmanager
 from routes import events_router, metrics_router
-from services import kafka_service
+from services import kafka_service, Spool
+from shared.logs import setup_logging
 
 settings = get_settings()
+logger = logging.getLogger("ingestion")
+
+
+async def _reconnect_kafka_producer():
+    """Retry producer startup with backoff until the broker is reachable."""
+    delay = 1.0
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            await init_kafka_producer(settings, kafka_service)
+            logger.info("kafka producer connected after retry")
+            return
+        except Exception as e:
+            logger.warning("kafka producer still unavailable: %s", e)
+            delay = min(delay * 2, settings.KAFKA_RECONNECT_MAX_BACKOFF)
+
 
 @asynccontextmanager
 async def lifespan(app):
+    log_listener = setup_logging(
+        settings.SERVICE_NAME,
+        level=settings.LOG_LEVEL,
+        json_output=settings.LOG_JSON,
+        queue_size=settings.LOG_QUEUE_SIZE,
+        sample_rates=settings.LOG_SAMPLE_RATES,
+        exception_burst=settings.LOG_EXCEPTION_BURST,
+        exception_interval=settings.LOG_EXCEPTION_INTERVAL,
+    )
+
     try:
         resource = Resource.create({"service.name": settings.SERVICE_NAME})
         provider = TracerProvider(resource=resource)
@@ -29,15 +58,30 @@ async def lifespan(app):
     except Exception as e:
         print(f"Failed to setup OTEL: {e}")
 
-    producer = None
+    if settings.SPOOL_ENABLED:
+        kafka_service.start_spool(Spool.claim(
+            settings.SPOOL_DIR,
+            segment_bytes=settings.SPOOL_SEGMENT_BYTES,
+            max_bytes=settings.SPOOL_MAX_BYTES,
+            fsync=settings.SPOOL_FSYNC,
+            fsync_interval=settings.SPOOL_FSYNC_INTERVAL,
+        ))
+
+    reconnect = None
     try:
-        producer = await init_kafka_producer(settings, kafka_service)
+        await init_kafka_producer(settings, kafka_service)
     except Exception as e:
         print(f"Failed to initialize Kafka producer: {e}")
+        reconnect = asyncio.create_task(_reconnect_kafka_producer())
     
     yield
-    if producer:
-        await producer.stop()
+    if reconnect is not None:
+        reconnect.cancel()
+    await kafka_service.stop()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # drop this worker's live gauges from the aggregated view
+        multiprocess.mark_process_dead(os.getpid())
+    log_listener.stop()
 
 app = FastAPI(title="ingestion-service", lifespan=lifespan)
 
@@ -1,41 +1,397 @@
-from fastapi import APIRouter, HTTPException, status
-import json
-import logging
-import hashlib
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from typing import Optional
+import time
 import asyncio
-from prometheus_client import Counter
+import logging
+from prometheus_client import Counter, Gauge, Histogram
 
-from dto import Event, EventResponse
+from dto import (
+    SCHEMA_VERSION,
+    CONTENT_TYPE,
+    Event,
+    EventResponse,
+    BatchItemResult,
+    BatchEventResponse,
+    StreamAck,
+    StreamError,
+    StreamRejection,
+    DecodedEvent,
+    EventDecodeError,
+    decode_event,
+    split_json_array,
+    ContentEncodingError,
+    UnsupportedEncodingError,
+    DecompressedTooLargeError,
+    decode_content,
+)
 from config.config import get_settings
-from services import kafka_service
+from config.queue import PartitionStrategy, message_key
+from services import (
+    kafka_service,
+    DeliveryMode,
+    KafkaMessage,
+    PublishRejectedError,
+)
 
 router = APIRouter()
 settings = get_settings()
 logger = logging.getLogger("ingestion")
 
 events_ingested = Counter("events_ingested_total", "Total events accepted by ingestion service")
+events_rejected = Counter("events_rejected_total", "Total batch items rejected by validation")
+stream_connections = Gauge("events_stream_connections", "Open streaming ingestion connections", multiprocess_mode="livesum")
+stream_acks = Counter("events_stream_acks_total", "Ack windows sent on streaming ingestion connections")
+stage_duration = Histogram(
+    "ingestion_stage_seconds",
+    "Time a request or stream window spends in each ingestion stage (read, decode, publish)",
+    ["stage"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+batch_events = Histogram(
+    "ingestion_batch_events",
+    "Events per batch request or stream window",
+    ["endpoint"],
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+)
 
+PARTITION_STRATEGY = PartitionStrategy(settings.KAFKA_PARTITION_STRATEGY)
 
-@router.post("/events", status_code=status.HTTP_202_ACCEPTED, response_model=EventResponse)
-async def post_event(event: Event):
-    """Accept an event, validate, and publish to Kafka.
+_SCHEMA_VERSION = SCHEMA_VERSION.encode()
+_CONTENT_TYPE = CONTENT_TYPE.encode()
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+EVENT_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": Event.model_json_schema()}},
+    }
+}
 
-    Uses aiokafka for higher throughput and OpenTelemetry tracing.
+
+def _message(event: DecodedEvent, ingest_ts: bytes) -> KafkaMessage:
+    """Wrap a decoded event in a Kafka message.
+
+    The message is keyed by the partition strategy and carries the canonical
+    event id, the value schema version and encoding, and the ingestion time
+    (epoch milliseconds) as headers, so the consumer does not recompute the id.
     """
+    headers = [
+        ("event_id", event.event_id.encode()),
+        ("schema_version", _SCHEMA_VERSION),
+        ("content-type", _CONTENT_TYPE),
+        ("ingest_ts", ingest_ts),
+    ]
+    return KafkaMessage(event.value, message_key(event, PARTITION_STRATEGY), headers)
+
+
+def _ingest_ts() -> bytes:
+    return str(int(time.time() * 1000)).encode()
+
+
+def delivery_mode(x_delivery_mode: Optional[str] = Header(None)) -> DeliveryMode:
+    """Resolve the per-request delivery mode from the ``X-Delivery-Mode`` header."""
     try:
-        payload = {
-            "user_id": str(event.user_id),
-            "event_name": event.event_name,
-            "metadata": event.metadata,
-            "timestamp": event.timestamp.isoformat()
-        }
+        return DeliveryMode(x_delivery_mode or settings.DEFAULT_DELIVERY_MODE)
+    except ValueError:
+        allowed = ", ".join(m.value for m in DeliveryMode)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"X-Delivery-Mode must be one of: {allowed}")
+
+
+def _rejected(e: PublishRejectedError) -> HTTPException:
+    """Map a publish rejection to a retryable HTTP error."""
+    return HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
-        digest = hashlib.sha256((payload["user_id"] + payload["event_name"] + payload["timestamp"]).encode()).hexdigest()
 
-        asyncio.create_task(kafka_service.send_event_to_kafka(payload))
+async def _read_body(request: Request) -> bytes:
+    """Return the request body with its gzip/zstd ``Content-Encoding`` undone.
+
+    Answers 415 for an unsupported encoding, 413 when the body expands
+    beyond ``MAX_DECOMPRESSED_BYTES`` and 400 for a corrupt body.
+    """
+    body = await request.body()
+    try:
+        return decode_content(body, request.headers.get("content-encoding"), settings.MAX_DECOMPRESSED_BYTES)
+    except UnsupportedEncodingError as e:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
+    except DecompressedTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except ContentEncodingError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def _split_batch_body(body: bytes, content_type: str) -> list:
+    """Split a batch request body into items for ``decode_event``.
+
+    NDJSON bodies are split per line so a malformed line only rejects that
+    item; a JSON array body that cannot be parsed rejects the request.
+    """
+    if any(ct in content_type for ct in NDJSON_CONTENT_TYPES):
+        return [line for line in body.splitlines() if line.strip()]
+    try:
+        return split_json_array(body)
+    except EventDecodeError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.post(
+    "/events",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=EventResponse,
+    openapi_extra=EVENT_REQUEST_BODY,
+)
+async def post_event(request: Request, mode: DeliveryMode = Depends(delivery_mode)):
+    """Accept an event, validate, and publish to Kafka.
+
+    Uses aiokafka for higher throughput and OpenTelemetry tracing. The raw
+    body is decoded by ``dto.codec`` so the msgspec fast path can forward it
+    to Kafka without re-serializing. The body may be gzip or zstd
+    compressed (``Content-Encoding``). Answers 429/503 with ``Retry-After``
+    when the publish pipeline is saturated or Kafka is unavailable.
+    """
+    start = time.perf_counter()
+    body = await _read_body(request)
+    read_done = time.perf_counter()
+    stage_duration.labels(stage="read").observe(read_done - start)
+    try:
+        event = decode_event(body)
+    except EventDecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    decode_done = time.perf_counter()
+    stage_duration.labels(stage="decode").observe(decode_done - read_done)
+
+    try:
+        await kafka_service.publish([_message(event, _ingest_ts())], mode)
+        stage_duration.labels(stage="publish").observe(time.perf_counter() - decode_done)
         events_ingested.inc()
-        logger.info("event_received user=%s event=%s id=%s", payload["user_id"], payload["event_name"], digest)
-        return EventResponse(status="accepted", event_id=digest)
+        logger.info("event_received user=%s event=%s id=%s", event.user_id, event.event_name, event.event_id)
+        return EventResponse(status="accepted", event_id=event.event_id)
+    except PublishRejectedError as e:
+        raise _rejected(e)
     except Exception as e:
         logger.exception("failed to publish event")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/events/batch", status_code=status.HTTP_202_ACCEPTED, response_model=BatchEventResponse)
+async def post_events_batch(request: Request, mode: DeliveryMode = Depends(delivery_mode)):
+    """Accept up to ``BATCH_MAX_EVENTS`` events in one request.
+
+    The body is either a JSON array of events or NDJSON (one event per line,
+    sent with an ``application/x-ndjson`` content type), optionally gzip or
+    zstd compressed (``Content-Encoding``). Items are validated
+    individually; valid ones are published to Kafka as a single producer
+    batch and invalid ones are reported back with their validation error.
+    """
+    start = time.perf_counter()
+    body = await _read_body(request)
+    read_done = time.perf_counter()
+    stage_duration.labels(stage="read").observe(read_done - start)
+    items = _split_batch_body(body, request.headers.get("content-type", ""))
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="batch is empty")
+    if len(items) > settings.BATCH_MAX_EVENTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"batch exceeds {settings.BATCH_MAX_EVENTS} events",
+        )
+
+    ingest_ts = _ingest_ts()
+    messages = []
+    results = []
+    for index, item in enumerate(items):
+        try:
+            event = decode_event(item)
+        except EventDecodeError as e:
+            results.append(BatchItemResult(index=index, status="rejected", error=str(e)))
+            continue
+        messages.append(_message(event, ingest_ts))
+        results.append(BatchItemResult(index=index, status="accepted", event_id=event.event_id))
+    decode_done = time.perf_counter()
+    stage_duration.labels(stage="decode").observe(decode_done - read_done)
+    batch_events.labels(endpoint="batch").observe(len(items))
+
+    try:
+        if messages:
+            await kafka_service.publish(messages, mode)
+            stage_duration.labels(stage="publish").observe(time.perf_counter() - decode_done)
+    except PublishRejectedError as e:
+        raise _rejected(e)
+    except Exception as e:
+        logger.exception("failed to publish batch")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    rejected = len(results) - len(messages)
+    events_ingested.inc(len(messages))
+    events_rejected.inc(rejected)
+    logger.info("batch_received accepted=%s rejected=%s", len(messages), rejected)
+    return BatchEventResponse(accepted=len(messages), rejected=rejected, results=results)
+
+
+class _StreamClosed(Exception):
+    """The stream was closed by the server after an error message."""
+
+
+class _StreamWindow:
+    """Accumulates streamed events into micro-batches and acknowledges them.
+
+    Every non-empty NDJSON line gets the next sequence number of the
+    connection. Valid events are buffered as Kafka messages and published
+    as one batch by ``flush``, which then sends a ``StreamAck`` with the
+    cumulative offset.
+    """
+
+    def __init__(self, websocket: WebSocket, mode: DeliveryMode):
+        self.websocket = websocket
+        self.mode = mode
+        self.next_seq = 0
+        self.acked = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.messages: list[KafkaMessage] = []
+        self.errors: list[StreamRejection] = []
+        self.opened_at: float | None = None
+        self.decode_seconds = 0.0
+
+    def add(self, frame: bytes):
+        """Validate the NDJSON lines of one frame into the current window."""
+        start = time.perf_counter()
+        ingest_ts = _ingest_ts()
+        for line in frame.split(b"\n"):
+            if not line.strip():
+                continue
+            seq = self.next_seq
+            self.next_seq += 1
+            try:
+                event = decode_event(line)
+            except EventDecodeError as e:
+                self.errors.append(StreamRejection(seq=seq, error=str(e)))
+                continue
+            self.messages.append(_message(event, ingest_ts))
+        if self.opened_at is None and self.next_seq > self.acked:
+            self.opened_at = time.monotonic()
+        self.decode_seconds += time.perf_counter() - start
+
+    def full(self) -> bool:
+        return self.next_seq - self.acked >= settings.STREAM_BATCH_MAX_EVENTS
+
+    def time_left(self) -> float | None:
+        """Seconds until the open window must be flushed, or None if it is empty."""
+        if self.opened_at is None:
+            return None
+        return max(0.0, self.opened_at + settings.STREAM_FLUSH_INTERVAL_MS / 1000 - time.monotonic())
+
+    async def flush(self, send_ack: bool = True):
+        """Publish the window and acknowledge it.
+
+        Raises:
+            _StreamClosed: the batch could not be published; the client got a
+                ``StreamError`` with the offset to resume from
+        """
+        if self.next_seq == self.acked:
+            return
+        stage_duration.labels(stage="decode").observe(self.decode_seconds)
+        batch_events.labels(endpoint="stream").observe(self.next_seq - self.acked)
+        self.decode_seconds = 0.0
+        try:
+            if self.messages:
+                start = time.perf_counter()
+                await kafka_service.publish(self.messages, self.mode)
+                stage_duration.labels(stage="publish").observe(time.perf_counter() - start)
+        except Exception as e:
+            if isinstance(e, PublishRejectedError):
+                error = StreamError(offset=self.acked, retry_after=e.retry_after, detail=str(e))
+            else:
+                logger.exception("failed to publish stream window")
+                error = StreamError(offset=self.acked, retry_after=settings.PUBLISH_RETRY_AFTER_SECONDS, detail=str(e))
+            if send_ack:
+                await self.websocket.send_text(error.model_dump_json())
+                await self.websocket.close(code=1013)
+            raise _StreamClosed() from e
+
+        self.accepted += len(self.messages)
+        self.rejected += len(self.errors)
+        events_ingested.inc(len(self.messages))
+        events_rejected.inc(len(self.errors))
+        ack = StreamAck(offset=self.next_seq, accepted=self.accepted, rejected=self.rejected, errors=self.errors)
+        self.acked = self.next_seq
+        self.messages = []
+        self.errors = []
+        self.opened_at = None
+        if send_ack:
+            await self.websocket.send_text(ack.model_dump_json())
+            stream_acks.inc()
+
+
+async def _read_frames(websocket: WebSocket, frames: asyncio.Queue):
+    """Move received frames into ``frames``; ``None`` marks the end of the stream.
+
+    The queue is bounded, so a client sending faster than batches are
+    published stops being read and is slowed down by TCP flow control.
+    """
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            data = message.get("bytes")
+            if data is None:
+                data = (message.get("text") or "").encode()
+            await frames.put(data)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    await frames.put(None)
+
+
+@router.websocket("/events/stream")
+async def stream_events(websocket: WebSocket):
+    """Long-lived streaming ingestion over a WebSocket.
+
+    Each text or binary frame carries one or more complete NDJSON event
+    lines. Events are validated as they arrive and published in micro-batches
+    of up to ``STREAM_BATCH_MAX_EVENTS`` events or ``STREAM_FLUSH_INTERVAL_MS``
+    after the first buffered event. Each published window is answered with a
+    ``StreamAck`` carrying the cumulative ``offset`` (number of events of
+    the connection resolved so far); validation failures of the window are
+    listed by sequence number.
+
+    The delivery mode comes from the ``X-Delivery-Mode`` header or the
+    ``delivery_mode`` query parameter (default ``STREAM_DELIVERY_MODE``).
+    When Kafka cannot take a window the server sends a ``StreamError`` with
+    the offset to resume from and closes the connection with code 1013.
+    """
+    try:
+        mode = DeliveryMode(
+            websocket.headers.get("x-delivery-mode")
+            or websocket.query_params.get("delivery_mode")
+            or settings.STREAM_DELIVERY_MODE
+        )
+    except ValueError:
+        await websocket.close(code=1008, reason="invalid delivery mode")
+        return
+
+    await websocket.accept()
+    stream_connections.inc()
+    frames: asyncio.Queue = asyncio.Queue(maxsize=settings.STREAM_MAX_PENDING_FRAMES)
+    reader = asyncio.create_task(_read_frames(websocket, frames))
+    window = _StreamWindow(websocket, mode)
+    try:
+        while True:
+            try:
+                frame = await asyncio.wait_for(frames.get(), window.time_left())
+            except asyncio.TimeoutError:
+                await window.flush()
+                continue
+            if frame is None:
+                # client went away: publish what it sent, there is no one to ack
+                await window.flush(send_ack=False)
+                break
+            window.add(frame)
+            if window.full():
+                await window.flush()
+    except (_StreamClosed, WebSocketDisconnect):
+        pass
+    finally:
+        reader.cancel()
+        stream_connections.dec()
+        logger.info("stream_closed accepted=%s rejected=%s", window.accepted, window.rejected)
@@ -1,5 +1,7 @@
+import os
+
 from fastapi import APIRouter, Response
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import CollectorRegistry, generate_latest, multiprocess, CONTENT_TYPE_LATEST
 
 router = APIRouter()
 
@@ -12,5 +14,14 @@ def health():
 
 @router.get("/metrics")
 def metrics():
-    """Expose Prometheus metrics."""
+    """Expose Prometheus metrics.
+
+    In multi-worker mode (``PROMETHEUS_MULTIPROC_DIR`` set) the metric files
+    of all workers are aggregated, so the answer does not depend on which
+    worker handles the scrape.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""Start the ingestion service with ``WORKERS`` uvicorn worker processes.
+
+Every worker runs its own lifespan, so each one has its own Kafka producer
+and its own disk spool directory. With more than one worker, prometheus
+multiprocess mode is enabled: workers write their metrics to files under
+``PROMETHEUS_MULTIPROC_DIR`` and ``/metrics`` aggregates them, so counters
+such as ``events_ingested_total`` cover the whole service whichever worker
+answers the scrape.
+
+Usage: python serve.py
+"""
+import os
+import shutil
+
+import uvicorn
+
+from config.config import get_settings
+
+
+def main():
+    settings = get_settings()
+    if settings.WORKERS > 1 or "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Must be set before the workers import prometheus_client
+        metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.PROMETHEUS_MULTIPROC_DIR)
+        # Files left by a previous run would be added to this run's counters
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir)
+    uvicorn.run("main:app", host=settings.HOST, port=settings.PORT, workers=settings.WORKERS)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,23 @@
-from .kafka_service import kafka_service, KafkaService
+from .kafka_service import (
+    kafka_service,
+    KafkaService,
+    DeliveryMode,
+    PublishRejectedError,
+    ProducerUnavailableError,
+    PublishSaturatedError,
+)
+from .messages import KafkaMessage
+from .spool import Spool, SpoolFullError, SpoolLockedError
 
-__all__ = ["kafka_service", "KafkaService"]
\ No newline at end of file
+__all__ = [
+    "kafka_service",
+    "KafkaService",
+    "DeliveryMode",
+    "KafkaMessage",
+    "PublishRejectedError",
+    "ProducerUnavailableError",
+    "PublishSaturatedError",
+    "Spool",
+    "SpoolFullError",
+    "SpoolLockedError",
+]
@@ -1,18 +1,95 @@
-import json
+import time
+import asyncio
 import logging
+from enum import Enum
 from aiokafka import AIOKafkaProducer
+from prometheus_client import Counter, Gauge, Histogram
 
 from config.config import get_settings
+from .messages import KafkaMessage
+from .spool import SpoolFullError
 
 settings = get_settings()
 logger = logging.getLogger("ingestion")
 
+publish_inflight_messages = Gauge(
+    "kafka_publish_inflight_messages", "Messages handed to the producer and not yet acknowledged", multiprocess_mode="livesum"
+)
+publish_inflight_bytes = Gauge(
+    "kafka_publish_inflight_bytes", "Bytes handed to the producer and not yet acknowledged", multiprocess_mode="livesum"
+)
+publish_latency = Histogram(
+    "kafka_publish_latency_seconds",
+    "Time from handing a batch to the producer until it is acknowledged",
+    ["mode"],
+)
+publish_rejected = Counter("kafka_publish_rejected_total", "Publish requests rejected before reaching the producer", ["reason"])
+publish_failed = Counter("kafka_publish_failed_total", "Messages that failed to publish after being accepted")
+
+
+class DeliveryMode(str, Enum):
+    """How long a request waits for Kafka before it is answered."""
+
+    FIRE_AND_FORGET = "fire-and-forget"
+    LEADER_ACK = "leader-ack"
+    FULL_ACK = "full-ack"
+
+
+class PublishRejectedError(Exception):
+    """Raised when a publish cannot be accepted right now.
+
+    Attributes:
+        status_code (int): HTTP status the route should answer with
+        retry_after (int): Seconds the client should wait before retrying
+    """
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after if retry_after is not None else settings.PUBLISH_RETRY_AFTER_SECONDS
+
+
+class ProducerUnavailableError(PublishRejectedError):
+    """The producer is not started or the broker failed the delivery."""
+
+    status_code = 503
+
+
+class PublishSaturatedError(PublishRejectedError):
+    """The in-flight message or memory budget is exhausted."""
+
+    status_code = 429
+
 
 class KafkaService:
-    """Singleton service for Kafka operations."""
+    """Singleton service for Kafka operations.
+
+    Every publish reserves room in a bounded in-flight budget (message count
+    and payload bytes) before it reaches the producer and releases it once
+    the broker acknowledges. When the budget is exhausted callers get a
+    ``PublishSaturatedError`` instead of piling up pending tasks in memory.
+
+    When a disk spool is attached, fire-and-forget publishes that cannot go
+    to Kafka right away (no producer, saturated pipeline, or a producer whose
+    last delivery failed) are appended to the spool instead, and a
+    background drainer replays it into Kafka in large batches. The drainer's
+    deliveries double as health probes: once one is acknowledged, live
+    traffic goes straight to Kafka again while the backlog drains behind it,
+    so spooled messages may arrive after newer ones.
+    """
 
     _instance = None
     _producer: AIOKafkaProducer | None = None
+    _leader_ack_producer: AIOKafkaProducer | None = None
+    _full_ack_producer: AIOKafkaProducer | None = None
+    _inflight_messages: int = 0
+    _inflight_bytes: int = 0
+    # False from a failed delivery until the next acknowledged one
+    _producer_healthy: bool = True
+    _tasks: set = set()
+    _spool = None
+    _drainer: asyncio.Task | None = None
 
     def __new__(cls):
         if cls._instance is None:
@@ -20,22 +97,188 @@ class KafkaService:
         return cls._instance
 
     @classmethod
-    def set_producer(cls, prod: AIOKafkaProducer):
-        """Set the Kafka producer instance."""
+    def set_producer(
+        cls,
+        prod: AIOKafkaProducer,
+        full_ack_producer: AIOKafkaProducer | None = None,
+        leader_ack_producer: AIOKafkaProducer | None = None,
+    ):
+        """Set the Kafka producer instances.
+
+        Args:
+            prod: Producer used for fire-and-forget deliveries
+            full_ack_producer: Producer configured with ``acks="all"``; falls
+                back to ``prod`` when not given
+            leader_ack_producer: Producer configured with ``acks=1`` or
+                stronger, used for leader-ack deliveries and the spool drain;
+                falls back to ``prod`` when not given
+        """
         cls._producer = prod
+        cls._leader_ack_producer = leader_ack_producer or prod
+        cls._full_ack_producer = full_ack_producer or prod
+        cls._producer_healthy = True
+
+    @classmethod
+    def start_spool(cls, spool):
+        """Attach a disk spool and start draining it into Kafka."""
+        cls._spool = spool
+        cls._drainer = asyncio.create_task(cls._drain_spool())
+
+    @classmethod
+    async def stop(cls):
+        """Wait for in-flight fire-and-forget deliveries and stop the producers."""
+        if cls._drainer is not None:
+            cls._drainer.cancel()
+            await asyncio.gather(cls._drainer, return_exceptions=True)
+            cls._drainer = None
+        if cls._tasks:
+            await asyncio.gather(*cls._tasks, return_exceptions=True)
+        if cls._spool is not None:
+            cls._spool.close()
+            cls._spool = None
+        for producer in {cls._producer, cls._leader_ack_producer, cls._full_ack_producer}:
+            if producer is not None:
+                await producer.stop()
+        cls._producer = None
+        cls._leader_ack_producer = None
+        cls._full_ack_producer = None
+
+    @classmethod
+    async def publish(cls, messages: list[KafkaMessage], mode: DeliveryMode = DeliveryMode.FIRE_AND_FORGET):
+        """Publish encoded messages to Kafka as one producer batch.
+
+        Args:
+            messages: Encoded Kafka messages
+            mode: ``FIRE_AND_FORGET`` returns once the batch is reserved and
+                scheduled; ``LEADER_ACK`` and ``FULL_ACK`` return once the
+                leader or all in-sync replicas acknowledged it
+
+        Raises:
+            ProducerUnavailableError: no producer is available, or an
+                acknowledged delivery failed
+            PublishSaturatedError: the in-flight budget is exhausted
+        """
+        if mode is DeliveryMode.FULL_ACK:
+            producer = cls._full_ack_producer
+        elif mode is DeliveryMode.LEADER_ACK:
+            producer = cls._leader_ack_producer
+        else:
+            producer = cls._producer
+        nbytes = sum(len(m.value) for m in messages)
+        if mode is DeliveryMode.FIRE_AND_FORGET and cls._spool is not None:
+            if producer is None or not cls._producer_healthy or not cls._has_room(len(messages), nbytes):
+                cls._append_to_spool(messages)
+                return
+
+        if producer is None:
+            publish_rejected.labels(reason="unavailable").inc()
+            raise ProducerUnavailableError("kafka producer not ready")
+        cls._reserve(len(messages), nbytes)
+
+        delivery = cls._deliver(producer, messages, nbytes, mode)
+        if mode is DeliveryMode.FIRE_AND_FORGET:
+            task = asyncio.create_task(delivery)
+            cls._tasks.add(task)
+            task.add_done_callback(cls._tasks.discard)
+            return
+        await delivery
+
+    @classmethod
+    def _has_room(cls, count: int, nbytes: int) -> bool:
+        """Return whether the in-flight budget can take ``count`` more messages.
+
+        A batch larger than the whole budget is still admitted when nothing
+        else is in flight, otherwise it could never be published.
+        """
+        return cls._inflight_messages == 0 or (
+            cls._inflight_messages + count <= settings.PUBLISH_MAX_INFLIGHT_MESSAGES
+            and cls._inflight_bytes + nbytes <= settings.PUBLISH_MAX_INFLIGHT_BYTES
+        )
 
     @classmethod
-    async def send_event_to_kafka(cls, payload: dict):
-        """Send message to Kafka without waiting for confirmation."""
+    def _reserve(cls, count: int, nbytes: int):
+        """Reserve in-flight budget or raise ``PublishSaturatedError``."""
+        if not cls._has_room(count, nbytes):
+            publish_rejected.labels(reason="saturated").inc()
+            raise PublishSaturatedError("publish pipeline saturated")
+        cls._inflight_messages += count
+        cls._inflight_bytes += nbytes
+        publish_inflight_messages.set(cls._inflight_messages)
+        publish_inflight_bytes.set(cls._inflight_bytes)
+
+    @classmethod
+    def _release(cls, count: int, nbytes: int):
+        cls._inflight_messages -= count
+        cls._inflight_bytes -= nbytes
+        publish_inflight_messages.set(cls._inflight_messages)
+        publish_inflight_bytes.set(cls._inflight_bytes)
+
+    @classmethod
+    async def _deliver(cls, producer: AIOKafkaProducer, messages: list[KafkaMessage], nbytes: int, mode: DeliveryMode):
+        """Send messages and wait for their acknowledgements, releasing the reservation."""
+        start = time.perf_counter()
         try:
-            if cls._producer is None:
-                logger.warning("producer not ready")
+            futures = [await producer.send(settings.KAFKA_TOPIC, m.value, key=m.key, headers=m.headers) for m in messages]
+            await asyncio.gather(*futures)
+            publish_latency.labels(mode=mode.value).observe(time.perf_counter() - start)
+            cls._producer_healthy = True
+        except Exception as e:
+            cls._producer_healthy = False
+            if mode is DeliveryMode.FIRE_AND_FORGET and cls._spool is not None:
+                logger.warning("failed to send %s messages to kafka, spooling them: %s", len(messages), e)
+                try:
+                    cls._append_to_spool(messages)
+                    return
+                except PublishSaturatedError:
+                    pass
+            publish_failed.inc(len(messages))
+            if mode is DeliveryMode.FIRE_AND_FORGET:
+                logger.exception("failed to send %s messages to kafka", len(messages))
                 return
-            fut = cls._producer.send_and_wait(settings.KAFKA_TOPIC, json.dumps(payload).encode("utf-8"))
-            await fut
-        except Exception:
-            logger.exception("failed to send message to kafka")
+            raise ProducerUnavailableError(f"kafka delivery failed: {e}") from e
+        finally:
+            cls._release(len(messages), nbytes)
+
+    @classmethod
+    def _append_to_spool(cls, messages: list[KafkaMessage]):
+        try:
+            cls._spool.append(messages)
+        except SpoolFullError as e:
+            publish_rejected.labels(reason="spool_full").inc()
+            raise PublishSaturatedError(str(e)) from e
+
+    @classmethod
+    async def _drain_spool(cls):
+        """Replay spooled messages into Kafka in large batches until cancelled.
+
+        A batch is only committed (removed from the spool) after the leader
+        acknowledged it; ``SPOOL_DRAIN_RATE`` caps messages per second so a
+        large backlog does not starve live traffic. While the producer is
+        unhealthy these batches are what brings it back: live traffic keeps
+        going to the spool until one of them is acknowledged.
+        """
+        spool = cls._spool
+        while True:
+            spool.update_metrics()
+            if cls._producer is None or not spool.pending:
+                await asyncio.sleep(settings.SPOOL_DRAIN_IDLE_SECONDS)
+                continue
+            messages, cursor = spool.read_batch(settings.SPOOL_DRAIN_BATCH)
+            start = time.monotonic()
+            try:
+                await cls.publish(messages, DeliveryMode.LEADER_ACK)
+            except PublishRejectedError as e:
+                logger.warning("spool drain paused: %s", e)
+                await asyncio.sleep(e.retry_after)
+                continue
+            except Exception:
+                logger.exception("spool drain failed")
+                await asyncio.sleep(settings.SPOOL_DRAIN_IDLE_SECONDS)
+                continue
+            spool.commit(cursor, len(messages))
+            if settings.SPOOL_DRAIN_RATE > 0:
+                await asyncio.sleep(max(0.0, len(messages) / settings.SPOOL_DRAIN_RATE - (time.monotonic() - start)))
 
 
 # Global instance for convenience
-kafka_service = KafkaService()
\ No newline at end of file
+kafka_service = KafkaService()
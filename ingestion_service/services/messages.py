@@ -0,0 +1,8 @@
+from typing import NamedTuple
+
+
+class KafkaMessage(NamedTuple):
+    """An encoded message ready to hand to the producer."""
+    value: bytes
+    key: bytes | None = None
+    headers: list[tuple[str, bytes]] | None = None
@@ -0,0 +1,358 @@
+"""Append-only, segment-based disk spool for messages Kafka could not take.
+
+Messages are framed into preallocated, memory-mapped segment files::
+
+    record  = payload length (u32) | crc32 (u32) | payload
+    payload = append time (f64) | key length (i32, -1 = no key)
+              | header count (u16) | value length (u32)
+              | key | (name length (u16) | name | value length (u32) | value)* | value
+
+A zero length marks the end of the written part of a segment. The read
+position is kept in a small ``cursor`` file that is only advanced after
+Kafka acknowledged the drained messages, so a crash replays (never loses)
+messages; the consumer deduplicates them by event id.
+
+A spool directory is owned by one process at a time through an exclusive
+``flock`` on its ``lock`` file; ``Spool.claim`` gives every worker of a
+multi-worker service its own ``worker-N`` directory.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from .messages import KafkaMessage
+
+spool_pending_messages = Gauge("spool_pending_messages", "Messages waiting in the disk spool", multiprocess_mode="livesum")
+spool_pending_bytes = Gauge("spool_pending_bytes", "Bytes waiting in the disk spool", multiprocess_mode="livesum")
+spool_segments = Gauge("spool_segments", "Segment files in the disk spool", multiprocess_mode="livesum")
+spool_oldest_age = Gauge(
+    "spool_oldest_age_seconds", "Age of the oldest message in the disk spool", multiprocess_mode="livemax"
+)
+spool_appended = Counter("spool_appended_messages_total", "Messages written to the disk spool")
+spool_drained = Counter("spool_drained_messages_total", "Messages replayed from the disk spool into Kafka")
+
+_RECORD = struct.Struct("<II")
+_MESSAGE = struct.Struct("<diHI")
+_NAME_LEN = struct.Struct("<H")
+_VALUE_LEN = struct.Struct("<I")
+_CURSOR = struct.Struct("<QQ")
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+Cursor = Tuple[int, int]
+
+
+class SpoolFullError(Exception):
+    """Raised when appending would exceed the spool size limit."""
+
+
+class SpoolLockedError(Exception):
+    """Raised when another process already owns the spool directory."""
+
+
+def _encode(message: KafkaMessage, appended_at: float) -> bytes:
+    headers = message.headers or []
+    key_len = -1 if message.key is None else len(message.key)
+    parts = [_MESSAGE.pack(appended_at, key_len, len(headers), len(message.value))]
+    if message.key is not None:
+        parts.append(message.key)
+    for name, value in headers:
+        raw_name = name.encode()
+        parts += [_NAME_LEN.pack(len(raw_name)), raw_name, _VALUE_LEN.pack(len(value)), value]
+    parts.append(message.value)
+    payload = b"".join(parts)
+    return _RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _decode(payload: bytes) -> KafkaMessage:
+    _, key_len, header_count, value_len = _MESSAGE.unpack_from(payload, 0)
+    pos = _MESSAGE.size
+    key = None
+    if key_len >= 0:
+        key = payload[pos:pos + key_len]
+        pos += key_len
+    headers = []
+    for _ in range(header_count):
+        (name_len,) = _NAME_LEN.unpack_from(payload, pos)
+        pos += _NAME_LEN.size
+        name = payload[pos:pos + name_len].decode()
+        pos += name_len
+        (header_len,) = _VALUE_LEN.unpack_from(payload, pos)
+        pos += _VALUE_LEN.size
+        headers.append((name, payload[pos:pos + header_len]))
+        pos += header_len
+    return KafkaMessage(payload[pos:pos + value_len], key, headers or None)
+
+
+class _Segment:
+    """One preallocated, memory-mapped segment file."""
+
+    def __init__(self, path: str, size: int):
+        exists = os.path.exists(path)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if not exists:
+                os.ftruncate(fd, size)
+            self.size = os.fstat(fd).st_size
+            self.map = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+        self.path = path
+        self.write_pos = 0
+        if exists:
+            self.write_pos = self._recover()
+
+    def _recover(self) -> int:
+        """Find the end of valid data, ignoring a torn trailing record."""
+        pos = 0
+        while True:
+            record = self.read(pos)
+            if record is None:
+                return pos
+            pos = record[1]
+
+    def append(self, record: bytes) -> bool:
+        end = self.write_pos + len(record)
+        if end + _RECORD.size > self.size:
+            return False
+        self.map[self.write_pos:end] = record
+        self.write_pos = end
+        return True
+
+    def read(self, pos: int) -> Optional[Tuple[bytes, int]]:
+        """Return ``(payload, next position)`` of the record at ``pos``, or None."""
+        if pos + _RECORD.size > self.size:
+            return None
+        length, crc = _RECORD.unpack_from(self.map, pos)
+        start = pos + _RECORD.size
+        if length == 0 or start + length > self.size:
+            return None
+        payload = self.map[start:start + length]
+        if zlib.crc32(payload) != crc:
+            return None
+        return payload, start + length
+
+    def count_from(self, pos: int) -> Tuple[int, int]:
+        """Return the number of records and bytes from ``pos`` to the end."""
+        count = 0
+        start = pos
+        while pos < self.write_pos:
+            record = self.read(pos)
+            if record is None:
+                break
+            pos = record[1]
+            count += 1
+        return count, pos - start
+
+    def flush(self):
+        self.map.flush()
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+
+
+class Spool:
+    """Disk-backed FIFO of Kafka messages.
+
+    Args:
+        directory: Directory holding the segment and cursor files
+        segment_bytes: Size of each preallocated segment file
+        max_bytes: Limit on unread bytes; appends beyond it raise ``SpoolFullError``
+        fsync: ``always`` (msync after every append), ``interval`` (at most
+            every ``fsync_interval`` seconds) or ``never`` (left to the OS)
+        fsync_interval: Seconds between syncs for the ``interval`` policy
+
+    Raises:
+        SpoolLockedError: another process holds the directory
+    """
+
+    def __init__(self, directory: str, segment_bytes: int, max_bytes: int, fsync: str = "interval", fsync_interval: float = 1.0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync policy must be one of {FSYNC_POLICIES}")
+        os.makedirs(directory, exist_ok=True)
+        self._lock = open(os.path.join(directory, "lock"), "a")
+        try:
+            fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock.close()
+            raise SpoolLockedError(f"{directory} is used by another process") from None
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._last_sync = time.monotonic()
+
+        seqs = sorted(int(name[:-4]) for name in os.listdir(directory) if name.endswith(".seg"))
+        cursor = self._load_cursor()
+        if cursor is None or cursor[0] not in seqs:
+            cursor = (seqs[0], 0) if seqs else (0, 0)
+        self._read_seq, self._read_pos = cursor
+
+        self._segments: Dict[int, _Segment] = {}
+        for seq in seqs:
+            if seq < self._read_seq:
+                os.unlink(self._path(seq))
+            else:
+                self._segments[seq] = _Segment(self._path(seq), segment_bytes)
+        if not self._segments:
+            self._segments[self._read_seq] = _Segment(self._path(self._read_seq), segment_bytes)
+        self._write_seq = max(self._segments)
+
+        self.pending = 0
+        self.pending_bytes = 0
+        for seq, segment in self._segments.items():
+            count, nbytes = segment.count_from(self._read_pos if seq == self._read_seq else 0)
+            self.pending += count
+            self.pending_bytes += nbytes
+        self.update_metrics()
+
+    @classmethod
+    def claim(cls, base: str, **kwargs) -> "Spool":
+        """Open the first ``worker-N`` directory under ``base`` no other process holds.
+
+        Directories are tried in order, so a restarted worker picks up the
+        backlog a previous worker left behind.
+
+        Args:
+            base: Parent directory of the per-worker spools
+            **kwargs: Passed on to ``Spool``
+        """
+        index = 0
+        while True:
+            try:
+                return cls(os.path.join(base, f"worker-{index}"), **kwargs)
+            except SpoolLockedError:
+                index += 1
+
+    def _path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{seq:020d}.seg")
+
+    def _load_cursor(self) -> Optional[Cursor]:
+        try:
+            with open(os.path.join(self.directory, "cursor"), "rb") as f:
+                return _CURSOR.unpack(f.read(_CURSOR.size))
+        except (OSError, struct.error):
+            return None
+
+    def _store_cursor(self):
+        path = os.path.join(self.directory, "cursor")
+        with open(path + ".tmp", "wb") as f:
+            f.write(_CURSOR.pack(self._read_seq, self._read_pos))
+            if self.fsync != "never":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    def update_metrics(self):
+        """Publish the spool gauges; also called periodically so the age stays current."""
+        spool_oldest_age.set(self.oldest_age())
+        spool_pending_messages.set(self.pending)
+        spool_pending_bytes.set(self.pending_bytes)
+        spool_segments.set(len(self._segments))
+
+    def _roll(self, min_size: int):
+        """Start a new segment large enough for a record of ``min_size`` bytes."""
+        self._segments[self._write_seq].flush()
+        self._write_seq += 1
+        size = max(self.segment_bytes, min_size + _RECORD.size)
+        self._segments[self._write_seq] = _Segment(self._path(self._write_seq), size)
+
+    def _maybe_sync(self):
+        now = time.monotonic()
+        if self.fsync == "always" or (self.fsync == "interval" and now - self._last_sync >= self.fsync_interval):
+            self._segments[self._write_seq].flush()
+            self._last_sync = now
+
+    def append(self, messages: List[KafkaMessage]):
+        """Append messages to the spool.
+
+        Raises:
+            SpoolFullError: the unread data would exceed ``max_bytes``
+        """
+        now = time.time()
+        records = [_encode(m, now) for m in messages]
+        nbytes = sum(len(r) for r in records)
+        if self.pending_bytes + nbytes > self.max_bytes:
+            raise SpoolFullError("disk spool is full")
+        for record in records:
+            if not self._segments[self._write_seq].append(record):
+                self._roll(len(record))
+                self._segments[self._write_seq].append(record)
+        self.pending += len(records)
+        self.pending_bytes += nbytes
+        self._maybe_sync()
+        spool_appended.inc(len(records))
+        self.update_metrics()
+
+    def read_batch(self, max_messages: int) -> Tuple[List[KafkaMessage], Cursor]:
+        """Read up to ``max_messages`` from the read position without consuming them.
+
+        Returns:
+            The messages and the cursor to pass to ``commit`` once they are delivered
+        """
+        seq, pos = self._read_seq, self._read_pos
+        messages = []
+        while len(messages) < max_messages:
+            segment = self._segments[seq]
+            record = segment.read(pos) if pos < segment.write_pos else None
+            if record is None:
+                if seq == self._write_seq:
+                    break
+                seq, pos = seq + 1, 0
+                continue
+            payload, pos = record
+            messages.append(_decode(payload))
+        return messages, (seq, pos)
+
+    def commit(self, cursor: Cursor, count: int):
+        """Mark messages up to ``cursor`` as delivered and reclaim finished segments."""
+        seq, pos = cursor
+        consumed = 0
+        for old in [s for s in self._segments if s < seq]:
+            segment = self._segments.pop(old)
+            consumed += segment.write_pos - (self._read_pos if old == self._read_seq else 0)
+            segment.close()
+            os.unlink(self._path(old))
+        consumed += pos - (self._read_pos if seq == self._read_seq else 0)
+        self._read_seq, self._read_pos = seq, pos
+        self.pending -= count
+        self.pending_bytes -= consumed
+
+        if self.pending == 0 and self._read_pos > 0:
+            # everything delivered: start a fresh segment instead of filling the old one
+            self._roll(0)
+            old = self._segments.pop(self._read_seq)
+            old.close()
+            os.unlink(self._path(self._read_seq))
+            self._read_seq, self._read_pos = self._write_seq, 0
+        self._store_cursor()
+        spool_drained.inc(count)
+        self.update_metrics()
+
+    def oldest_age(self) -> float:
+        """Seconds since the oldest unread message was appended."""
+        if not self.pending:
+            return 0.0
+        segment = self._segments[self._read_seq]
+        pos = self._read_pos
+        if pos >= segment.write_pos:
+            segment, pos = self._segments.get(self._read_seq + 1), 0
+            if segment is None:
+                return 0.0
+        (appended_at,) = struct.unpack_from("<d", segment.map, pos + _RECORD.size)
+        return max(0.0, time.time() - appended_at)
+
+    def close(self):
+        for segment in self._segments.values():
+            segment.close()
+        self._segments.clear()
+        self._lock.close()
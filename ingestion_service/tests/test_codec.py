@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from dto import codec
+from dto.event import compute_event_id
+
+pytestmark = pytest.mark.skipif(codec.msgspec is None, reason="msgspec not installed")
+
+BODY = {"user_id": "u1", "event_name": "click", "metadata": {"page": "/"}}
+# The id of the event truncated to microseconds, as pydantic parses it
+TRUNCATED_ID = compute_event_id("u1", "click", "2024-01-01T00:00:00.123456+00:00", {"page": "/"})
+
+
+@pytest.mark.parametrize("timestamp", ["2024-01-01T00:00:00.123456789Z", "2024-01-01T00:00:00.1234569Z"])
+def test_sub_microsecond_timestamp_has_one_id(timestamp):
+    data = json.dumps({**BODY, "timestamp": timestamp}).encode()
+    fast = codec._decode_fast(data) or codec._decode_model(data)
+    model = codec._decode_model(data)
+    assert fast.event_id == model.event_id == TRUNCATED_ID
+    assert fast.timestamp == model.timestamp == "2024-01-01T00:00:00.123456+00:00"
+    assert json.loads(fast.value)["timestamp"] == "2024-01-01T00:00:00.123456+00:00"
+
+
+def test_microsecond_timestamp_uses_fast_path():
+    data = json.dumps({**BODY, "timestamp": "2024-01-01T00:00:00.123456Z"}).encode()
+    fast = codec._decode_fast(data)
+    assert fast is not None
+    assert fast.event_id == codec._decode_model(data).event_id == TRUNCATED_ID
@@ -0,0 +1,104 @@
+import asyncio
+
+from config.queue import config as queue_config
+from services.kafka_service import DeliveryMode, KafkaMessage, KafkaService, settings
+from services.spool import Spool
+
+
+class FlakyProducer:
+    """Producer whose broker is down until ``up`` is set."""
+
+    def __init__(self):
+        self.up = False
+        self.sent = []
+
+    async def send(self, topic, value, key=None, headers=None):
+        if not self.up:
+            raise ConnectionError("broker down")
+        self.sent.append(value)
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(None)
+        return future
+
+    async def stop(self):
+        pass
+
+
+class RecordingProducer:
+    """Producer that records what it sent, keyed by its ``acks`` setting."""
+
+    sent = {}
+
+    def __init__(self, acks, **options):
+        self.acks = acks
+
+    async def start(self):
+        pass
+
+    async def send(self, topic, value, key=None, headers=None):
+        self.sent.setdefault(self.acks, []).append(value)
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(None)
+        return future
+
+    async def stop(self):
+        pass
+
+
+async def _wait_for(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_live_traffic_bypasses_spool_once_producer_recovers(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SPOOL_DRAIN_BATCH", 2)
+    monkeypatch.setattr(settings, "SPOOL_DRAIN_RATE", 20)
+    monkeypatch.setattr(settings, "SPOOL_DRAIN_IDLE_SECONDS", 0.01)
+
+    async def scenario():
+        producer = FlakyProducer()
+        spool = Spool(str(tmp_path), segment_bytes=1 << 16, max_bytes=1 << 20)
+        KafkaService.set_producer(producer)
+        KafkaService.start_spool(spool)
+        try:
+            # The first delivery fails and is spooled; later publishes go to the spool directly
+            await KafkaService.publish([KafkaMessage(b"0")])
+            await _wait_for(lambda: spool.pending == 1)
+            for i in range(1, 10):
+                await KafkaService.publish([KafkaMessage(b"%d" % i)])
+            assert spool.pending == 10 and producer.sent == []
+
+            producer.up = True
+            await _wait_for(lambda: producer.sent)
+            # Backlog still draining at SPOOL_DRAIN_RATE, yet live traffic goes to Kafka
+            await KafkaService.publish([KafkaMessage(b"live")])
+            await _wait_for(lambda: b"live" in producer.sent)
+            assert spool.pending > 0
+
+            await _wait_for(lambda: spool.pending == 0)
+            assert sorted(producer.sent) == sorted([b"%d" % i for i in range(10)] + [b"live"])
+        finally:
+            await KafkaService.stop()
+
+    asyncio.run(scenario())
+
+
+def test_leader_ack_waits_for_the_leader_with_acks_0(monkeypatch):
+    monkeypatch.setattr(queue_config, "AIOKafkaProducer", RecordingProducer)
+    monkeypatch.setattr(RecordingProducer, "sent", {})
+    monkeypatch.setattr(settings, "KAFKA_ACKS", "0")
+
+    async def scenario():
+        await queue_config.init_kafka_producer(settings, KafkaService)
+        try:
+            await KafkaService.publish([KafkaMessage(b"leader")], DeliveryMode.LEADER_ACK)
+            await KafkaService.publish([KafkaMessage(b"full")], DeliveryMode.FULL_ACK)
+            await KafkaService.publish([KafkaMessage(b"fire")])
+            await _wait_for(lambda: 0 in RecordingProducer.sent)
+        finally:
+            await KafkaService.stop()
+
+    asyncio.run(scenario())
+    assert RecordingProducer.sent == {1: [b"leader"], "all": [b"full"], 0: [b"fire"]}
@@ -0,0 +1,75 @@
+"""Storage formats of ``events.event_id``.
+
+Event ids are SHA-256 digests, exchanged everywhere (Kafka headers, API
+responses) as 64 hex characters. ``EVENT_ID_FORMAT`` picks how the
+``event_id`` column stores them:
+
+- ``text``: the 64 hex characters (65 bytes per key);
+- ``bytea``: the raw 32-byte digest (33 bytes per key);
+- ``uuid``: the first 128 bits of the digest (16 bytes per key, fixed
+  width). Collisions stay negligible (about 2^-64 at billions of events),
+  but the full id cannot be recovered: it renders as 32 hex characters, and
+  lookups accept either that or the full 64-character id.
+
+The services convert at the edges with ``to_db`` and ``to_hex`` and check
+at startup that the setting matches the column (``verify_format``).
+"""
+
+import uuid
+from typing import Optional, Union
+
+EVENT_ID_FORMATS = ("text", "bytea", "uuid")
+
+
+def to_db(event_id: str, event_id_format: str) -> Union[str, bytes]:
+    """Value to bind for ``event_id`` in the given format.
+
+    Raises:
+        ValueError: ``event_id`` is not hex (``bytea`` and ``uuid`` only)
+    """
+    if event_id_format == "bytea":
+        return bytes.fromhex(event_id)
+    if event_id_format == "uuid":
+        return str(uuid.UUID(bytes=bytes.fromhex(event_id)[:16]))
+    return event_id
+
+
+def to_hex(value, event_id_format: str) -> Optional[str]:
+    """Render an ``event_id`` read from the database as hex."""
+    if value is None or event_id_format == "text":
+        return value
+    if event_id_format == "bytea":
+        return bytes(value).hex()
+    # psycopg2 returns uuid columns as str, or uuid.UUID after register_uuid
+    return uuid.UUID(str(value)).hex
+
+
+def column_format(cur) -> Optional[str]:
+    """Format of the ``event_id`` column of events, None if the table does not exist."""
+    cur.execute(
+        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute"
+        " WHERE attrelid = to_regclass('events') AND attname = 'event_id'"
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def verify_format(cur, event_id_format: str):
+    """Check that ``events.event_id`` is stored as ``event_id_format``.
+
+    Raises:
+        ValueError: unknown format
+        RuntimeError: the column has another type (convert it with
+            ``tools/migrate_event_ids.py``)
+    """
+    if event_id_format not in EVENT_ID_FORMATS:
+        raise ValueError(f"EVENT_ID_FORMAT must be one of {EVENT_ID_FORMATS}")
+    actual = column_format(cur)
+    if actual is not None and actual != event_id_format:
+        raise RuntimeError(
+            f"EVENT_ID_FORMAT is {event_id_format} but events.event_id is {actual};"
+            " convert it with tools/migrate_event_ids.py"
+        )
+
+
+__all__ = ["EVENT_ID_FORMATS", "to_db", "to_hex", "column_format", "verify_format"]
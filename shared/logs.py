@@ -0,0 +1,227 @@
+"""Non-blocking, sampled, structured logging shared by the platform services.
+
+``setup_logging`` installs a bounded queue handler on the root logger. Log
+calls on the hot path run the sampling / rate-limit filters, render the
+message and traceback of the records they keep and enqueue them; formatting
+the line and the stdout write happen on a background writer thread. Every line that does not make it to stdout is counted in
+``log_lines_dropped_total`` by reason, so nothing is lost silently.
+"""
+
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from prometheus_client import Counter
+
+log_lines_dropped = Counter(
+    "log_lines_dropped_total",
+    "Log lines not written, by reason (sampled, rate_limited, queue_full)",
+    ["reason"],
+)
+
+# Attributes present on every LogRecord; anything else was passed via ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+def message_type(record: logging.LogRecord) -> str:
+    """Return the sampling key of a record.
+
+    An explicit ``extra={"log_type": ...}`` wins; otherwise the first word of
+    the format string is used (``"event_received user=%s ..."`` ->
+    ``"event_received"``).
+    """
+    log_type = getattr(record, "log_type", None)
+    if log_type:
+        return log_type
+    return str(record.msg).split(" ", 1)[0]
+
+
+def rate_limit_key(record: logging.LogRecord) -> str:
+    """Return the traceback rate-limit key of a record.
+
+    An explicit ``log_type`` wins; otherwise the logger name and the whole
+    format string, so unrelated errors that start with the same word
+    (``"failed to publish ..."``, ``"failed to insert ..."``) are limited
+    separately.
+    """
+    log_type = getattr(record, "log_type", None)
+    if log_type:
+        return log_type
+    return f"{record.name}:{record.msg}"
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records for configured message types.
+
+    Warnings and errors are never sampled.
+
+    Args:
+        rates: Mapping of message type to the fraction of records to keep
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.rates = rates or {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rates.get(message_type(record))
+        if rate is None or rate >= 1.0 or random.random() < rate:
+            return True
+        log_lines_dropped.labels(reason="sampled").inc()
+        return False
+
+
+class ExceptionRateLimitFilter(logging.Filter):
+    """Allow at most ``burst`` records with a traceback per ``rate_limit_key`` per interval.
+
+    The first record let through after a suppressed window carries a
+    ``suppressed`` attribute with the number of records dropped meanwhile.
+    """
+
+    def __init__(self, burst: int = 10, interval: float = 60.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._windows: Dict[str, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not record.exc_info:
+            return True
+        key = rate_limit_key(record)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.setdefault(key, [now, 0, 0])
+            if now - window[0] >= self.interval:
+                if window[2]:
+                    record.suppressed = window[2]
+                window[:] = [now, 0, 0]
+            if window[1] >= self.burst:
+                window[2] += 1
+                log_lines_dropped.labels(reason="rate_limited").inc()
+                return False
+            window[1] += 1
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records when the queue is full.
+
+    Like ``QueueHandler.prepare``, the message is rendered in the caller, so
+    arguments changed after the log call are logged as they were, and the
+    traceback and stack are rendered into ``exc_text`` while they still
+    exist. ``args``, ``exc_info`` and ``stack_info`` are cleared so the queue
+    holds no references to the caller's objects and frames.
+    """
+
+    _formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = record.getMessage()
+        record = copy.copy(record)
+        record.message = record.msg = message
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self._formatter.formatException(record.exc_info)
+        if record.stack_info:
+            stack = self._formatter.formatStack(record.stack_info)
+            record.exc_text = f"{record.exc_text}\n{stack}" if record.exc_text else stack
+        record.args = None
+        record.exc_info = None
+        record.stack_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_lines_dropped.labels(reason="queue_full").inc()
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "service": self.service,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(
+    service: str,
+    level: str = "INFO",
+    json_output: bool = True,
+    queue_size: int = 10000,
+    sample_rates: Optional[Dict[str, float]] = None,
+    exception_burst: int = 10,
+    exception_interval: float = 60.0,
+) -> QueueListener:
+    """Route the root logger through a bounded queue to a writer thread.
+
+    Args:
+        service: Service name added to every JSON line
+        level: Root log level
+        json_output: Write JSON lines instead of plain text
+        queue_size: Maximum records waiting for the writer thread
+        sample_rates: Fraction of records to keep per message type
+        exception_burst: Records with a traceback allowed per ``rate_limit_key`` per interval
+        exception_interval: Rate-limit window in seconds
+
+    Returns:
+        QueueListener: the started writer; call ``stop()`` at shutdown to flush
+    """
+    stream = logging.StreamHandler(sys.stdout)
+    if json_output:
+        stream.setFormatter(JsonFormatter(service))
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+
+    handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(SamplingFilter(sample_rates))
+    handler.addFilter(ExceptionRateLimitFilter(exception_burst, exception_interval))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    listener = QueueListener(handler.queue, stream, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+__all__ = [
+    "setup_logging",
+    "message_type",
+    "rate_limit_key",
+    "SamplingFilter",
+    "ExceptionRateLimitFilter",
+    "DroppingQueueHandler",
+    "JsonFormatter",
+]
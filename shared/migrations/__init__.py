@@ -0,0 +1,17 @@
+"""Versioned schema migrations shared by the consumer and analytics services.
+
+Migrations are the modules ``versions/vNNNN_<name>.py``, applied in version
+order by ``migrate`` and recorded in the ``schema_migrations`` table. Each
+module defines ``upgrade(conn, options)`` and may set ``TRANSACTIONAL =
+False`` to run outside a transaction (needed by ``CREATE INDEX
+CONCURRENTLY``); transactional ones are applied and recorded atomically.
+
+Both services run ``migrate`` at startup under a session advisory lock, so
+whichever starts first applies pending migrations and the other waits. For
+slow migrations on a large table run ``python -m shared.migrations``
+beforehand instead.
+"""
+
+from .runner import Migration, applied_versions, load_migrations, migrate
+
+__all__ = ["Migration", "applied_versions", "load_migrations", "migrate"]
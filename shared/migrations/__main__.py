@@ -0,0 +1,66 @@
+"""Apply or list schema migrations from the command line.
+
+Connects with the ``POSTGRES_*`` environment variables the services use.
+
+Usage:
+    python -m shared.migrations                  # apply pending migrations
+    python -m shared.migrations --list           # show applied and pending ones
+    python -m shared.migrations --partitioning daily --target 2
+"""
+
+import argparse
+import logging
+import os
+
+import psycopg2
+
+from ..event_ids import EVENT_ID_FORMATS
+from . import applied_versions, load_migrations, migrate
+
+
+def connect():
+    return psycopg2.connect(
+        host=os.getenv("POSTGRES_HOST", "postgres"),
+        port=os.getenv("POSTGRES_PORT", "5432"),
+        dbname=os.getenv("POSTGRES_DB", "events_db"),
+        user=os.getenv("POSTGRES_USER", "postgres"),
+        password=os.getenv("POSTGRES_PASSWORD", "postgres"),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m shared.migrations", description="Apply pending schema migrations.")
+    parser.add_argument("--list", action="store_true", help="list migrations and whether they are applied")
+    parser.add_argument("--target", type=int, help="highest version to apply")
+    parser.add_argument(
+        "--partitioning",
+        default=os.getenv("EVENTS_PARTITIONING", "none"),
+        choices=["none", "daily", "hourly"],
+        help="layout of a newly created events table (default: EVENTS_PARTITIONING or none)",
+    )
+    parser.add_argument(
+        "--event-id-format",
+        default=os.getenv("EVENT_ID_FORMAT", "text"),
+        choices=list(EVENT_ID_FORMATS),
+        help="event_id type of a new, empty events table (default: EVENT_ID_FORMAT or text)",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    conn = connect()
+    try:
+        if args.list:
+            done = applied_versions(conn)
+            for migration in load_migrations():
+                state = "applied" if migration.version in done else "pending"
+                print(f"{migration.version:04d} {migration.name:<24} {state}")
+            return
+        options = {"partitioning": args.partitioning, "event_id_format": args.event_id_format}
+        applied = migrate(conn, options, target=args.target)
+        print(f"applied {len(applied)} migrations" + (f": {applied}" if applied else ""))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""DDL helpers for migrations."""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def relkind(cur, table):
+    """``pg_class.relkind`` of a table (``r`` plain, ``p`` partitioned), None if it does not exist."""
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _index_valid(cur, name):
+    """True/False for an existing index, None if it does not exist."""
+    cur.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (name,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def partitions(cur, table):
+    """Names of the partitions attached to ``table`` (empty for a plain table)."""
+    cur.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid"
+        " WHERE i.inhparent = to_regclass(%s) ORDER BY 1",
+        (table,),
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def build_index_concurrently(cur, name, table, definition, unique=False):
+    """``CREATE [UNIQUE] INDEX CONCURRENTLY`` on a plain table (or one partition); safe to re-run.
+
+    An invalid index of that name, left behind by an interrupted concurrent
+    build, is dropped and built again.
+    """
+    if _index_valid(cur, name) is False:
+        logger.warning("dropping invalid index %s", name)
+        cur.execute(f"DROP INDEX CONCURRENTLY {name}")
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    cur.execute(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}")
+
+
+def create_index_concurrently(conn, name, table, definition):
+    """Create an index without blocking writes; safe to re-run.
+
+    ``conn`` must be in autocommit mode. Postgres cannot build an index
+    concurrently on a partitioned table, so for one the parent index is
+    created ``ON ONLY`` the parent (invalid, no data), each partition's
+    index is built concurrently and attached, and the parent index becomes
+    valid once all are attached. Partitions created later get the index
+    automatically.
+
+    Args:
+        conn: psycopg2 connection in autocommit mode
+        name: index name
+        table: table name
+        definition: the part after ``ON <table>``, e.g. ``USING brin (timestamp)``
+    """
+    with conn.cursor() as cur:
+        if relkind(cur, table) != "p":
+            build_index_concurrently(cur, name, table, definition)
+            return
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {table} {definition}")
+        suffix = name[len(table):] if name.startswith(table + "_") else "_" + name
+        for partition in partitions(cur, table):
+            # Partitions created since the parent index have their own copy already
+            cur.execute(
+                "SELECT 1 FROM pg_inherits i JOIN pg_index x ON x.indexrelid = i.inhrelid"
+                " WHERE i.inhparent = to_regclass(%s) AND x.indrelid = to_regclass(%s)",
+                (name, partition),
+            )
+            if cur.fetchone():
+                continue
+            child = partition + suffix
+            build_index_concurrently(cur, child, partition, definition)
+            cur.execute(f"ALTER INDEX {name} ATTACH PARTITION {child}")
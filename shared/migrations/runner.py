@@ -0,0 +1,128 @@
+"""Discover and apply the migrations in ``shared.migrations.versions``."""
+
+import importlib
+import logging
+import pkgutil
+import re
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from . import versions
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock key held while migrating
+_ADVISORY_LOCK_KEY = 0x6576_6D67  # "evmg"
+_MODULE_NAME = re.compile(r"^v(\d{4})_(\w+)$")
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    transactional: bool
+    upgrade: Callable[[Any, Dict[str, Any]], None]
+
+
+def load_migrations() -> List[Migration]:
+    """All migrations in version order.
+
+    Raises:
+        ValueError: two modules share a version
+    """
+    migrations = {}
+    for info in pkgutil.iter_modules(versions.__path__):
+        match = _MODULE_NAME.match(info.name)
+        if match is None:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"duplicate migration version {version}")
+        module = importlib.import_module(f"{versions.__name__}.{info.name}")
+        migrations[version] = Migration(version, match.group(2), getattr(module, "TRANSACTIONAL", True), module.upgrade)
+    return [migrations[v] for v in sorted(migrations)]
+
+
+def _ensure_history(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        )
+        """
+    )
+
+
+def applied_versions(conn) -> Dict[int, str]:
+    """``{version: name}`` of the migrations already applied."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+        if not cur.fetchone()[0]:
+            result = {}
+        else:
+            cur.execute("SELECT version, name FROM schema_migrations")
+            result = dict(cur.fetchall())
+    if not conn.autocommit:
+        conn.commit()
+    return result
+
+
+def migrate(conn, options: Optional[Dict[str, Any]] = None, target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations up to ``target`` (default: all).
+
+    Args:
+        conn: psycopg2 connection used only for migrating; it is switched to
+            autocommit while migrating and restored afterwards
+        options: passed to every ``upgrade`` (e.g. ``partitioning``)
+        target: highest version to apply
+
+    Returns:
+        list: versions applied by this call
+    """
+    options = options or {}
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    applied = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", (_ADVISORY_LOCK_KEY,))
+        try:
+            with conn.cursor() as cur:
+                _ensure_history(cur)
+            done = applied_versions(conn)
+            for migration in load_migrations():
+                if migration.version in done or (target is not None and migration.version > target):
+                    continue
+                logger.info("applying migration %04d_%s", migration.version, migration.name)
+                start = time.monotonic()
+                if migration.transactional:
+                    conn.autocommit = False
+                    try:
+                        migration.upgrade(conn, options)
+                        _record(conn, migration)
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    finally:
+                        conn.autocommit = True
+                else:
+                    # Not atomic: the upgrade must be safe to re-run after a failure
+                    migration.upgrade(conn, options)
+                    _record(conn, migration)
+                applied.append(migration.version)
+                logger.info("applied migration %04d_%s in %.1fs", migration.version, migration.name, time.monotonic() - start)
+        finally:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (_ADVISORY_LOCK_KEY,))
+    finally:
+        conn.autocommit = autocommit
+    return applied
+
+
+def _record(conn, migration: Migration):
+    with conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (migration.version, migration.name)
+        )
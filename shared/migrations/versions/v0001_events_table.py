@@ -0,0 +1,43 @@
+"""The events table, plain or range-partitioned on ``timestamp``.
+
+``options["partitioning"]`` (the consumer's ``EVENTS_PARTITIONING``) picks
+the layout when the table is first created; an existing table is kept as
+it is. A partitioned table's primary key must contain the partition key,
+so it is ``(event_id, timestamp)``; ``event_id`` already hashes the
+timestamp, so this deduplicates exactly like a key on ``event_id`` alone.
+Events outside every range partition go to ``events_default``.
+"""
+
+
+def upgrade(conn, options):
+    with conn.cursor() as cur:
+        if options.get("partitioning", "none") == "none":
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS events (
+                    event_id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    event_name TEXT NOT NULL,
+                    metadata JSONB,
+                    timestamp TIMESTAMP WITH TIME ZONE,
+                    processed_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+                )
+                """
+            )
+            return
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS events (
+                event_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                event_name TEXT NOT NULL,
+                metadata JSONB,
+                timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+                processed_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+                PRIMARY KEY (event_id, timestamp)
+            ) PARTITION BY RANGE (timestamp)
+            """
+        )
+        cur.execute("SELECT relkind FROM pg_class WHERE oid = 'events'::regclass")
+        if cur.fetchone()[0] == "p":
+            cur.execute("CREATE TABLE IF NOT EXISTS events_default PARTITION OF events DEFAULT")
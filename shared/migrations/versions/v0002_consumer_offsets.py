@@ -0,0 +1,17 @@
+"""Per-partition consumer offsets, stored with the rows (``OFFSET_STORAGE=postgres``)."""
+
+
+def upgrade(conn, options):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS consumer_offsets (
+                group_id TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                partition INTEGER NOT NULL,
+                next_offset BIGINT NOT NULL,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+                PRIMARY KEY (group_id, topic, partition)
+            )
+            """
+        )
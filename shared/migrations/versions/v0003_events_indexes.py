@@ -0,0 +1,26 @@
+"""Indexes for the analytics access paths, built without blocking writes.
+
+- ``events_timestamp_brin``: BRIN on ``timestamp`` for the range filters of
+  the count and active-users endpoints. Events arrive roughly in time
+  order, so block ranges summarize well, and the index is a few hundred
+  kilobytes where a B-tree would be gigabytes.
+- ``events_user_id_timestamp_idx``: ``(user_id, timestamp DESC)`` serves
+  ``WHERE user_id = ... ORDER BY timestamp DESC LIMIT n`` without a sort.
+- ``events_event_name_timestamp_idx``: ``(event_name, timestamp)`` for
+  per-event-name counts, also within a time range.
+"""
+
+from ..ddl import create_index_concurrently
+
+TRANSACTIONAL = False
+
+INDEXES = (
+    ("events_timestamp_brin", "USING brin (timestamp)"),
+    ("events_user_id_timestamp_idx", "(user_id, timestamp DESC)"),
+    ("events_event_name_timestamp_idx", "(event_name, timestamp)"),
+)
+
+
+def upgrade(conn, options):
+    for name, definition in INDEXES:
+        create_index_concurrently(conn, name, "events", definition)
@@ -0,0 +1,44 @@
+"""Rollup tables of events, maintained by the consumer as it inserts.
+
+Event counts per minute and per hour, by event name (``event_counts_*``)
+and by user (``user_counts_*``). ``bucket`` is the UTC start of the minute
+or hour. The consumer adds the rows each insert actually wrote (see
+``event_consumer/repo/rollups.py``); existing events are counted by
+``tools/backfill_rollups.py``, in short transactions, not here.
+
+Views for dashboards (Superset datasets):
+
+- ``active_users_hourly``: distinct users and events per hour;
+- ``active_users_daily``: distinct users per UTC day.
+"""
+
+from ...rollups import ROLLUPS
+
+
+def upgrade(conn, options):
+    with conn.cursor() as cur:
+        for table, _, key in ROLLUPS:
+            cur.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+                    {key} TEXT NOT NULL,
+                    count BIGINT NOT NULL,
+                    PRIMARY KEY (bucket, {key})
+                )
+                """
+            )
+        cur.execute(
+            """
+            CREATE OR REPLACE VIEW active_users_hourly AS
+            SELECT bucket, count(*) AS active_users, sum(count) AS events
+            FROM user_counts_hour GROUP BY bucket
+            """
+        )
+        cur.execute(
+            """
+            CREATE OR REPLACE VIEW active_users_daily AS
+            SELECT date_trunc('day', bucket, 'UTC') AS day, count(DISTINCT user_id) AS active_users
+            FROM user_counts_hour GROUP BY 1
+            """
+        )
@@ -0,0 +1,46 @@
+"""Store ``events.event_id`` as ``options["event_id_format"]`` (``EVENT_ID_FORMAT``).
+
+Only a table without rows is converted here: the ``ALTER COLUMN ... TYPE``
+rewrites nothing then. A table that already holds events is left as it is,
+and the services refuse to start until it is converted online with
+``tools/migrate_event_ids.py`` (see ``shared.event_ids.verify_format``).
+With ``bytea`` a check constraint keeps ids at 32 bytes; it also rejects hex
+text written by a writer still configured for ``text``.
+"""
+
+import logging
+
+from ...event_ids import EVENT_ID_FORMATS, column_format
+
+logger = logging.getLogger(__name__)
+
+# Conversions from the text column created by 0001
+_USING = {
+    "bytea": "decode(event_id, 'hex')",
+    "uuid": "left(event_id, 32)::uuid",
+}
+LENGTH_CHECK = "events_event_id_length"
+
+
+def upgrade(conn, options):
+    event_id_format = options.get("event_id_format", "text")
+    if event_id_format not in EVENT_ID_FORMATS:
+        raise ValueError(f"event_id_format must be one of {EVENT_ID_FORMATS}")
+    with conn.cursor() as cur:
+        current = column_format(cur)
+        if current == event_id_format or current != "text":
+            return
+        cur.execute("SELECT EXISTS (SELECT 1 FROM events)")
+        if cur.fetchone()[0]:
+            logger.warning(
+                "events is not empty; convert event_id to %s with tools/migrate_event_ids.py", event_id_format
+            )
+            return
+        cur.execute(
+            f"ALTER TABLE events ALTER COLUMN event_id TYPE {event_id_format.upper()}"
+            f" USING {_USING[event_id_format]}"
+        )
+        if event_id_format == "bytea":
+            cur.execute(
+                f"ALTER TABLE events ADD CONSTRAINT {LENGTH_CHECK} CHECK (octet_length(event_id) = 32)"
+            )
@@ -0,0 +1,22 @@
+"""The one-row ``rollup_state`` table: which events the rollups count (see ``shared.rollups``).
+
+Its row starts with every column NULL (rollups not maintained). The next consumer started
+with ``ROLLUPS_ENABLED`` marks them maintained, and existing events are
+counted by ``tools/backfill_rollups.py`` rather than in this migration, so
+migrating stays quick on a large table.
+"""
+
+
+def upgrade(conn, options):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rollup_state (
+                id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+                maintained_since TIMESTAMP WITH TIME ZONE,
+                backfill_cursor TIMESTAMP WITH TIME ZONE,
+                backfilled_at TIMESTAMP WITH TIME ZONE
+            )
+            """
+        )
+        cur.execute("INSERT INTO rollup_state (id) VALUES (TRUE) ON CONFLICT DO NOTHING")
@@ -0,0 +1,84 @@
+"""State of the rollup tables, shared by the consumer, the analytics service and the backfill tool.
+
+The one-row ``rollup_state`` table (migration ``0006_rollup_state``) says
+which events the rollups count:
+
+- ``maintained_since``: set by a consumer that starts with
+  ``ROLLUPS_ENABLED``. Consumers count the events they insert with
+  ``processed_at >= maintained_since`` (``event_consumer/repo/rollups.py``);
+  the older ones are left to ``tools/backfill_rollups.py``. A consumer that
+  starts without rollups clears it, since its rows will be missing.
+- ``backfill_cursor``: the events before this ``timestamp`` are backfilled.
+- ``backfilled_at``: set when the backfill is complete (at once when there
+  was nothing to backfill).
+
+The analytics service only reads the rollups while both
+``maintained_since`` and ``backfilled_at`` are set (``rollups_ready``).
+"""
+
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# The rollup tables (migration ``0004_event_rollups``): (table, date_trunc unit, key column)
+ROLLUPS = (
+    ("event_counts_minute", "minute", "event_name"),
+    ("event_counts_hour", "hour", "event_name"),
+    ("user_counts_minute", "minute", "user_id"),
+    ("user_counts_hour", "hour", "user_id"),
+)
+
+
+def start_maintaining(cur) -> Optional[str]:
+    """Record that rollups are maintained from now on, unless they already are.
+
+    When they were not, the rollup tables are emptied and counted afresh:
+    consumers from ``maintained_since``, the backfill tool before it. The
+    events table is share-locked meanwhile, so no insert straddles
+    ``maintained_since``; it is only held for the few statements here.
+    Commit the transaction afterwards.
+
+    Returns:
+        str: the new ``maintained_since`` (ISO 8601), or None when nothing changed
+    """
+    cur.execute("SELECT maintained_since FROM rollup_state FOR UPDATE")
+    if cur.fetchone()[0] is not None:
+        return None
+    cur.execute("LOCK TABLE events IN SHARE MODE")
+    cur.execute(f"TRUNCATE {', '.join(table for table, _, _ in ROLLUPS)}")
+    cur.execute(
+        """
+        UPDATE rollup_state SET
+            maintained_since = clock_timestamp(),
+            backfill_cursor = NULL,
+            backfilled_at = CASE WHEN EXISTS (SELECT 1 FROM events) THEN NULL ELSE clock_timestamp() END
+        RETURNING maintained_since, backfilled_at IS NULL
+        """
+    )
+    since, needs_backfill = cur.fetchone()
+    if needs_backfill:
+        logger.warning("rollups are maintained from %s; run tools/backfill_rollups.py to count older events", since)
+    return since.isoformat()
+
+
+def stop_maintaining(cur) -> bool:
+    """Record that rollups are no longer maintained; returns whether they were. Commit afterwards."""
+    cur.execute(
+        "UPDATE rollup_state SET maintained_since = NULL, backfill_cursor = NULL, backfilled_at = NULL"
+        " WHERE maintained_since IS NOT NULL"
+    )
+    return cur.rowcount > 0
+
+
+def rollups_ready(cur) -> bool:
+    """Whether the rollups count every event: maintained and backfilled."""
+    cur.execute("SELECT to_regclass('rollup_state') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        return False
+    cur.execute("SELECT maintained_since IS NOT NULL AND backfilled_at IS NOT NULL FROM rollup_state")
+    row = cur.fetchone()
+    return bool(row and row[0])
+
+
+__all__ = ["ROLLUPS", "start_maintaining", "stop_maintaining", "rollups_ready"]
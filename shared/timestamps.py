@@ -0,0 +1,27 @@
+"""Event timestamp precision shared by the ingestion and consumer decoders.
+
+Timestamps are part of the canonical ``event_id``, so every decoder must
+turn the same input into the same datetime. Python datetimes hold
+microseconds: pydantic truncates extra fractional digits
+(``.123456789`` -> ``.123456``) while msgspec rounds them (``.123457``, or
+even into the next second). Truncation is the canonical behaviour; values
+with sub-microsecond digits skip the msgspec fast paths and are decoded by
+the pydantic models.
+"""
+
+import re
+
+# A time of day followed by more than 6 fractional second digits
+_SUB_MICROSECOND = re.compile(rb"\d\d:\d\d:\d\d[.,]\d{7}")
+
+
+def has_sub_microsecond(data) -> bool:
+    """Whether raw JSON or msgpack bytes contain a timestamp with more than 6 fractional digits.
+
+    The check runs on the whole value, so a match inside metadata also
+    selects the (equivalent, slower) pydantic path.
+    """
+    return _SUB_MICROSECOND.search(data) is not None
+
+
+__all__ = ["has_sub_microsecond"]
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Count the events that predate the rollups into the rollup tables, while consumers keep writing.
+
+Consumers started with ``ROLLUPS_ENABLED`` count the events they insert
+from ``rollup_state.maintained_since`` on (see ``shared.rollups``). This
+tool counts the older ones: events with ``processed_at`` before it, in
+``--window-hours`` slices of ``timestamp``, one short transaction per
+slice. Every slice adds its counts and moves ``rollup_state.backfill_cursor``
+in the same transaction, so an interrupted run resumes from the cursor
+when run again. The last step sets ``backfilled_at``; from then on the
+analytics service reads the rollups.
+
+The two sets of events do not overlap, so the counts are exact whether the
+consumers run or not. If the rollups are restarted meanwhile (a consumer
+started after one without rollups), the tool stops; run it again.
+
+Usage:
+    POSTGRES_HOST=localhost python tools/backfill_rollups.py
+    python tools/backfill_rollups.py --window-hours 6 --pause 0.5
+    python tools/backfill_rollups.py --status
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import timedelta
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from shared.rollups import ROLLUPS, rollups_ready  # noqa: E402
+
+logger = logging.getLogger("backfill_rollups")
+
+# One scan of the slice feeds all four rollups; rows without processed_at predate the consumers too
+_BACKFILL = (
+    "WITH slice AS MATERIALIZED (SELECT user_id, event_name, timestamp FROM events"
+    " WHERE timestamp >= %(lo)s AND timestamp < %(hi)s"
+    " AND (processed_at < %(since)s OR processed_at IS NULL)), "
+    + ", ".join(
+        f"rollup_{i} AS (INSERT INTO {table} (bucket, {key}, count)"
+        f" SELECT date_trunc('{unit}', timestamp, 'UTC'), {key}, count(*) FROM slice GROUP BY 1, 2 ORDER BY 1, 2"
+        f" ON CONFLICT (bucket, {key}) DO UPDATE SET count = {table}.count + EXCLUDED.count)"
+        for i, (table, unit, key) in enumerate(ROLLUPS)
+    )
+    + " SELECT count(*) FROM slice"
+)
+
+
+def connect():
+    return psycopg2.connect(
+        host=os.getenv("POSTGRES_HOST", "localhost"),
+        port=os.getenv("POSTGRES_PORT", "5432"),
+        dbname=os.getenv("POSTGRES_DB", "events_db"),
+        user=os.getenv("POSTGRES_USER", "postgres"),
+        password=os.getenv("POSTGRES_PASSWORD", "postgres"),
+    )
+
+
+def read_state(cur, lock=False):
+    cur.execute(
+        "SELECT maintained_since, backfill_cursor, backfilled_at FROM rollup_state" + (" FOR UPDATE" if lock else "")
+    )
+    return cur.fetchone()
+
+
+def _locked_state(cur, since):
+    """Lock the state row for one slice; the rollups must still be maintained from ``since``."""
+    state = read_state(cur, lock=True)
+    if state[0] != since:
+        raise RuntimeError("the rollups were restarted or stopped during the backfill; run the tool again")
+    return state
+
+
+def backfill(conn, window_hours=1.0, pause=0.0):
+    """Count the events older than ``maintained_since``, one ``window_hours`` slice per transaction.
+
+    Returns:
+        int: events counted by this call
+
+    Raises:
+        RuntimeError: the rollups are not maintained, or were restarted meanwhile
+    """
+    with conn.cursor() as cur:
+        since, cursor, done = read_state(cur)
+        if since is None:
+            raise RuntimeError("the rollups are not maintained; start a consumer with ROLLUPS_ENABLED=true first")
+        if done is not None:
+            conn.rollback()
+            logger.info("the rollups are already backfilled")
+            return 0
+        # The events to count are fixed: every newer insert has processed_at >= since
+        cur.execute(
+            "SELECT date_trunc('hour', min(timestamp), 'UTC'), max(timestamp) FROM events"
+            " WHERE timestamp >= coalesce(%(cursor)s::timestamptz, '-infinity')"
+            " AND (processed_at < %(since)s OR processed_at IS NULL)",
+            {"cursor": cursor, "since": since},
+        )
+        first, last = cur.fetchone()
+    conn.commit()
+    window = timedelta(hours=window_hours)
+    lo = cursor or first
+    counted = 0
+    slices = 0
+    started = time.monotonic()
+    while last is not None and lo <= last:
+        hi = lo + window
+        with conn.cursor() as cur:
+            _locked_state(cur, since)
+            cur.execute(_BACKFILL, {"lo": lo, "hi": hi, "since": since})
+            counted += cur.fetchone()[0]
+            cur.execute("UPDATE rollup_state SET backfill_cursor = %s", (hi,))
+        conn.commit()
+        lo = hi
+        slices += 1
+        if slices % 24 == 0:
+            rate = counted / (time.monotonic() - started)
+            logger.info("backfilled up to %s: %s events (%.0f events/s)", hi, counted, rate)
+        if pause:
+            time.sleep(pause)
+    with conn.cursor() as cur:
+        _locked_state(cur, since)
+        cur.execute("UPDATE rollup_state SET backfilled_at = now()")
+    conn.commit()
+    logger.info("backfilled %s events in %s slices in %.0fs", counted, slices, time.monotonic() - started)
+    return counted
+
+
+def status(conn):
+    with conn.cursor() as cur:
+        since, cursor, done = read_state(cur)
+        print(f"maintained since: {since or '-'}")
+        print(f"backfilled up to: {cursor or '-'}")
+        print(f"backfilled at:    {done or '-'}")
+        print(f"complete:         {'yes' if rollups_ready(cur) else 'no'}")
+    conn.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count events older than the rollups into the rollup tables.")
+    parser.add_argument("--window-hours", type=float, default=1.0, help="hours of events counted per transaction")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between transactions")
+    parser.add_argument("--status", action="store_true", help="show the rollup state and exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    conn = connect()
+    try:
+        if args.status:
+            status(conn)
+            return
+        counted = backfill(conn, args.window_hours, args.pause)
+        print(f"counted {counted} events; the rollups are complete")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
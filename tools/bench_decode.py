@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Per-record cost of decoding Kafka event values into DB rows.
+
+Compares, for JSON and msgpack values:
+
+- ``model``: the previous per-record path (``json.loads`` / msgpack to a
+  dict, pydantic ``Event``, ``json.dumps(metadata)``, ``isoformat()``);
+- ``columns``: ``utils.decoder.decode_columns`` inline (msgspec structs,
+  metadata kept as raw JSON);
+- ``pool``: ``decode_columns`` in a process pool, one chunk of ``--chunk``
+  records per task, wall clock including pickling the values and columns.
+
+Usage: python tools/bench_decode.py [--events 200000] [--chunk 5000] [--workers 2 4]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import msgspec
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "event_consumer"))
+
+from utils.decoder import MSGPACK_CONTENT_TYPE, _model_row, decode_columns  # noqa: E402
+
+EVENT_NAMES = ["page_view", "click", "scroll", "form_submit"]
+
+
+def make_payloads(count, seed=5):
+    rng = random.Random(seed)
+    start = datetime.now(timezone.utc).timestamp()
+    return [
+        {
+            "user_id": f"user_{rng.randrange(100_000)}",
+            "event_name": rng.choice(EVENT_NAMES),
+            "metadata": {"page": f"/page_{rng.randrange(200)}", "session_id": f"session_{rng.getrandbits(48):012x}"},
+            "timestamp": datetime.fromtimestamp(start + i * 0.0007, timezone.utc).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+def bench_model(values, content_types, event_ids):
+    start = time.perf_counter()
+    for value, content_type, event_id in zip(values, content_types, event_ids):
+        _model_row(value, content_type, event_id)[4].isoformat()
+    return time.perf_counter() - start
+
+
+def bench_columns(values, content_types, event_ids):
+    start = time.perf_counter()
+    decode_columns(values, content_types, event_ids)
+    return time.perf_counter() - start
+
+
+def bench_pool(pool, chunk, values, content_types, event_ids):
+    start = time.perf_counter()
+    futures = [
+        pool.submit(decode_columns, values[i:i + chunk], content_types[i:i + chunk], event_ids[i:i + chunk])
+        for i in range(0, len(values), chunk)
+    ]
+    for future in futures:
+        future.result()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--chunk", type=int, default=5000, help="records per process pool task")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.events)
+    event_ids = [f"{i:064x}".encode() for i in range(len(payloads))]
+    formats = {
+        "json": ([json.dumps(p).encode() for p in payloads], None),
+        "msgpack": ([msgspec.msgpack.encode(p) for p in payloads], MSGPACK_CONTENT_TYPE),
+    }
+    ctx = multiprocessing.get_context("spawn")
+    pools = {n: ProcessPoolExecutor(n, mp_context=ctx) for n in args.workers}
+    for pool in pools.values():
+        # start the workers before timing
+        list(pool.map(abs, range(len(args.workers) * 4)))
+
+    print(f"{'format':<8} {'decoder':<10} {'us/record':>10} {'speedup':>8}")
+    try:
+        for name, (values, content_type) in formats.items():
+            content_types = [content_type] * len(values)
+            base = bench_model(values, content_types, event_ids)
+            results = [("model", base), ("columns", bench_columns(values, content_types, event_ids))]
+            for n, pool in pools.items():
+                results.append((f"pool x{n}", bench_pool(pool, args.chunk, values, content_types, event_ids)))
+            for label, elapsed in results:
+                print(f"{name:<8} {label:<10} {elapsed / len(values) * 1e6:>10.3f} {base / elapsed:>7.1f}x")
+    finally:
+        for pool in pools.values():
+            pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
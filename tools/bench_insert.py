@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Compare consumer write strategies (INSERT ... VALUES vs COPY) in rows/s.
+
+Runs ``repo.events.insert_events`` and ``repo.events.copy_events`` against
+an ``events`` table in a scratch schema (``--schema``, dropped afterwards)
+for each batch size, on one persistent connection so connection setup is
+not measured. ``--duplicates`` re-sends that fraction of every batch from
+earlier batches to exercise the ``ON CONFLICT`` path. ``--event-id-formats``
+repeats every run with ``event_id`` stored as ``text``, ``bytea`` or
+``uuid`` (``EVENT_ID_FORMAT``) and reports the primary key index size.
+``--rollups off on`` repeats every run without and with the rollup tables
+maintained in the insert statement (``ROLLUPS_ENABLED``).
+
+Usage:
+    POSTGRES_HOST=localhost python tools/bench_insert.py
+    python tools/bench_insert.py --batch-sizes 500 5000 50000 --rows 200000
+    python tools/bench_insert.py --batch-sizes 10000 --rows 2000000 --event-id-formats text bytea uuid
+    python tools/bench_insert.py --batch-sizes 2000 10000 --rows 1000000 --rollups off on
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import psycopg2
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "event_consumer"))
+
+from repo.events import WRITE_STRATEGIES, write_strategy  # noqa: E402
+from shared.migrations.versions.v0004_event_rollups import upgrade as create_rollups  # noqa: E402
+from shared.migrations.versions.v0006_rollup_state import upgrade as create_rollup_state  # noqa: E402
+from shared.rollups import ROLLUPS, start_maintaining  # noqa: E402
+
+EVENT_NAMES = ["page_view", "click", "scroll", "form_submit"]
+
+
+def make_rows(count, seed=11):
+    rng = random.Random(seed)
+    start = datetime.now(timezone.utc)
+    return [
+        (
+            f"{rng.getrandbits(256):064x}",
+            f"user_{rng.randrange(100_000)}",
+            rng.choice(EVENT_NAMES),
+            json.dumps({"page": f"/page_{rng.randrange(200)}", "session_id": f"session_{rng.getrandbits(48):012x}"}),
+            (start + timedelta(milliseconds=i)).isoformat(),
+        )
+        for i in range(count)
+    ]
+
+
+def connect(schema):
+    dsn = (
+        f"host={os.getenv('POSTGRES_HOST', 'localhost')} port={os.getenv('POSTGRES_PORT', '5432')}"
+        f" dbname={os.getenv('POSTGRES_DB', 'events_db')} user={os.getenv('POSTGRES_USER', 'postgres')}"
+        f" password={os.getenv('POSTGRES_PASSWORD', 'postgres')}"
+    )
+    return psycopg2.connect(dsn, options=f"-c search_path={schema}")
+
+
+def reset_table(conn, schema, event_id_format="text", rollups=False):
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+        cur.execute("DROP TABLE IF EXISTS events")
+        for table, _, _ in ROLLUPS:
+            cur.execute(f"DROP TABLE IF EXISTS {table} CASCADE")
+        cur.execute("DROP TABLE IF EXISTS rollup_state")
+        # copy_events' staging table copies the event_id type of events
+        cur.execute("DROP TABLE IF EXISTS pg_temp.events_staging")
+        cur.execute(
+            f"""
+            CREATE TABLE events (
+                event_id {event_id_format.upper()} PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                event_name TEXT NOT NULL,
+                metadata JSONB,
+                timestamp TIMESTAMP WITH TIME ZONE,
+                processed_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+            )
+            """
+        )
+    if rollups:
+        create_rollups(conn, {})
+        create_rollup_state(conn, {})
+        with conn.cursor() as cur:
+            start_maintaining(cur)
+    conn.commit()
+
+
+def run(conn, insert_fn, rows, batch_size, duplicates, rng):
+    @contextmanager
+    def get_conn():
+        yield conn
+
+    inserted = 0
+    sent = 0
+    elapsed = 0.0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        if duplicates and start:
+            batch = batch + rng.sample(rows[:start], min(start, int(len(batch) * duplicates)))
+        t0 = time.perf_counter()
+        inserted += insert_fn(batch, get_conn)
+        elapsed += time.perf_counter() - t0
+        sent += len(batch)
+    return sent, inserted, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[500, 2000, 10000, 50000])
+    parser.add_argument("--rows", type=int, default=200_000, help="rows per run (at least one batch)")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="fraction of each batch re-sent from earlier batches")
+    parser.add_argument("--strategies", nargs="+", default=sorted(WRITE_STRATEGIES), choices=sorted(WRITE_STRATEGIES))
+    parser.add_argument("--event-id-formats", nargs="+", default=["text"], choices=["text", "bytea", "uuid"])
+    parser.add_argument("--rollups", nargs="+", default=["off"], choices=["off", "on"])
+    parser.add_argument("--schema", default="bench_insert")
+    args = parser.parse_args()
+
+    conn = connect(args.schema)
+    print(
+        f"{'strategy':<8} {'id':<6} {'rollups':<7} {'batch':>7} {'rows sent':>10} {'inserted':>9} {'rows/s':>10} {'ms/batch':>9}"
+        f" {'pkey MB':>8}"
+    )
+    try:
+        for batch_size in args.batch_sizes:
+            rows = make_rows(max(args.rows, batch_size))
+            for name in args.strategies:
+                for event_id_format in args.event_id_formats:
+                    for rollups in args.rollups:
+                        reset_table(conn, args.schema, event_id_format, rollups == "on")
+                        insert_fn = write_strategy(name, event_id_format, rollups == "on")
+                        sent, inserted, elapsed = run(conn, insert_fn, rows, batch_size, args.duplicates, random.Random(3))
+                        batches = -(-len(rows) // batch_size)
+                        with conn.cursor() as cur:
+                            cur.execute("SELECT pg_relation_size('events_pkey')")
+                            pkey_mb = cur.fetchone()[0] / 2 ** 20
+                        conn.commit()
+                        print(
+                            f"{name:<8} {event_id_format:<6} {rollups:<7} {batch_size:>7} {sent:>10} {inserted:>9}"
+                            f" {sent / elapsed:>10.0f} {elapsed / batches * 1000:>9.1f} {pkey_mb:>8.1f}"
+                        )
+    finally:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Compare Kafka producer batching/compression settings.
+
+Sends the same synthetic event stream through each producer configuration
+and reports msgs/s, payload MB/s and (in fake mode) bytes on the wire.
+
+Usage:
+    python tools/bench_producer.py --bootstrap localhost:9092 --topic bench-events
+    python tools/bench_producer.py --fake
+
+``--fake`` runs without a broker: messages are appended to aiokafka's own
+record batch builder and each full batch is compressed, which measures the
+client-side encode/compress cost and the resulting wire size. Linger has no
+effect in fake mode because nothing waits on the network.
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+from aiokafka import AIOKafkaProducer
+from aiokafka.record.default_records import DefaultRecordBatchBuilder
+
+EVENT_NAMES = ["page_view", "click", "scroll", "form_submit"]
+
+CONFIGS = {
+    "baseline": {"compression_type": None, "linger_ms": 0, "max_batch_size": 16384},
+    "linger-5ms-64k": {"compression_type": None, "linger_ms": 5, "max_batch_size": 65536},
+    "gzip-5ms-64k": {"compression_type": "gzip", "linger_ms": 5, "max_batch_size": 65536},
+    "lz4-5ms-64k": {"compression_type": "lz4", "linger_ms": 5, "max_batch_size": 65536},
+    "zstd-5ms-64k": {"compression_type": "zstd", "linger_ms": 5, "max_batch_size": 65536},
+    "lz4-20ms-256k": {"compression_type": "lz4", "linger_ms": 20, "max_batch_size": 262144},
+}
+
+# Codec ids used in the Kafka record batch attributes
+CODECS = {None: 0, "gzip": 1, "snappy": 2, "lz4": 3, "zstd": 4}
+
+
+def make_values(count):
+    """Build ``count`` serialized events shaped like the ingestion payload."""
+    now = datetime.now(timezone.utc).isoformat()
+    values = []
+    for i in range(count):
+        payload = {
+            "user_id": f"user_{i % 1000}",
+            "event_name": EVENT_NAMES[i % len(EVENT_NAMES)],
+            "metadata": {"page": f"/page_{i % 10}", "session_id": f"session_{i % 50}"},
+            "timestamp": now,
+        }
+        values.append(json.dumps(payload).encode("utf-8"))
+    return values
+
+
+def run_fake(values, config):
+    """Encode and compress values into record batches; return wire bytes."""
+    codec = CODECS[config["compression_type"]]
+    wire_bytes = 0
+    timestamp = int(time.time() * 1000)
+
+    def new_builder():
+        return DefaultRecordBatchBuilder(
+            magic=2, compression_type=codec, is_transactional=False,
+            producer_id=-1, producer_epoch=-1, base_sequence=-1,
+            batch_size=config["max_batch_size"],
+        )
+
+    builder = new_builder()
+    offset = 0
+    for value in values:
+        if builder.append(offset, timestamp, None, value, []) is None:
+            wire_bytes += len(builder.build())
+            builder = new_builder()
+            offset = 0
+            builder.append(offset, timestamp, None, value, [])
+        offset += 1
+    wire_bytes += len(builder.build())
+    return wire_bytes
+
+
+async def run_broker(values, config, bootstrap, topic):
+    """Send values through a real producer and wait for every ack."""
+    producer = AIOKafkaProducer(bootstrap_servers=bootstrap, acks=1, **config)
+    await producer.start()
+    try:
+        futures = [await producer.send(topic, value) for value in values]
+        await asyncio.gather(*futures)
+    finally:
+        await producer.stop()
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bootstrap", default="localhost:9092")
+    parser.add_argument("--topic", default="bench-events")
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--fake", action="store_true", help="use the in-process fake instead of a broker")
+    parser.add_argument("--only", nargs="+", choices=sorted(CONFIGS), help="run a subset of configurations")
+    args = parser.parse_args()
+
+    values = make_values(args.messages)
+    payload_bytes = sum(len(v) for v in values)
+    names = args.only or list(CONFIGS)
+    if args.fake:
+        # linger only matters with a network round trip; drop duplicates
+        unique = {}
+        for name in names:
+            unique.setdefault((CONFIGS[name]["compression_type"], CONFIGS[name]["max_batch_size"]), name)
+        names = list(unique.values())
+
+    print(f"{args.messages} messages, {payload_bytes / args.messages:.0f} payload bytes/msg, mode={'fake' if args.fake else args.bootstrap}")
+    print(f"{'config':<16} {'msgs/s':>10} {'MB/s':>8} {'wire B/msg':>11} {'ratio':>6}")
+    for name in names:
+        config = CONFIGS[name]
+        start = time.perf_counter()
+        if args.fake:
+            wire = run_fake(values, config)
+        else:
+            wire = asyncio.run(run_broker(values, config, args.bootstrap, args.topic))
+        elapsed = time.perf_counter() - start
+        wire_col = f"{wire / args.messages:>11.1f}" if wire else f"{'-':>11}"
+        ratio_col = f"{payload_bytes / wire:>6.2f}" if wire else f"{'-':>6}"
+        print(
+            f"{name:<16} {args.messages / elapsed:>10.0f} {payload_bytes / elapsed / 1e6:>8.1f} "
+            f"{wire_col} {ratio_col}"
+        )
+
+
+if __name__ == "__main__":
+    main()
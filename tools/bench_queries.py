@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Per-endpoint analytics query latency: raw scans, access-path indexes, rollups.
+
+Fills an ``events`` table in a scratch schema (``--schema``, dropped
+afterwards) with ``--rows`` synthetic events spread over the last
+``--days`` days from ``--users`` users, generated server-side. It then times the SQL behind each
+analytics endpoint (``analytics_service/repo/events.py``, ``EventsRepo``)
+``--repeat`` times with varying parameters:
+
+- ``count``: ``get_event_count`` over a one hour window;
+- ``top_events``: ``get_top_events(5)``;
+- ``active_users``: ``get_active_users(24)``;
+- ``user_events``: ``get_user_events(user, 10)``;
+- ``event``: ``get_event(event_id)``.
+
+It does this three times: with only the primary key; after the shared
+migrations (``shared.migrations``, which add the BRIN and composite indexes
+and the rollup tables) were applied to the schema and the rollups
+backfilled (``tools/backfill_rollups.py``); and once more reading the
+rollups (``EventsRepo(use_rollups=True)``, ``ANALYTICS_USE_ROLLUPS``). ``--partitioning daily`` benches the
+time-partitioned layout instead.
+
+Usage:
+    POSTGRES_HOST=localhost python tools/bench_queries.py --rows 10000000
+    python tools/bench_queries.py --rows 1000000 --repeat 50 --partitioning daily
+    python tools/bench_queries.py --rows 10000000 --users 1000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import psycopg2
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "analytics_service"))
+
+from backfill_rollups import backfill  # noqa: E402
+from repo.events import EventsRepo  # noqa: E402
+from shared.migrations import migrate  # noqa: E402
+from shared.rollups import start_maintaining  # noqa: E402
+
+EVENT_NAMES = ["page_view", "click", "scroll", "form_submit"]
+
+
+def connect(schema):
+    dsn = (
+        f"host={os.getenv('POSTGRES_HOST', 'localhost')} port={os.getenv('POSTGRES_PORT', '5432')}"
+        f" dbname={os.getenv('POSTGRES_DB', 'events_db')} user={os.getenv('POSTGRES_USER', 'postgres')}"
+        f" password={os.getenv('POSTGRES_PASSWORD', 'postgres')}"
+    )
+    return psycopg2.connect(dsn, options=f"-c search_path={schema}")
+
+
+def load(conn, schema, rows, days, users, partitioning, chunk=1_000_000):
+    """Create the table with the first migration only and fill it in time order."""
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        cur.execute(f"CREATE SCHEMA {schema}")
+    conn.commit()
+    migrate(conn, {"partitioning": partitioning}, target=1)
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=days)
+    with conn.cursor() as cur:
+        if partitioning == "daily":
+            day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+            while day <= end:
+                cur.execute(
+                    f"CREATE TABLE events_p{day:%Y%m%d} PARTITION OF events FOR VALUES FROM (%s) TO (%s)",
+                    (day, day + timedelta(days=1)),
+                )
+                day += timedelta(days=1)
+        step_ms = days * 86_400_000 / rows
+        for lo in range(0, rows, chunk):
+            t0 = time.perf_counter()
+            cur.execute(
+                """
+                INSERT INTO events (event_id, user_id, event_name, metadata, timestamp)
+                SELECT md5(i::text) || md5((-i)::text),
+                       'user_' || abs(hashint4(i)) %% %(users)s,
+                       (%(names)s::text[])[1 + abs(hashint4(i + 7)) %% %(n_names)s],
+                       jsonb_build_object('page', '/page_' || abs(hashint4(i + 3)) %% 200),
+                       %(start)s::timestamptz + (i * %(step)s) * interval '1 millisecond'
+                FROM generate_series(%(lo)s, %(hi)s - 1) AS i
+                """,
+                {
+                    "users": users, "names": EVENT_NAMES, "n_names": len(EVENT_NAMES),
+                    "start": start, "step": step_ms, "lo": lo, "hi": min(rows, lo + chunk),
+                },
+            )
+            conn.commit()
+            print(f"  loaded {min(rows, lo + chunk):>10} rows ({time.perf_counter() - t0:.1f}s)", flush=True)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("VACUUM ANALYZE events")
+    conn.autocommit = False
+    return start, end
+
+
+def sample_ids(conn, count):
+    with conn.cursor() as cur:
+        cur.execute("SELECT event_id FROM events TABLESAMPLE SYSTEM (1) LIMIT %s", (count,))
+        return [r[0] for r in cur.fetchall()]
+
+
+def bench(conn, start, end, users, repeat, ids, rng, use_rollups=False):
+    repo = EventsRepo(conn, use_rollups=use_rollups)
+    span = (end - start).total_seconds() - 3600
+    endpoints = {
+        "count": lambda: repo.get_event_count(
+            *[(t := start + timedelta(seconds=rng.uniform(0, span))).isoformat(), (t + timedelta(hours=1)).isoformat()]
+        ),
+        "top_events": lambda: repo.get_top_events(5),
+        "active_users": lambda: repo.get_active_users(24),
+        "user_events": lambda: repo.get_user_events(f"user_{rng.randrange(users)}", 10),
+        "event": lambda: repo.get_event(rng.choice(ids)),
+    }
+    results = {}
+    for name, call in endpoints.items():
+        call()  # warm up
+        conn.rollback()
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            call()
+            times.append((time.perf_counter() - t0) * 1000)
+            conn.rollback()
+        times.sort()
+        results[name] = (statistics.median(times), times[max(0, int(len(times) * 0.95) - 1)])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--days", type=int, default=30, help="time span of the generated events")
+    parser.add_argument("--users", type=int, default=100_000, help="distinct users of the generated events")
+    parser.add_argument("--repeat", type=int, default=20, help="timed calls per endpoint")
+    parser.add_argument("--partitioning", default="none", choices=["none", "daily"])
+    parser.add_argument("--schema", default="bench_queries")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    args = parser.parse_args()
+
+    conn = connect(args.schema)
+    try:
+        print(
+            f"loading {args.rows} events over {args.days} days from {args.users} users"
+            f" ({args.partitioning} partitioning)"
+        )
+        start, end = load(conn, args.schema, args.rows, args.days, args.users, args.partitioning)
+        ids = sample_ids(conn, 1000)
+        # Same seed: all runs query the same windows, users and ids
+        before = bench(conn, start, end, args.users, args.repeat, ids, random.Random(7))
+        t0 = time.perf_counter()
+        migrate(conn, {"partitioning": args.partitioning})
+        with conn.cursor() as cur:
+            start_maintaining(cur)
+        conn.commit()
+        backfill(conn, window_hours=24)
+        built = time.perf_counter() - t0
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE events, event_counts_minute, event_counts_hour, user_counts_minute, user_counts_hour")
+        conn.autocommit = False
+        after = bench(conn, start, end, args.users, args.repeat, ids, random.Random(7))
+        rolled = bench(conn, start, end, args.users, args.repeat, ids, random.Random(7), use_rollups=True)
+        print(f"indexes and rollups built in {built:.0f}s")
+        print(
+            f"{'endpoint':<13} {'p50 before':>11} {'p95 before':>11} {'p50 after':>10} {'p95 after':>10}"
+            f" {'p50 rollups':>12} {'p95 rollups':>12}"
+        )
+        for name in before:
+            b50, b95 = before[name]
+            a50, a95 = after[name]
+            r50, r95 = rolled[name]
+            print(f"{name:<13} {b50:>9.1f}ms {b95:>9.1f}ms {a50:>8.1f}ms {a95:>8.1f}ms {r50:>10.1f}ms {r95:>10.1f}ms")
+    finally:
+        conn.rollback()
+        conn.autocommit = True
+        if not args.keep:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
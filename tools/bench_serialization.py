@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Per-event CPU cost of turning a request body into a Kafka value.
+
+Compares the original route path (FastAPI JSON parse -> pydantic ``Event`` ->
+dict rebuild -> ``isoformat`` -> ``json.dumps``) with the ``dto.codec`` paths.
+
+Usage: python tools/bench_serialization.py [--events 200000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ingestion_service"))
+
+from dto import Event  # noqa: E402
+from dto import codec  # noqa: E402
+
+
+def make_body(extra_field=False):
+    event = {
+        "user_id": "user_42",
+        "event_name": "page_view",
+        "metadata": {"page": "/page_4", "session_id": "session_17"},
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+    if extra_field:
+        event["client"] = "web"
+    return json.dumps(event).encode("utf-8")
+
+
+def original_path(body):
+    event = Event(**json.loads(body))
+    payload = {
+        "user_id": str(event.user_id),
+        "event_name": event.event_name,
+        "metadata": event.metadata,
+        "timestamp": event.timestamp.isoformat(),
+    }
+    return json.dumps(payload).encode("utf-8")
+
+
+def measure(fn, body, count):
+    start = time.process_time()
+    for _ in range(count):
+        fn(body)
+    return (time.process_time() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=200_000)
+    args = parser.parse_args()
+
+    body = make_body()
+    open_body = make_body(extra_field=True)
+    cases = [
+        ("original route path", original_path, body),
+        ("codec, pydantic json", codec._decode_model, body),
+    ]
+    if codec.FAST_PATH:
+        cases += [
+            ("codec, fast canonical", codec.decode_event, body),
+            ("codec, fast re-encode", codec.decode_event, open_body),
+        ]
+    else:
+        print("msgspec not installed or FAST_PATH_ENABLED=false; fast path skipped")
+
+    baseline = None
+    print(f"{'path':<24} {'us/event':>9} {'speedup':>8}")
+    for name, fn, data in cases:
+        cost = measure(fn, data, args.events)
+        baseline = baseline or cost
+        print(f"{name:<24} {cost:>9.2f} {baseline / cost:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
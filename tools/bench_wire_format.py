@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Bytes per event and decode cost of the request and Kafka wire formats.
+
+Request bodies: a JSON array of ``--batch`` events sent as identity, gzip or
+zstd ``Content-Encoding``; reports bytes per event on the wire and the
+per-event cost of ``dto.decode_content``.
+
+Kafka values: JSON vs msgpack (``KAFKA_VALUE_FORMAT``); reports the value
+size, the size inside an lz4/zstd compressed record batch (aiokafka's own
+batch builder) and the consumer's per-event decode cost
+(``decode_value`` + pydantic ``Event``; see ``tools/bench_decode.py`` for the
+batch decoder the consumer actually uses).
+
+Usage: python tools/bench_wire_format.py [--events 100000] [--batch 500]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import msgspec
+import zstandard
+from aiokafka.record.default_records import DefaultRecordBatchBuilder
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "ingestion_service"))
+
+from dto.content_encoding import decode_content  # noqa: E402
+
+EVENT_NAMES = ["page_view", "click", "scroll", "form_submit"]
+
+# Codec ids used in the Kafka record batch attributes
+CODECS = {None: 0, "lz4": 3, "zstd": 4}
+
+
+def make_payloads(count, seed=7):
+    """Events with realistic variety: random users, sessions and millisecond timestamps."""
+    rng = random.Random(seed)
+    start = datetime.now(timezone.utc).timestamp()
+    return [
+        {
+            "user_id": f"user_{rng.randrange(100_000)}",
+            "event_name": rng.choice(EVENT_NAMES),
+            "metadata": {"page": f"/page_{rng.randrange(200)}", "session_id": f"session_{rng.getrandbits(48):012x}"},
+            "timestamp": datetime.fromtimestamp(start + i * 0.0007 + rng.random() * 0.01, timezone.utc).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+def batch_wire_bytes(values, compression, batch_size=65536):
+    """Size of ``values`` packed into Kafka record batches."""
+    total = 0
+    timestamp = int(time.time() * 1000)
+
+    def new_builder():
+        return DefaultRecordBatchBuilder(
+            magic=2, compression_type=CODECS[compression], is_transactional=False,
+            producer_id=-1, producer_epoch=-1, base_sequence=-1, batch_size=batch_size,
+        )
+
+    builder = new_builder()
+    offset = 0
+    for value in values:
+        if builder.append(offset, timestamp, None, value, []) is None:
+            total += len(builder.build())
+            builder = new_builder()
+            offset = 0
+            builder.append(offset, timestamp, None, value, [])
+        offset += 1
+    return total + len(builder.build())
+
+
+def per_event_us(fn, items, repeat=1):
+    start = time.process_time()
+    for _ in range(repeat):
+        for item in items:
+            fn(item)
+    return (time.process_time() - start) / (len(items) * repeat) * 1e6
+
+
+def bench_request_bodies(payloads, batch):
+    bodies = [json.dumps(payloads[i:i + batch]).encode() for i in range(0, len(payloads), batch)]
+    zstd = zstandard.ZstdCompressor()
+    encodings = {
+        "identity": bodies,
+        "gzip": [gzip.compress(b) for b in bodies],
+        "zstd": [zstd.compress(b) for b in bodies],
+    }
+    limit = max(len(b) for b in bodies)
+    print(f"Request bodies ({batch} events per body)")
+    print(f"{'encoding':<10} {'bytes/event':>12} {'ratio':>7} {'decompress us/event':>20}")
+    base = sum(len(b) for b in bodies)
+    for name, encoded in encodings.items():
+        size = sum(len(b) for b in encoded)
+        start = time.process_time()
+        for body in encoded:
+            decode_content(body, name, limit)
+        cost = (time.process_time() - start) / len(payloads) * 1e6
+        print(f"{name:<10} {size / len(payloads):>12.1f} {base / size:>6.1f}x {cost:>20.3f}")
+
+
+def bench_kafka_values(payloads):
+    sys.path.insert(0, os.path.join(ROOT, "event_consumer"))
+    from utils.decoder import decode_value, header  # noqa: E402
+    from models import Event  # noqa: E402
+
+    def _decode_value(r):
+        return decode_value(r.value, header(r, "content-type"))
+
+    formats = {
+        "json": ([json.dumps(p).encode() for p in payloads], []),
+        "msgpack": ([msgspec.msgpack.encode(p) for p in payloads], [("content-type", b"application/msgpack")]),
+    }
+    print("\nKafka values")
+    print(f"{'format':<8} {'value B':>8} {'lz4 B':>7} {'zstd B':>7} {'decode us':>10} {'decode+Event us':>16}")
+    for name, (values, headers) in formats.items():
+        records = [SimpleNamespace(value=v, headers=headers) for v in values]
+        raw = sum(len(v) for v in values) / len(values)
+        lz4 = batch_wire_bytes(values, "lz4") / len(values)
+        zstd = batch_wire_bytes(values, "zstd") / len(values)
+        decode = per_event_us(_decode_value, records)
+        full = per_event_us(lambda r: Event(**_decode_value(r)), records)
+        print(f"{name:<8} {raw:>8.1f} {lz4:>7.1f} {zstd:>7.1f} {decode:>10.3f} {full:>16.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=500, help="events per request body")
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.events)
+    bench_request_bodies(payloads, args.batch)
+    bench_kafka_values(payloads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Measure ingestion RPS as the number of uvicorn workers grows.
+
+For every worker count the service is started with ``python serve.py``
+(``WORKERS=n``, a fresh spool and metrics directory), warmed up, and then
+loaded with POST /events from several client processes for a fixed time.
+Reports requests/s, latency percentiles and the speedup over the first
+worker count.
+
+Usage:
+    python tools/bench_workers.py --workers 1 2 4 --duration 30
+    python tools/bench_workers.py --kafka localhost:9092 --delivery-mode leader-ack
+
+Run the load generator on other cores than the service (or another host):
+a single Python client process saturates long before a multi-worker
+service does, hence ``--clients``.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+import aiohttp
+
+SERVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ingestion_service")
+EVENT_NAMES = ["page_view", "click", "scroll", "form_submit"]
+
+
+def start_service(workers, port, kafka, workdir):
+    env = dict(
+        os.environ,
+        WORKERS=str(workers),
+        PORT=str(port),
+        KAFKA_SERVER=kafka,
+        SPOOL_DIR=os.path.join(workdir, "spool"),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, "metrics"),
+        PYTHONPATH=os.path.join(SERVICE_DIR, ".."),
+        LOG_LEVEL="WARNING",
+    )
+    proc = subprocess.Popen([sys.executable, "serve.py"], cwd=SERVICE_DIR, env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                return proc
+        except OSError:
+            time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError(f"service with {workers} workers did not become healthy")
+
+
+async def load(url, concurrency, duration, delivery_mode, seed):
+    """Keep ``concurrency`` requests in flight for ``duration`` seconds."""
+    latencies = []
+    errors = 0
+    headers = {"X-Delivery-Mode": delivery_mode}
+    deadline = time.monotonic() + duration
+
+    async def worker(session, n):
+        nonlocal errors
+        i = n
+        while time.monotonic() < deadline:
+            event = {
+                "user_id": f"user_{(seed + i) % 1000}",
+                "event_name": EVENT_NAMES[i % len(EVENT_NAMES)],
+                "metadata": {"page": f"/page_{i % 10}", "seq": i},
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+            }
+            start = time.perf_counter()
+            try:
+                async with session.post(url, json=event, headers=headers) as resp:
+                    await resp.read()
+                    if resp.status != 202:
+                        errors += 1
+                        continue
+            except aiohttp.ClientError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            i += concurrency
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=10)) as session:
+        await asyncio.gather(*(worker(session, n) for n in range(concurrency)))
+    return latencies, errors
+
+
+def client_process(args):
+    url, concurrency, duration, delivery_mode, seed = args
+    return asyncio.run(load(url, concurrency, duration, delivery_mode, seed))
+
+
+def run_load(url, clients, concurrency, duration, delivery_mode):
+    jobs = [(url, concurrency, duration, delivery_mode, c * 1_000_003) for c in range(clients)]
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.map(client_process, jobs)
+    latencies = sorted(lat for lats, _ in results for lat in lats)
+    errors = sum(err for _, err in results)
+    return latencies, errors
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--kafka", default="localhost:9092")
+    parser.add_argument("--clients", type=int, default=4, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight per client process")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--delivery-mode", default="fire-and-forget")
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}/events"
+    rows = []
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as workdir:
+            proc = start_service(workers, args.port, args.kafka, workdir)
+            try:
+                run_load(url, args.clients, args.concurrency, args.warmup, args.delivery_mode)
+                latencies, errors = run_load(url, args.clients, args.concurrency, args.duration, args.delivery_mode)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+        rows.append((workers, len(latencies) / args.duration, percentile(latencies, 0.5), percentile(latencies, 0.99), errors))
+
+    base = rows[0][1] or 1.0
+    print(f"{'workers':>7} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'speedup':>8}")
+    for workers, rps, p50, p99, errors in rows:
+        print(f"{workers:>7} {rps:>10.0f} {p50 * 1000:>8.2f} {p99 * 1000:>8.2f} {errors:>7} {rps / base:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""Convert ``events.event_id`` to another storage format while writes continue.
+
+``ALTER COLUMN ... TYPE`` would rewrite the table and its primary key under
+an exclusive lock. Instead the id is converted into a shadow column,
+``event_id_new``, and swapped in at the end:
+
+1. prepare: add ``event_id_new`` and a trigger that fills it for rows
+   written meanwhile (consumers keep writing the old format), plus ``NOT
+   VALID`` check constraints (not null; 32 bytes for ``bytea``);
+2. backfill: convert existing rows in key order, ``--batch-size`` rows per
+   transaction;
+3. validate the check constraints and build the new unique key index
+   concurrently (per partition on a partitioned table);
+4. swap (``--swap``, stop the consumers first): in one short transaction,
+   drop the old key and column, rename ``event_id_new`` to ``event_id`` and
+   make its index the primary key. Nothing is scanned or rebuilt under the
+   lock.
+
+Steps 1-3 are idempotent and run on every call, so an interrupted run is
+resumed by running the tool again. Converting from ``uuid`` is refused: it
+only kept 128 of the 256 bits.
+
+Usage:
+    POSTGRES_HOST=localhost python tools/migrate_event_ids.py --to bytea
+    python tools/migrate_event_ids.py --to bytea --swap
+    python tools/migrate_event_ids.py --status
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+import psycopg2
+from psycopg2 import errors
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from shared.event_ids import EVENT_ID_FORMATS, column_format  # noqa: E402
+from shared.migrations.ddl import build_index_concurrently, partitions, relkind  # noqa: E402
+
+logger = logging.getLogger("migrate_event_ids")
+
+_HEX_ID = "{col} ~ '^[0-9a-fA-F]{{64}}$'"
+# SQL converting {col} from one format to another; ids that are not 64 hex
+# characters become NULL and then fail the not null check
+_CONVERT = {
+    ("text", "bytea"): f"CASE WHEN {_HEX_ID} THEN decode({{col}}, 'hex') END",
+    ("text", "uuid"): f"CASE WHEN {_HEX_ID} THEN left({{col}}, 32)::uuid END",
+    ("bytea", "text"): "encode({col}, 'hex')",
+    ("bytea", "uuid"): "CASE WHEN octet_length({col}) >= 16 THEN encode(substring({col} from 1 for 16), 'hex')::uuid END",
+}
+NOT_NULL_CHECK = "events_event_id_new_not_null"
+LENGTH_CHECK = "events_event_id_length"
+
+
+def connect():
+    return psycopg2.connect(
+        host=os.getenv("POSTGRES_HOST", "localhost"),
+        port=os.getenv("POSTGRES_PORT", "5432"),
+        dbname=os.getenv("POSTGRES_DB", "events_db"),
+        user=os.getenv("POSTGRES_USER", "postgres"),
+        password=os.getenv("POSTGRES_PASSWORD", "postgres"),
+    )
+
+
+def column_type(cur, column):
+    cur.execute(
+        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute"
+        " WHERE attrelid = 'events'::regclass AND attname = %s AND NOT attisdropped",
+        (column,),
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def key_tables(cur):
+    """Tables that get their own unique index on event_id_new: events, or each of its partitions."""
+    if relkind(cur, "events") == "p":
+        return [(name, "(event_id_new, timestamp)") for name in partitions(cur, "events")]
+    return [("events", "(event_id_new)")]
+
+
+def in_transaction(conn, lock_timeout, statements, attempts=5):
+    """Run ``statements(cur)`` in one transaction, retrying when a lock is not granted in time.
+
+    The lock timeout keeps DDL from queueing behind a long query and then
+    blocking every writer that queues behind the DDL.
+    """
+    for attempt in range(attempts):
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL lock_timeout = %s", (f"{lock_timeout}s",))
+                statements(cur)
+            conn.commit()
+            return
+        except errors.LockNotAvailable:
+            conn.rollback()
+            logger.warning("lock not granted within %ss (attempt %s of %s)", lock_timeout, attempt + 1, attempts)
+            time.sleep(1 + attempt)
+    raise RuntimeError("could not lock events; retry when it is less busy")
+
+
+def prepare(conn, source, target, lock_timeout):
+    expr = _CONVERT[(source, target)]
+
+    def statements(cur):
+        existing = column_type(cur, "event_id_new")
+        if existing is not None and existing != target:
+            raise RuntimeError(f"event_id_new exists as {existing}; drop it to convert to {target}")
+        cur.execute(f"ALTER TABLE events ADD COLUMN IF NOT EXISTS event_id_new {target}")
+        cur.execute(
+            "CREATE OR REPLACE FUNCTION events_event_id_new() RETURNS trigger LANGUAGE plpgsql AS"
+            f" $$ BEGIN NEW.event_id_new := {expr.format(col='NEW.event_id')}; RETURN NEW; END $$"
+        )
+        cur.execute("DROP TRIGGER IF EXISTS events_event_id_new ON events")
+        cur.execute(
+            "CREATE TRIGGER events_event_id_new BEFORE INSERT OR UPDATE OF event_id ON events"
+            " FOR EACH ROW EXECUTE FUNCTION events_event_id_new()"
+        )
+        checks = [(NOT_NULL_CHECK, "event_id_new IS NOT NULL")]
+        if target == "bytea":
+            checks.append((LENGTH_CHECK, "octet_length(event_id_new) = 32"))
+        for name, check in checks:
+            cur.execute("SELECT 1 FROM pg_constraint WHERE conrelid = 'events'::regclass AND conname = %s", (name,))
+            if cur.fetchone() is None:
+                cur.execute(f"ALTER TABLE events ADD CONSTRAINT {name} CHECK ({check}) NOT VALID")
+
+    in_transaction(conn, lock_timeout, statements)
+    logger.info("prepared events.event_id_new (%s) and its trigger", target)
+
+
+def backfill(conn, source, target, batch_size, pause):
+    """Convert existing rows in primary key order, one transaction per batch."""
+    expr = _CONVERT[(source, target)].format(col="event_id")
+    last = None
+    converted = 0
+    batches = 0
+    started = time.monotonic()
+    while True:
+        with conn.cursor() as cur:
+            where = "" if last is None else "WHERE event_id > %(last)s"
+            cur.execute(
+                f"SELECT max(event_id), count(*) FROM"
+                f" (SELECT event_id FROM events {where} ORDER BY event_id LIMIT %(limit)s) batch",
+                {"last": last, "limit": batch_size},
+            )
+            high, count = cur.fetchone()
+            if not count:
+                conn.commit()
+                break
+            cur.execute(
+                f"UPDATE events SET event_id_new = {expr}"
+                f" WHERE event_id <= %(high)s {'' if last is None else 'AND event_id > %(last)s'}"
+                " AND event_id_new IS NULL",
+                {"high": high, "last": last},
+            )
+            converted += cur.rowcount
+        conn.commit()
+        last = high
+        batches += 1
+        if batches % 50 == 0:
+            logger.info("backfilled %s rows (%.0f rows/s)", converted, converted / (time.monotonic() - started))
+        if pause:
+            time.sleep(pause)
+    logger.info("backfilled %s rows in %.0fs", converted, time.monotonic() - started)
+
+
+def validate_and_index(conn):
+    """Validate the checks (no exclusive lock) and build the unique key index concurrently."""
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for name in (NOT_NULL_CHECK, LENGTH_CHECK):
+                cur.execute(
+                    "SELECT convalidated FROM pg_constraint WHERE conrelid = 'events'::regclass AND conname = %s",
+                    (name,),
+                )
+                row = cur.fetchone()
+                if row is None or row[0]:
+                    continue
+                try:
+                    cur.execute(f"ALTER TABLE events VALIDATE CONSTRAINT {name}")
+                except errors.CheckViolation:
+                    raise RuntimeError(
+                        "some event_ids cannot be converted (not 64 hex characters); fix or delete them:"
+                        " SELECT event_id FROM events WHERE event_id_new IS NULL"
+                    ) from None
+            for table, columns in key_tables(cur):
+                build_index_concurrently(cur, f"{table}_event_id_new_key", table, columns, unique=True)
+    finally:
+        conn.autocommit = False
+    logger.info("validated event_id_new and built its unique index")
+
+
+def swap(conn, lock_timeout):
+    def statements(cur):
+        cur.execute("LOCK TABLE events IN ACCESS EXCLUSIVE MODE")
+        partitioned = relkind(cur, "events") == "p"
+        # Partitions created since the index step are new and small
+        for table, columns in key_tables(cur):
+            cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_event_id_new_key ON {table} {columns}")
+        cur.execute("ALTER TABLE events ALTER COLUMN event_id_new SET NOT NULL")  # proven by the check, no scan
+        cur.execute("SELECT conname FROM pg_constraint WHERE conrelid = 'events'::regclass AND contype = 'p'")
+        for (name,) in cur.fetchall():
+            cur.execute(f"ALTER TABLE events DROP CONSTRAINT {name}")
+        cur.execute(f"ALTER TABLE events DROP CONSTRAINT {NOT_NULL_CHECK}")
+        cur.execute("DROP TRIGGER events_event_id_new ON events")
+        cur.execute("DROP FUNCTION events_event_id_new()")
+        # Drops the old column's constraints (the length check of a bytea id) with it
+        cur.execute("ALTER TABLE events DROP COLUMN event_id")
+        cur.execute("ALTER TABLE events RENAME COLUMN event_id_new TO event_id")
+        for table, _ in key_tables(cur):
+            cur.execute(
+                f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY USING INDEX {table}_event_id_new_key"
+            )
+        if partitioned:
+            # Adopts the partitions' primary keys instead of building new indexes
+            cur.execute("ALTER TABLE events ADD CONSTRAINT events_pkey PRIMARY KEY (event_id, timestamp)")
+
+    in_transaction(conn, lock_timeout, statements)
+    logger.info("swapped event_id_new in as events.event_id")
+
+
+def status(conn):
+    with conn.cursor() as cur:
+        print(f"event_id:      {column_format(cur)}")
+        shadow = column_type(cur, "event_id_new")
+        print(f"event_id_new:  {shadow or '-'}")
+        if shadow:
+            cur.execute("SELECT count(*) FROM events WHERE event_id_new IS NULL")
+            print(f"to backfill:   {cur.fetchone()[0]}")
+            cur.execute(
+                "SELECT conname, convalidated FROM pg_constraint WHERE conrelid = 'events'::regclass AND conname = ANY(%s)",
+                ([NOT_NULL_CHECK, LENGTH_CHECK],),
+            )
+            for name, valid in cur.fetchall():
+                print(f"{name}: {'valid' if valid else 'not validated'}")
+        cur.execute(
+            "SELECT c.relname, pg_size_pretty(pg_relation_size(c.oid)) FROM pg_index x"
+            " JOIN pg_class c ON c.oid = x.indexrelid"
+            " JOIN pg_class t ON t.oid = x.indrelid"
+            " WHERE (t.oid = 'events'::regclass OR t.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = 'events'::regclass))"
+            " AND (x.indisprimary OR c.relname LIKE '%event_id_new_key') ORDER BY 1"
+        )
+        for name, size in cur.fetchall():
+            print(f"  {name:<40} {size}")
+    conn.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert events.event_id to another storage format online.")
+    parser.add_argument("--to", choices=list(EVENT_ID_FORMATS), help="target format")
+    parser.add_argument("--swap", action="store_true", help="finish with the swap (stop the consumers first)")
+    parser.add_argument("--status", action="store_true", help="show the conversion state and exit")
+    parser.add_argument("--batch-size", type=int, default=10000, help="rows converted per transaction")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    parser.add_argument("--lock-timeout", type=float, default=5.0, help="seconds to wait for a table lock per attempt")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    conn = connect()
+    try:
+        if args.status:
+            status(conn)
+            return
+        if args.to is None:
+            parser.error("--to is required")
+        with conn.cursor() as cur:
+            source = column_format(cur)
+        conn.rollback()
+        if source is None:
+            parser.error("the events table does not exist")
+        if source == args.to:
+            print(f"events.event_id is already {args.to}")
+            return
+        if source == "uuid":
+            parser.error("a uuid id kept only 128 bits of the hash; it cannot be converted back")
+
+        prepare(conn, source, args.to, args.lock_timeout)
+        backfill(conn, source, args.to, args.batch_size, args.pause)
+        validate_and_index(conn)
+        if not args.swap:
+            print("ready to swap: stop the consumers, run again with --swap, then restart the consumers and the"
+                  f" analytics service with EVENT_ID_FORMAT={args.to}")
+            return
+        swap(conn, args.lock_timeout)
+        print(f"events.event_id is now {args.to}; start the services with EVENT_ID_FORMAT={args.to}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
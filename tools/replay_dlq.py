@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""Replay records from the consumer's DLQ topic into Postgres.
+
+Reads ``<KAFKA_TOPIC>-dlq`` (or ``--topic``) from an offset or time slice,
+keeps the records that match the filters, decodes them again with the
+consumer's decoder (``utils.decoder``) and writes them in large batches
+with the consumer's write path (``utils.batch_processor.write_rows`` with a
+``repo.events`` write strategy). Inserts are idempotent on ``event_id``, so
+replaying a slice twice is safe.
+
+Slice: every partition from its first offset (or ``--from-offset`` /
+``--since``) up to the end offset at startup (or ``--to-offset`` /
+``--until``). With ``--group`` the progress is committed after every
+batch and an interrupted replay resumes where it stopped.
+
+Filters (all optional): ``--stage`` (``dlq_stage`` header: decode or
+insert), ``--error`` (regular expression searched in ``dlq_error``),
+``--event-name`` (one or more event names).
+
+Failures are handled like in the consumer: transient errors are retried
+with jittered backoff, and permanent ones are bisected down to the failing
+records, which are reported and skipped. Progress is logged every
+``--progress`` seconds and exported as ``dlq_replay_*`` metrics on
+``--metrics-port``.
+
+Usage:
+    python tools/replay_dlq.py --stage insert --dry-run
+    python tools/replay_dlq.py --since 2024-05-01T10:00:00Z --until 2024-05-01T12:00:00Z \\
+        --event-name click page_view --rate 50000 --group dlq-replay
+"""
+import argparse
+import asyncio
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+from aiokafka import AIOKafkaConsumer, TopicPartition
+from prometheus_client import Counter, Gauge, start_http_server
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "event_consumer"))
+
+from config.config import get_settings, init_pool, close_pool, get_conn  # noqa: E402
+from repo.events import WRITE_STRATEGIES, write_strategy  # noqa: E402
+from utils.batch_processor import write_rows  # noqa: E402
+from utils.decoder import decode_records, header  # noqa: E402
+from utils.failures import backoff, describe, is_schema_error, is_transient  # noqa: E402
+
+logger = logging.getLogger("dlq-replay")
+
+replay_records = Counter(
+    "dlq_replay_records_total",
+    "DLQ records handled by the replay tool, by result (filtered, invalid, matched, inserted, duplicate, failed)",
+    ["result"],
+)
+replay_remaining = Gauge("dlq_replay_remaining_records", "Records left in the replayed slice")
+replay_rate = Gauge("dlq_replay_records_per_second", "DLQ records read per second since the replay started")
+
+
+class Stats:
+    """Running totals of one replay."""
+
+    RESULTS = ("filtered", "invalid", "matched", "inserted", "duplicate", "failed")
+
+    def __init__(self):
+        self.read = 0
+        self.counts = dict.fromkeys(self.RESULTS, 0)
+        self.started = time.monotonic()
+
+    def add(self, result: str, n: int = 1):
+        if n:
+            self.counts[result] += n
+            replay_records.labels(result=result).inc(n)
+
+    def rate(self) -> float:
+        return self.read / max(time.monotonic() - self.started, 1e-9)
+
+    def line(self, remaining: int) -> str:
+        counts = " ".join(f"{k}={v}" for k, v in self.counts.items())
+        return f"read={self.read} {counts} remaining={remaining} rate={self.rate():.0f}/s"
+
+
+def parse_time(value: str) -> int:
+    """ISO 8601 time (``Z`` allowed, naive means UTC) to epoch milliseconds."""
+    ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return int(ts.timestamp() * 1000)
+
+
+async def slice_bounds(consumer: AIOKafkaConsumer, tps: list, args) -> dict:
+    """``{partition: (start, end)}`` offsets of the slice to replay, end exclusive."""
+    first = await consumer.beginning_offsets(tps)
+    last = await consumer.end_offsets(tps)
+    start = dict(first)
+    end = dict(last)
+    if args.since:
+        found = await consumer.offsets_for_times({tp: parse_time(args.since) for tp in tps})
+        start = {tp: found[tp].offset if found[tp] else last[tp] for tp in tps}
+    elif args.from_offset is not None:
+        start = {tp: max(first[tp], args.from_offset) for tp in tps}
+    elif args.group:
+        for tp in tps:
+            committed = await consumer.committed(tp)
+            if committed is not None:
+                start[tp] = max(first[tp], committed)
+    if args.until:
+        found = await consumer.offsets_for_times({tp: parse_time(args.until) for tp in tps})
+        end = {tp: found[tp].offset if found[tp] else last[tp] for tp in tps}
+    if args.to_offset is not None:
+        end = {tp: min(end[tp], args.to_offset) for tp in tps}
+    return {tp: (start[tp], max(start[tp], end[tp])) for tp in tps}
+
+
+def matches(r, args, error_re) -> bool:
+    """Header filters, applied before decoding."""
+    if args.stage and (header(r, "dlq_stage") or b"").decode() != args.stage:
+        return False
+    if error_re and not error_re.search((header(r, "dlq_error") or b"").decode(errors="replace")):
+        return False
+    return True
+
+
+async def write_isolating(rows: list, records: list, insert_fn, settings, stats: Stats):
+    """Write rows, retrying transient failures and bisecting permanent ones."""
+    attempt = 0
+    while True:
+        try:
+            inserted = await write_rows(rows, get_conn, insert_fn)
+            stats.add("inserted", inserted)
+            stats.add("duplicate", len(rows) - inserted)
+            return
+        except Exception as e:
+            if is_transient(e):
+                delay = backoff(attempt, settings.RETRY_BACKOFF_BASE, settings.RETRY_BACKOFF_MAX)
+                attempt += 1
+                logger.warning("write failed (attempt %s), retrying in %.1fs: %s", attempt, delay, describe(e, 200))
+                await asyncio.sleep(delay)
+                continue
+            if is_schema_error(e):
+                # Fails every row alike; bisecting would only log each record as failed
+                raise
+            if len(rows) == 1:
+                r = records[0]
+                logger.error("record %s[%s]@%s still fails: %s", r.topic, r.partition, r.offset, describe(e, 200))
+                stats.add("failed")
+                return
+            mid = len(rows) // 2
+            await write_isolating(rows[:mid], records[:mid], insert_fn, settings, stats)
+            await write_isolating(rows[mid:], records[mid:], insert_fn, settings, stats)
+            return
+
+
+async def replay_chunk(records: list, insert_fn, settings, args, error_re, event_names, stats: Stats):
+    """Filter, re-validate and write one fetched chunk of DLQ records."""
+    kept = [r for r in records if matches(r, args, error_re)]
+    stats.add("filtered", len(records) - len(kept))
+    if not kept:
+        return
+    columns = decode_records(kept)
+    stats.add("invalid", len(columns.errors))
+    failed = {i for i, _ in columns.errors}
+    good = [r for i, r in enumerate(kept) if i not in failed]
+    rows = columns.rows()
+    if event_names:
+        selected = [i for i, row in enumerate(rows) if row[2] in event_names]
+        stats.add("filtered", len(rows) - len(selected))
+        rows = [rows[i] for i in selected]
+        good = [good[i] for i in selected]
+    stats.add("matched", len(rows))
+    if rows and not args.dry_run:
+        await write_isolating(rows, good, insert_fn, settings, stats)
+
+
+async def run(args):
+    settings = get_settings()
+    topic = args.topic or settings.KAFKA_TOPIC + "-dlq"
+    consumer = AIOKafkaConsumer(
+        bootstrap_servers=args.bootstrap or settings.KAFKA_SERVER,
+        group_id=args.group,
+        enable_auto_commit=False,
+        max_partition_fetch_bytes=args.fetch_bytes,
+    )
+    await consumer.start()
+    try:
+        # Fetch topic metadata; partitions_for_topic only reads the cache
+        await consumer.topics()
+        partitions = consumer.partitions_for_topic(topic)
+        if not partitions:
+            raise SystemExit(f"topic {topic} not found")
+        tps = [TopicPartition(topic, p) for p in sorted(partitions) if args.partitions is None or p in args.partitions]
+        bounds = await slice_bounds(consumer, tps, args)
+        consumer.assign(tps)
+        active = set()
+        for tp, (start, end) in bounds.items():
+            consumer.seek(tp, start)
+            if end > start:
+                active.add(tp)
+        total = sum(end - start for start, end in bounds.values())
+        logger.info("replaying %s records of %s from %s partitions%s", total, topic, len(active), " (dry run)" if args.dry_run else "")
+
+        if not args.dry_run:
+            init_pool(settings)
+        # Always: rows are only counted while the consumers maintain the rollups (rollup_state)
+        insert_fn = write_strategy(args.strategy, settings.EVENT_ID_FORMAT, rollups=True)
+        error_re = re.compile(args.error) if args.error else None
+        event_names = set(args.event_name or ())
+        stats = Stats()
+        last_progress = time.monotonic()
+
+        while active:
+            data = await consumer.getmany(*active, timeout_ms=1000, max_records=args.batch_size)
+            chunk = []
+            commit = {}
+            for tp, records in data.items():
+                end = bounds[tp][1]
+                in_slice = [r for r in records if r.offset < end]
+                chunk.extend(in_slice)
+                if in_slice:
+                    commit[tp] = in_slice[-1].offset + 1
+                if len(in_slice) < len(records):
+                    active.discard(tp)
+            stats.read += len(chunk)
+            if chunk:
+                await replay_chunk(chunk, insert_fn, settings, args, error_re, event_names, stats)
+                if args.group and commit and not args.dry_run:
+                    await consumer.commit(commit)
+
+            remaining = 0
+            for tp in list(active):
+                left = bounds[tp][1] - await consumer.position(tp)
+                if left <= 0:
+                    active.discard(tp)
+                remaining += max(0, left)
+            replay_remaining.set(remaining)
+            replay_rate.set(stats.rate())
+            if args.rate:
+                # Sleep until the records read so far fit the rate
+                ahead = stats.read / args.rate - (time.monotonic() - stats.started)
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+            if time.monotonic() - last_progress >= args.progress:
+                logger.info("progress %s", stats.line(remaining))
+                last_progress = time.monotonic()
+
+        replay_remaining.set(0)
+        logger.info("done %s in %.1fs", stats.line(0), time.monotonic() - stats.started)
+    finally:
+        await consumer.stop()
+        close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--topic", help="DLQ topic (default: <KAFKA_TOPIC>-dlq)")
+    parser.add_argument("--bootstrap", help="Kafka bootstrap servers (default: KAFKA_SERVER)")
+    parser.add_argument("--partitions", type=int, nargs="+", help="only these partitions")
+    parser.add_argument("--from-offset", type=int, help="first offset to replay in every partition")
+    parser.add_argument("--to-offset", type=int, help="stop before this offset in every partition")
+    parser.add_argument("--since", help="replay records appended to the DLQ at or after this ISO time")
+    parser.add_argument("--until", help="stop at records appended at or after this ISO time")
+    parser.add_argument("--stage", choices=["decode", "insert"], help="only records rejected at this stage")
+    parser.add_argument("--error", help="only records whose dlq_error matches this regular expression")
+    parser.add_argument("--event-name", nargs="+", help="only these event names")
+    parser.add_argument("--group", help="consumer group to commit progress in, so a replay can resume")
+    parser.add_argument("--strategy", default="copy", choices=sorted(WRITE_STRATEGIES), help="write strategy (default copy)")
+    parser.add_argument("--batch-size", type=int, default=20_000, help="records per fetch and write")
+    parser.add_argument("--fetch-bytes", type=int, default=16 * 1024 * 1024, help="max bytes fetched per partition")
+    parser.add_argument("--rate", type=float, default=0, help="max records read per second (0: unlimited)")
+    parser.add_argument("--progress", type=float, default=5.0, help="seconds between progress lines")
+    parser.add_argument("--metrics-port", type=int, help="serve dlq_replay_* metrics on this port")
+    parser.add_argument("--dry-run", action="store_true", help="count what would be replayed without writing")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
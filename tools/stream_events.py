@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Stream synthetic events to the ingestion service over one WebSocket.
+
+Sends NDJSON frames of ``--frame-events`` events, keeps at most
+``--window`` unacknowledged events in flight and waits for the final ack.
+
+Usage: python tools/stream_events.py --total 100000
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+import aiohttp
+
+EVENT_NAMES = ["page_view", "home_button", "form_click"]
+
+
+def make_frame(start, count):
+    now = datetime.now(timezone.utc).isoformat()
+    lines = []
+    for i in range(start, start + count):
+        lines.append(json.dumps({
+            "user_id": f"user_{i % 30}",
+            "event_name": EVENT_NAMES[i % len(EVENT_NAMES)],
+            "metadata": {"page": f"/page_{i % 10}", "seq": i},
+            "timestamp": now,
+        }))
+    return "\n".join(lines)
+
+
+async def run(args):
+    acked = 0
+    rejected = 0
+    sent = 0
+    window_open = asyncio.Event()
+    window_open.set()
+    start = time.time()
+    async with aiohttp.ClientSession() as session:
+        async with session.ws_connect(args.url, headers={"X-Delivery-Mode": args.delivery_mode}) as ws:
+
+            async def read_acks():
+                nonlocal acked, rejected
+                async for msg in ws:
+                    reply = json.loads(msg.data)
+                    if reply["type"] == "error":
+                        raise RuntimeError(f"stream closed at offset {reply['offset']}: {reply['detail']}")
+                    acked, rejected = reply["offset"], reply["rejected"]
+                    if sent - acked < args.window:
+                        window_open.set()
+                    if acked >= args.total:
+                        return
+
+            reader = asyncio.create_task(read_acks())
+            while sent < args.total:
+                await window_open.wait()
+                count = min(args.frame_events, args.total - sent)
+                await ws.send_str(make_frame(sent, count))
+                sent += count
+                if sent - acked >= args.window:
+                    window_open.clear()
+            await reader
+    elapsed = time.time() - start
+    print(f"Streamed {sent} events in {elapsed:.2f}s ({sent / elapsed:.0f} events/s), {rejected} rejected")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="ws://localhost:8004/events/stream")
+    parser.add_argument("--total", type=int, default=10000)
+    parser.add_argument("--frame-events", type=int, default=100)
+    parser.add_argument("--window", type=int, default=5000, help="maximum unacknowledged events")
+    parser.add_argument("--delivery-mode", default="leader-ack")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()